@@ -1,10 +1,14 @@
 # api_services.py
-import streamlit as st
 import google.generativeai as genai
 import pandas as pd
-import yfinance as yf
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cache_backend
+import data_sources
+import ohlcv_store
+import ticker_metadata
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +59,12 @@ def generate_gemini_response(prompt_text: str, model_name: str, temperature: flo
     Returns:
         str: LLMからの応答テキスト、またはエラーメッセージ。
     """
+    request = {"model": model_name, "temperature": temperature, "prompt": prompt_text}
+    return data_sources.call("gemini", "generate_content", request,
+                             lambda: _generate_gemini_response_live(prompt_text, model_name, temperature))
+
+
+def _generate_gemini_response_live(prompt_text: str, model_name: str, temperature: float | None) -> str:
     if not _gemini_api_key_configured:
         err_msg = "[LLM エラー] Gemini APIキーが正しく設定されていません。"
         if _gemini_api_key_value is None:
@@ -104,7 +114,7 @@ def generate_gemini_response(prompt_text: str, model_name: str, temperature: flo
 
 
 # --- yfinance API 関連 ---
-@st.cache_data(ttl=1800)
+# info や財務諸表は ticker_metadata が項目ごとの有効期限つきでキャッシュ (プロセス内 + 共有キャッシュ) するため、ここではキャッシュしない
 def get_ticker_financial_data(ticker_code_input: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, dict | None, str | None]:
     ticker_code_processed = ""
     try:
@@ -128,17 +138,14 @@ def get_ticker_financial_data(ticker_code_input: str) -> tuple[pd.DataFrame, pd.
             logger.error(err_msg)
             return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None, err_msg
 
-        ticker = yf.Ticker(ticker_code_processed)
-        info = ticker.info
+        info = ticker_metadata.get_field(ticker_code_processed, "info")
 
         if not info or not info.get('symbol'):
             if ticker_code_processed.endswith(".T"):
                 ticker_code_no_t = ticker_code_processed[:-2]
                 logger.info(f"基本情報(info)取得失敗、'.T'なしでリトライ: {ticker_code_no_t}")
-                ticker_retry = yf.Ticker(ticker_code_no_t)
-                info_retry = ticker_retry.info
+                info_retry = ticker_metadata.get_field(ticker_code_no_t, "info")
                 if info_retry and info_retry.get('symbol'):
-                    ticker = ticker_retry
                     info = info_retry
                     ticker_code_processed = ticker_code_no_t
                     logger.info(f"'.T'なしでのリトライ成功: {ticker_code_no_t}")
@@ -151,16 +158,18 @@ def get_ticker_financial_data(ticker_code_input: str) -> tuple[pd.DataFrame, pd.
                 logger.warning(err_msg)
                 return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None, err_msg
 
-        financials_df = ticker.financials if hasattr(ticker, 'financials') and ticker.financials is not None else pd.DataFrame()
-        quarterly_financials_df = ticker.quarterly_financials if hasattr(ticker, 'quarterly_financials') and ticker.quarterly_financials is not None else pd.DataFrame()
+        financials_df = ticker_metadata.get_field(ticker_code_processed, "financials")
+        if financials_df is None: financials_df = pd.DataFrame()
+        quarterly_financials_df = ticker_metadata.get_field(ticker_code_processed, "quarterly_financials")
+        if quarterly_financials_df is None: quarterly_financials_df = pd.DataFrame()
 
-        dividends_data = ticker.dividends if hasattr(ticker, 'dividends') else None
+        dividends_data = ticker_metadata.get_field(ticker_code_processed, "dividends")
         dividends_df = dividends_data.reset_index() if dividends_data is not None and not dividends_data.empty else pd.DataFrame()
 
-        earnings_dates_data = ticker.earnings_dates if hasattr(ticker, 'earnings_dates') else None
+        earnings_dates_data = ticker_metadata.get_field(ticker_code_processed, "earnings_dates")
         earnings_dates_df = earnings_dates_data.reset_index() if earnings_dates_data is not None and not earnings_dates_data.empty else pd.DataFrame()
 
-        recommendations_data = ticker.recommendations if hasattr(ticker, 'recommendations') else None
+        recommendations_data = ticker_metadata.get_field(ticker_code_processed, "recommendations")
         recommendations_df = recommendations_data.reset_index() if recommendations_data is not None and not recommendations_data.empty else pd.DataFrame()
 
         logger.info(f"yfinanceデータ取得成功: {ticker_code_processed}")
@@ -171,8 +180,13 @@ def get_ticker_financial_data(ticker_code_input: str) -> tuple[pd.DataFrame, pd.
         logger.error(err_msg, exc_info=True)
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), None, err_msg
 
-@st.cache_data(ttl=1800)
+@cache_backend.cached("api_services.get_stock_price_history", ttl=1800, should_cache=lambda result: result[1] is None)
 def get_stock_price_history(ticker_code_input: str, period: str = "1y", interval: str = "1mo") -> tuple[pd.DataFrame | None, str | None]:
+    return _fetch_stock_price_history(ticker_code_input, period, interval)
+
+
+def _fetch_stock_price_history(ticker_code_input: str, period: str, interval: str) -> tuple[pd.DataFrame | None, str | None]:
+    """get_stock_price_history の本体 (キャッシュを通さない。一括取得の各スレッドから呼び出す)。"""
     ticker_code_processed = ""
     try:
         normalized_ticker = str(ticker_code_input).strip().upper()
@@ -187,17 +201,15 @@ def get_stock_price_history(ticker_code_input: str, period: str = "1y", interval
         else:
             ticker_code_processed = normalized_ticker
 
-        logger.info(f"yfinance株価履歴取得開始: {ticker_code_processed} (period: {period}, interval: {interval})")
-        ticker = yf.Ticker(ticker_code_processed)
-        hist_df = ticker.history(period=period, interval=interval)
+        logger.info(f"株価履歴取得開始 (OHLCVストア経由): {ticker_code_processed} (period: {period}, interval: {interval})")
+        hist_df = ohlcv_store.get_ohlcv_for_period(ticker_code_processed, period, interval=interval)
 
         if hist_df.empty:
             logger.warning(f"株価履歴データ(history)が空です: {ticker_code_processed}")
             if ticker_code_processed.endswith(".T"):
                 ticker_code_no_t = ticker_code_processed[:-2]
                 logger.info(f"株価履歴取得、'.T'なしでリトライ: {ticker_code_no_t}")
-                ticker_retry = yf.Ticker(ticker_code_no_t)
-                hist_df_retry = ticker_retry.history(period=period, interval=interval)
+                hist_df_retry = ohlcv_store.get_ohlcv_for_period(ticker_code_no_t, period, interval=interval)
                 if not hist_df_retry.empty:
                     logger.info(f"'.T'なしでの株価履歴取得成功: {ticker_code_no_t}")
                     return hist_df_retry, None
@@ -205,10 +217,44 @@ def get_stock_price_history(ticker_code_input: str, period: str = "1y", interval
                     logger.warning(f"'.T'なしでの株価履歴も空: {ticker_code_no_t}")
             return None, f"ティッカー '{ticker_code_processed}' の株価履歴データが見つかりません。"
 
-        logger.info(f"yfinance株価履歴取得成功: {ticker_code_processed}")
+        logger.info(f"株価履歴取得成功: {ticker_code_processed}")
         return hist_df, None
 
     except Exception as e:
         err_msg = f"yfinanceで '{ticker_code_processed if ticker_code_processed else ticker_code_input}' の株価履歴取得中にエラー: {e}"
         logger.error(err_msg, exc_info=True)
         return None, err_msg
+
+
+@cache_backend.cached("api_services.get_stock_price_histories", ttl=1800, should_cache=lambda result: not result[1])
+def get_stock_price_histories(ticker_codes: tuple[str, ...], period: str = "1y", interval: str = "1d", max_workers: int = 8) -> tuple[pd.DataFrame, dict[str, str]]:
+    """
+    複数銘柄の株価履歴をまとめて取得し、(終値の横持ちDataFrame, {ティッカー: エラーメッセージ}) を返します。
+    終値のDataFrameは日付で揃えた (外部結合した) もので、列は取得に成功したティッカーです (入力順)。
+    各銘柄は最大 max_workers 並列で取得するため、全体の待ち時間は最も遅い銘柄程度に収まります。
+    1銘柄でも取得に失敗した場合は、次の呼び出しで取り直せるよう結果をキャッシュしません。
+    """
+    ticker_codes = list(dict.fromkeys(ticker_codes))
+    closes, errors = {}, {}
+    if not ticker_codes:
+        return pd.DataFrame(), errors
+
+    logger.info(f"株価履歴の一括取得開始: {len(ticker_codes)}銘柄 (period: {period}, interval: {interval}, 並列数: {max_workers})")
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ticker_codes)))) as executor:
+        future_to_ticker = {executor.submit(_fetch_stock_price_history, ticker, period, interval): ticker for ticker in ticker_codes}
+        for future in as_completed(future_to_ticker):
+            ticker = future_to_ticker[future]
+            try:
+                hist_df, err = future.result()
+            except Exception as e:
+                hist_df, err = None, f"'{ticker}' の株価履歴取得中にエラー: {e}"
+            if err or hist_df is None or hist_df.empty or 'Close' not in hist_df.columns:
+                errors[ticker] = err or f"ティッカー '{ticker}' の株価履歴データが見つかりません。"
+                continue
+            closes[ticker] = hist_df['Close']
+
+    close_df = pd.concat([closes[t] for t in ticker_codes if t in closes], axis=1, keys=[t for t in ticker_codes if t in closes]) if closes else pd.DataFrame()
+    if not close_df.empty:
+        close_df = close_df.sort_index()
+    logger.info(f"株価履歴の一括取得完了: 成功 {len(closes)}銘柄, 失敗 {len(errors)}銘柄")
+    return close_df, errors
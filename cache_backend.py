@@ -0,0 +1,406 @@
+# cache_backend.py
+# プロセスをまたいで共有できる関数結果キャッシュ。st.cache_data はプロセスごとのメモリにしか保存しないため、
+# Cloud Run で新しいインスタンスが起動するたびに同じ取得処理を繰り返していました。
+# 保存先は config.CACHE_BACKEND_CONFIG["backend"] (環境変数 INVESTALLIA_CACHE_BACKEND) で切り替えます。
+#   "disk"   : ローカルディスク (1エントリ1ファイル)
+#   "sqlite" : ローカルの SQLite ファイル (同じマシン上の複数プロセスで共有)
+#   "redis"  : Redis 互換サーバー (複数インスタンスで共有。redis パッケージが必要)
+#   "memory" : プロセス内の Redis 互換スタンドイン (テスト・計測用)
+# どの保存先でも、エントリごとの有効期限 (TTL)、件数上限を超えたときの LRU 追い出し、ヒット/ミス数の集計を行います。
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import math
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import config as app_config
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """保存先の共通インターフェース。値は pickle でシリアライズして保存します。"""
+
+    name = "base"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, int(max_entries))
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, stat: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[stat] += n
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def get(self, key: str) -> tuple[bool, object]:
+        """(ヒットしたか, 値) を返します。"""
+        raise NotImplementedError
+
+    def set(self, key: str, value, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class DiskBackend(CacheBackend):
+    """1エントリを1ファイル (有効期限と値の pickle) として保存します。LRU の順序はファイルの更新時刻で管理します。"""
+
+    name = "disk"
+    _EVICT_CHECK_INTERVAL = 32  # 件数上限の確認はこの回数の書き込みごとに行う (毎回ディレクトリを走査しないため)
+
+    def __init__(self, cache_dir: str, max_entries: int):
+        super().__init__(max_entries)
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._sets_since_check = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at, value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self._count("misses")
+            return False, None
+        if expires_at < time.time():
+            self.delete(key)
+            self._count("misses")
+            return False, None
+        try:
+            os.utime(path)  # 最近使ったエントリとして更新時刻を進める
+        except OSError:
+            pass
+        self._count("hits")
+        return True, value
+
+    def set(self, key, value, ttl):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((time.time() + ttl, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._count("sets")
+        with self._lock:
+            self._sets_since_check += 1
+            if self._sets_since_check < self._EVICT_CHECK_INTERVAL:
+                return
+            self._sets_since_check = 0
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pkl"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        for _, path in sorted(entries)[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+        self._count("evictions", excess)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pkl"):
+                os.remove(entry.path)
+
+
+class SQLiteBackend(CacheBackend):
+    """1つの SQLite ファイルに保存します。WAL モードにより、同じマシン上の複数プロセスから同時に読み書きできます。"""
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str, max_entries: int):
+        super().__init__(max_entries)
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache_entries ("
+                           "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed_at ON cache_entries (accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self._count("misses")
+                return False, None
+            self._conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return True, pickle.loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                               (key, sqlite3.Binary(blob), now + ttl, now))
+            excess = self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                # 期限切れのものを先に消し、それでも多ければ最も長く使われていないものから消す
+                excess -= self._conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,)).rowcount
+                if excess > 0:
+                    self._conn.execute("DELETE FROM cache_entries WHERE key IN "
+                                       "(SELECT key FROM cache_entries ORDER BY accessed_at LIMIT ?)", (excess,))
+                    self._count("evictions", excess)
+        self._count("sets")
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries")
+
+
+class RedisBackend(CacheBackend):
+    """
+    Redis 互換サーバーに保存します。有効期限はサーバー側の PX (ミリ秒) で、LRU の順序は最終アクセス時刻を持つソート済みセットで管理します。
+    client には redis.Redis か、同じメソッド (get/set/delete/zadd/zcard/zrange/zrem) を持つオブジェクトを渡せます。
+    """
+
+    name = "redis"
+
+    def __init__(self, client, max_entries: int, prefix: str = "investallia:cache:"):
+        super().__init__(max_entries)
+        self.client = client
+        self.prefix = prefix
+        self._lru_key = f"{prefix}__lru__"
+
+    def get(self, key):
+        full_key = self.prefix + key
+        blob = self.client.get(full_key)
+        if blob is None:
+            self.client.zrem(self._lru_key, full_key)
+            self._count("misses")
+            return False, None
+        self.client.zadd(self._lru_key, {full_key: time.time()})
+        self._count("hits")
+        return True, pickle.loads(blob)
+
+    def set(self, key, value, ttl):
+        full_key = self.prefix + key
+        self.client.set(full_key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), px=max(1, math.ceil(ttl * 1000)))
+        self.client.zadd(self._lru_key, {full_key: time.time()})
+        self._count("sets")
+        excess = self.client.zcard(self._lru_key) - self.max_entries
+        if excess > 0:
+            victims = self.client.zrange(self._lru_key, 0, excess - 1)
+            if victims:
+                self.client.delete(*victims)
+                self.client.zrem(self._lru_key, *victims)
+                self._count("evictions", len(victims))
+
+    def delete(self, key):
+        full_key = self.prefix + key
+        self.client.delete(full_key)
+        self.client.zrem(self._lru_key, full_key)
+
+    def clear(self):
+        keys = self.client.zrange(self._lru_key, 0, -1)
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(self._lru_key)
+
+
+class InMemoryRedis:
+    """RedisBackend が使うコマンドだけを実装した、プロセス内の Redis 互換スタンドイン (テスト・計測用)。"""
+
+    def __init__(self):
+        self._values = {}   # キー -> (値, 期限 or None)
+        self._zsets = {}    # キー -> {メンバー: スコア}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            item = self._values.get(name)
+            if item is None:
+                return None
+            if item[1] is not None and item[1] < time.time():
+                del self._values[name]
+                return None
+            return item[0]
+
+    def set(self, name, value, px=None):
+        with self._lock:
+            self._values[name] = (value, time.time() + px / 1000 if px else None)
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(1 for n in names if self._values.pop(n, None) is not None or self._zsets.pop(n, None) is not None)
+
+    def zadd(self, name, mapping):
+        with self._lock:
+            self._zsets.setdefault(name, {}).update(mapping)
+
+    def zcard(self, name):
+        with self._lock:
+            return len(self._zsets.get(name, {}))
+
+    def zrange(self, name, start, end):
+        with self._lock:
+            members = sorted(self._zsets.get(name, {}).items(), key=lambda kv: kv[1])
+        end = len(members) if end == -1 else end + 1
+        return [m for m, _ in members[start:end]]
+
+    def zrem(self, name, *values):
+        with self._lock:
+            zset = self._zsets.get(name, {})
+            return sum(1 for v in values if zset.pop(v, None) is not None)
+
+
+def _create_backend() -> CacheBackend:
+    cfg = app_config.CACHE_BACKEND_CONFIG
+    kind = str(cfg.get("backend", "disk")).strip().lower()
+    max_entries = cfg["max_entries"]
+    if kind == "redis":
+        if redis is None:
+            logger.warning("redis パッケージがインストールされていないため、共有キャッシュにディスクを使用します。")
+        else:
+            try:
+                client = redis.Redis.from_url(cfg["redis_url"], socket_timeout=cfg.get("redis_timeout_sec", 2.0))
+                client.ping()
+                return RedisBackend(client, max_entries, cfg["redis_prefix"])
+            except Exception as e:
+                logger.error(f"Redis ({cfg['redis_url']}) に接続できないため、共有キャッシュにディスクを使用します: {e}")
+    elif kind == "memory":
+        return RedisBackend(InMemoryRedis(), max_entries, cfg["redis_prefix"])
+    elif kind == "sqlite":
+        db_path = cfg["sqlite_path_cloud_run"] if app_config.IS_CLOUD_RUN else cfg["sqlite_path_colab"]
+        try:
+            return SQLiteBackend(db_path, max_entries)
+        except sqlite3.Error as e:
+            logger.error(f"SQLite キャッシュ ({db_path}) を開けないため、共有キャッシュにディスクを使用します: {e}")
+    elif kind != "disk":
+        logger.warning(f"未知の共有キャッシュ種別 '{kind}' が指定されたため、ディスクを使用します。")
+    cache_dir = cfg["disk_dir_cloud_run"] if app_config.IS_CLOUD_RUN else cfg["disk_dir_colab"]
+    return DiskBackend(cache_dir, max_entries)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_namespace_stats = {}  # 名前空間 -> {"hits": n, "misses": n, "errors": n}
+_namespace_stats_lock = threading.Lock()
+
+
+def get_backend() -> CacheBackend:
+    """プロセス共通の保存先を返します (初回呼び出し時に config から作成)。"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _create_backend()
+            logger.info(f"共有キャッシュの保存先: {_backend.name} (最大 {_backend.max_entries} 件)")
+        return _backend
+
+
+def set_backend(backend: CacheBackend | None):
+    """保存先を差し替えます (None で次回 config から作り直し)。テストや計測用。"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def _count_namespace(namespace: str, stat: str):
+    with _namespace_stats_lock:
+        stats = _namespace_stats.setdefault(namespace, {"hits": 0, "misses": 0, "errors": 0})
+        stats[stat] += 1
+
+
+def get_stats() -> dict:
+    """保存先全体と名前空間 (関数) ごとのヒット/ミス数を返します。"""
+    backend = get_backend()
+    with _namespace_stats_lock:
+        namespaces = {ns: dict(stats) for ns, stats in _namespace_stats.items()}
+    return {"backend": backend.name, **backend.stats(), "namespaces": namespaces}
+
+
+def _make_key(namespace: str, signature: inspect.Signature, args, kwargs) -> str:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    # st.cache_data と同じく、名前が "_" で始まる引数 (_self など) はキーに含めない
+    key_args = {name: value for name, value in bound.arguments.items() if not name.startswith("_")}
+    canonical = json.dumps(key_args, sort_keys=True, ensure_ascii=False, default=repr)
+    return f"{namespace}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+
+def cached(namespace: str, ttl: float, should_cache=None):
+    """
+    関数の結果を共有キャッシュに保存するデコレータ (st.cache_data の置き換え)。
+    ttl は有効期限 (秒)、should_cache(結果) が False を返す結果 (エラーなど) は保存しません。
+    保存先に障害があっても、関数をそのまま実行して結果を返します。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _make_key(namespace, signature, args, kwargs)
+            try:
+                hit, value = get_backend().get(key)
+            except Exception as e:
+                logger.warning(f"共有キャッシュの読み込みに失敗しました ({namespace}): {e}")
+                _count_namespace(namespace, "errors")
+                hit, value = False, None
+            if hit:
+                _count_namespace(namespace, "hits")
+                return value
+            _count_namespace(namespace, "misses")
+            value = func(*args, **kwargs)
+            if should_cache is None or should_cache(value):
+                try:
+                    get_backend().set(key, value, ttl)
+                except Exception as e:
+                    logger.warning(f"共有キャッシュへの保存に失敗しました ({namespace}): {e}")
+                    _count_namespace(namespace, "errors")
+            return value
+
+        def invalidate(*args, **kwargs):
+            """指定した引数での呼び出し結果をキャッシュから削除します。"""
+            get_backend().delete(_make_key(namespace, signature, args, kwargs))
+
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
@@ -145,9 +145,99 @@ NEWS_SERVICE_CONFIG = {
         "newsapi": True, "gnews": False, "brave": False, "tavily": False,
         "google_cse": True, "bing": False,
     },
-    "max_news_per_api": 10, "duplicate_title_prefix_length": 10,
+    "max_news_per_api": 10,
+    # ほぼ同じ記事の判定 (news_dedup.py): 見出しの文字 n-gram 集合の Jaccard 係数がこれ以上なら同じ記事とみなす
+    # (0.5 は日英の見出しの組で調整した値。tests/test_news_dedup.py を参照)
+    "near_duplicate_min_jaccard": 0.5, "near_duplicate_shingle_size": 2,
+    "near_duplicate_summary_chars": 0,  # 見出しに加えて概要の先頭何文字を判定に使うか (0 なら見出しのみ)
     "api_request_delay": 0.5, "cache_expiry_hours": 6,
-    "cache_dir_colab": "news_cache_colab", "cache_dir_gcs_prefix": "news_cache/"
+    "cache_dir_colab": "news_cache_colab", "cache_dir_gcs_prefix": "news_cache/", "cache_dir_cloud_run": "/tmp/news_cache_gcr",
+    "cache_db_filename": "news_cache.sqlite3",  # 記事・生レスポンスを保存する SQLite ファイル (news_cache_store.py)
+    "cache_max_bytes": 32 * 1024 * 1024,  # キャッシュ全体の上限。超えたら最も長く使われていない銘柄から追い出す
+    "raw_response_compress_level": 6,    # APIの生レスポンスを保存するときの zlib 圧縮レベル (1-9)
+    "raw_response_retention_hours": 6,   # キャッシュから参照されなくなった生レスポンスを残しておく時間 (画面のデバッグ表示用)
+    "max_workers": 24,  # ニュース取得に使う共有スレッドプールのワーカー数 (全ページ・全銘柄で共有)
+    "provider_max_concurrency": 10,  # 1つのニュースAPIへ同時に送るリクエスト数の上限 (複数銘柄をまとめて取得するとき用)
+    "fetch_deadline_sec": 20,  # 企業・市場ニュースの取得全体の締め切り (秒)。間に合わなかったプロバイダーはタイムアウト扱い
+    "stale_while_revalidate": True,  # 有効期限切れのキャッシュをすぐに返し、裏で取り直す
+    "stale_hard_expiry_hours": 48,   # これより古いキャッシュは期限切れとしても使わず、取得を待つ
+}
+
+# --- 外部APIへの HTTP 接続 (http_client.py の共有セッション) ---
+HTTP_CLIENT_CONFIG = {
+    "pool_connections": 16,  # 接続プールを保持するホスト数の上限
+    "pool_maxsize": 12,      # ホストごとに保持する接続数の上限 (同時リクエスト数に合わせる)
+}
+
+# --- 外部APIのレート制限 (プロセス全体で共有するトークンバケット) ---
+RATE_LIMIT_CONFIG = {
+    "default": {"rate_per_sec": 5.0, "burst": 5},
+    "yfinance": {"rate_per_sec": 4.0, "burst": 8},  # 毎秒の平均リクエスト数と、連続して送れる最大数
+    # ニュースAPIは "news_<API名>" (未定義のものは default)。複数銘柄の一括取得で連続して送れるよう、バーストを大きめにする
+    "news_newsapi": {"rate_per_sec": 5.0, "burst": 10},
+    "news_google_cse": {"rate_per_sec": 5.0, "burst": 10},
+}
+STOCK_REPORT_MAX_WORKERS = 8  # 銘柄レポートのデータ取得に使うワーカースレッド数
+
+# --- 外部APIの状態監視 (provider_health.py のサーキットブレーカーと適応タイムアウト) ---
+PROVIDER_HEALTH_CONFIG = {
+    "window_size": 50,    # プロバイダーごとに保持する直近の呼び出し結果の件数
+    "window_sec": 600,    # エラー率・応答時間の計算に使う期間 (秒)
+    "min_calls": 4, "error_rate_threshold": 0.5,  # 直近 min_calls 回以上のうちエラー率がこれ以上なら遮断
+    "consecutive_failures_threshold": 3,          # 連続してこの回数失敗しても遮断
+    "cooldown_sec": 120,  # 遮断してから、試しに呼び出すまでの時間 (秒)
+    "default_timeout_sec": 15, "min_timeout_sec": 3, "max_timeout_sec": 15,  # タイムアウト (記録が少ないうちは既定値)
+    "timeout_p95_multiplier": 2.0, "min_samples_for_timeout": 5,  # タイムアウト = 成功時の p95 応答時間 × 倍率
+}
+
+# --- 外部データソースの記録・再生 (オフラインでの負荷試験・計測用) ---
+DATA_SOURCE_CONFIG = {
+    "mode": os.getenv("INVESTALLIA_DATA_SOURCE_MODE", "live"),  # "live" / "record" (応答を保存) / "replay" (保存した応答を返す)
+    "recording_dir": os.getenv("INVESTALLIA_RECORDING_DIR", "recordings"),
+    "replay_latency_scale": float(os.getenv("INVESTALLIA_REPLAY_LATENCY_SCALE", "1.0")),  # 再生時の待ち時間 = 記録時の所要時間 × この倍率 (0で待たない)
+    "replay_latency_ms": {},  # ソースごとの固定の待ち時間 (ミリ秒)。例: {"yfinance": 300, "news": 800, "gemini": 3000}
+    "replay_miss": "error",   # 記録がない呼び出し: "error" (RecordingNotFoundError を送出) / "live" (外部APIを呼ぶ)
+    "relative_dates_in_keys": True,  # リクエスト中の日付を実行日からの相対日数として照合する (別の日にも同じ記録を再生できる)
+}
+
+# --- プロセス・インスタンス間で共有する関数結果キャッシュ (cache_backend.py) ---
+CACHE_BACKEND_CONFIG = {
+    "backend": os.getenv("INVESTALLIA_CACHE_BACKEND", "disk"),  # "disk" / "sqlite" / "redis" / "memory"
+    "max_entries": 5000,  # これを超えたら最も長く使われていないエントリから追い出す
+    "disk_dir_colab": "shared_cache", "disk_dir_cloud_run": "/tmp/shared_cache_gcr",
+    "sqlite_path_colab": "shared_cache.sqlite3", "sqlite_path_cloud_run": "/tmp/shared_cache_gcr.sqlite3",
+    "redis_url": os.getenv("INVESTALLIA_REDIS_URL", "redis://localhost:6379/0"),
+    "redis_prefix": "investallia:cache:", "redis_timeout_sec": 2.0,
+}
+
+# --- 銘柄メタデータ (yfinance の info・財務諸表など) のキャッシュ設定 ---
+TICKER_METADATA_CONFIG = {
+    "ttl_seconds": {  # 項目ごとの有効期限 (秒)
+        "info": 3 * 3600,
+        "financials": 24 * 3600, "quarterly_financials": 24 * 3600, "dividends": 24 * 3600,
+        "earnings_dates": 12 * 3600, "recommendations": 24 * 3600, "recommendations_summary": 24 * 3600,
+    },
+    "max_entries": 2000,  # 保持する (銘柄, 項目) の最大数
+}
+
+# --- 株価データ (OHLCV) ローカルストア設定 ---
+OHLCV_STORE_CONFIG = {
+    "enabled": True,
+    "refresh_interval_minutes": 30,  # 未確定の足 (当日・今週・今月) を取り直すまでの間隔
+    "overlap_days": 5,               # 末尾を取り直す際に含める確定済みの日数 (値の修正や分割・配当調整の検出用)
+    "adjustment_tolerance": 1e-4,    # 確定済みの終値がこの比率以上変わっていたら、履歴全体を取り直す
+    "cache_dir_colab": "ohlcv_store", "cache_dir_cloud_run": "/tmp/ohlcv_store_gcr"
+}
+
+# --- テクニカルスクリーナー関連設定 ---
+SCREENER_CONFIG = {
+    "history_days": 400,           # スナップショット計算に使う日足の期間 (SMA200 を計算できる長さ)
+    "download_chunk_size": 100,    # yfinance の一括ダウンロード1回あたりの銘柄数
+    "overlap_days": 7,             # 差分更新時に再取得する直近の日数 (直近バーの修正を反映するため)
+    "adjustment_tolerance": 1e-4,  # 再取得した確定済みの終値がこの比率以上変わった銘柄は、分割・配当の調整とみなして履歴全体を取り直す
+    "refresh_interval_hours": 6,   # この時間内に更新済みなら、追加銘柄がない限り再取得しない
+    "page_size_options": [25, 50, 100, 200],
+    "cache_dir_colab": "screener_cache", "cache_dir_cloud_run": "/tmp/screener_cache_gcr"
 }
 
 # --- 初期データ (ポートフォリオページ用) ---
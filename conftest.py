@@ -0,0 +1,2 @@
+# conftest.py
+# pytest 用。このファイルがあるリポジトリ直下が sys.path に入るため、テストから news_dedup などをそのまま import できます。
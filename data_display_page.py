@@ -9,6 +9,8 @@ import numpy as np
 from collections import defaultdict
 import copy # For deep copying dictionaries
 
+import data_sources
+
 
 # --- 定数・設定 ---
 key_dict = {
@@ -513,17 +515,24 @@ def get_relevant_conceptual_keys_from_gemini(user_question: str, model_name: str
 
         ユーザーの質問「{user_question}」に基づいて、上記の指示に厳密に従い、関連する英語のキー名を提示してください。
         """
-        generation_config = genai.types.GenerationConfig(temperature=0.0)
-        response = model.generate_content(prompt, generation_config=generation_config)
-        if response.parts:
-            extracted_concepts_text = response.text.strip()
+        def _live():
+            generation_config = genai.types.GenerationConfig(temperature=0.0)
+            response = model.generate_content(prompt, generation_config=generation_config)
+            if response.parts:
+                return response.text, None
+            return None, (str(response.prompt_feedback) if getattr(response, 'prompt_feedback', None) else None)
+
+        request = {"model": model_name, "temperature": 0.0, "prompt": prompt}
+        response_text, prompt_feedback = data_sources.call("gemini", "conceptual_keys", request, _live)
+        if response_text is not None:
+            extracted_concepts_text = response_text.strip()
             if not extracted_concepts_text: return []
             raw_concepts = [concept.strip() for concept in extracted_concepts_text.split('\n') if concept.strip()]
             final_concepts = [cs for cs in raw_concepts if cs in valid_english_keys]
             return list(set(final_concepts))
         else:
             st.warning("Gemini APIが応答にパーツを返しませんでした（関連概念キー抽出）。")
-            if hasattr(response, 'prompt_feedback') and response.prompt_feedback: st.caption(f"プロンプトフィードバック: {response.prompt_feedback}")
+            if prompt_feedback: st.caption(f"プロンプトフィードバック: {prompt_feedback}")
             return []
     except Exception as e:
         st.error(f"Gemini APIの呼び出しまたは応答処理中にエラーが発生しました（関連概念キー抽出）: {e}")
@@ -0,0 +1,151 @@
+# data_sources.py
+# 外部データソース (yfinance・ニュースAPI・Gemini) の呼び出しを記録・再生する層。
+# config.DATA_SOURCE_CONFIG["mode"] (環境変数 INVESTALLIA_DATA_SOURCE_MODE) で動作を切り替えます。
+#   "live"   : 外部APIをそのまま呼び出します (既定)。
+#   "record" : 外部APIを呼び出し、結果 (送出された例外も含む) と所要時間をディスクに保存します。
+#   "replay" : 保存済みの結果を返し、外部APIにはアクセスしません。待ち時間は記録時の所要時間か、
+#              ソースごとに設定した固定値を再現します。ネットワークのない環境でも同じ結果で負荷試験・計測ができます。
+# 記録のキーには、呼び出し側が渡す「リクエストを表す値」から APIキー・トークン類を除いたものを使います。
+import datetime
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import time
+
+import config as app_config
+
+logger = logging.getLogger(__name__)
+
+MODES = ("live", "record", "replay")
+
+# キー名がこれに一致する値は、記録のキーにもファイルにも含めない
+_SECRET_NAME_PATTERN = re.compile(r"key|token|secret|password|auth|^cx$", re.IGNORECASE)
+# 記録のキーに含まれる日付・日時 (時刻部分は捨てる)
+_DATE_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?")
+
+
+class RecordingNotFoundError(LookupError):
+    """replay モードで、要求された呼び出しの記録が見つからない場合に送出されます。"""
+
+
+def get_mode() -> str:
+    mode = str(app_config.DATA_SOURCE_CONFIG.get("mode") or "live").strip().lower()
+    if mode not in MODES:
+        logger.warning(f"未知のデータソースモード '{mode}' が指定されたため、live として扱います。")
+        return "live"
+    return mode
+
+
+def set_mode(mode: str, recording_dir: str | None = None):
+    """実行中にモードを切り替えます (ベンチマークスクリプトなどから使用)。"""
+    if mode not in MODES:
+        raise ValueError(f"mode は {MODES} のいずれかである必要があります: {mode}")
+    app_config.DATA_SOURCE_CONFIG["mode"] = mode
+    if recording_dir is not None:
+        app_config.DATA_SOURCE_CONFIG["recording_dir"] = recording_dir
+    logger.info(f"データソースモードを '{mode}' に設定しました (記録先: {app_config.DATA_SOURCE_CONFIG['recording_dir']})。")
+
+
+def redact(mapping: dict | None) -> dict | None:
+    """APIキー・トークンなど秘密情報らしい項目を取り除いた dict を返します。"""
+    if not mapping:
+        return mapping
+    return {k: v for k, v in mapping.items() if not _SECRET_NAME_PATTERN.search(str(k))}
+
+
+def _relative_dates(text: str, today: datetime.date) -> str:
+    # 「直近1か月」などの期間は実行日によって日付が変わるため、実行日からの相対日数に置き換えて別の日でも同じ記録に一致させる
+    def _replace(match):
+        try:
+            offset = (datetime.date.fromisoformat(match.group(1)) - today).days
+        except ValueError:
+            return match.group(0)
+        return f"<today{offset:+d}d>"
+    return _DATE_PATTERN.sub(_replace, text)
+
+
+def _recording_path(source: str, operation: str, request: dict) -> str:
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    if app_config.DATA_SOURCE_CONFIG.get("relative_dates_in_keys", True):
+        canonical = _relative_dates(canonical, datetime.date.today())
+    digest = hashlib.sha256(f"{source}\n{operation}\n{canonical}".encode("utf-8")).hexdigest()[:32]
+    safe_operation = re.sub(r"[^0-9A-Za-z.\-]", "_", operation)
+    return os.path.join(app_config.DATA_SOURCE_CONFIG["recording_dir"], source, safe_operation, f"{digest}.pkl")
+
+
+def _picklable_exception(exc: Exception) -> Exception:
+    # requests の HTTPError などはレスポンスオブジェクトを抱えていて保存できないことがあるため、その場合は型名とメッセージだけ残す
+    try:
+        pickle.loads(pickle.dumps(exc))
+        return exc
+    except Exception:
+        return RuntimeError(f"{type(exc).__name__}: {exc}")
+
+
+def _save_recording(path: str, entry: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"記録の保存に失敗: {path}, エラー: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _replay_delay(source: str, recorded_elapsed: float) -> float:
+    cfg = app_config.DATA_SOURCE_CONFIG
+    fixed_ms = cfg.get("replay_latency_ms", {}).get(source)
+    if fixed_ms is not None:
+        return max(0.0, fixed_ms / 1000.0)
+    return max(0.0, recorded_elapsed * float(cfg.get("replay_latency_scale", 1.0)))
+
+
+def call(source: str, operation: str, request: dict, live_fn):
+    """
+    外部APIの呼び出し live_fn() を、現在のモードに応じて実行・記録・再生します。
+    source はソース名 ("yfinance" / "news" / "gemini")、operation は呼び出しの種類、
+    request は呼び出しを一意に表す JSON 化できる dict です (秘密情報は含めないこと。redact() を使用)。
+    live_fn が例外を送出した場合、record モードではその例外も記録し、replay モードで同じ例外を送出します。
+    """
+    mode = get_mode()
+    if mode == "live":
+        return live_fn()
+
+    path = _recording_path(source, operation, request)
+    if mode == "replay":
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            if app_config.DATA_SOURCE_CONFIG.get("replay_miss", "error") == "live":
+                logger.warning(f"記録がないため外部APIを呼び出します: {source} {operation} {request}")
+                return live_fn()
+            raise RecordingNotFoundError(f"記録が見つかりません: {source} {operation} {request} ({path})")
+        delay = _replay_delay(source, entry.get("elapsed_sec", 0.0))
+        if delay > 0:
+            time.sleep(delay)
+        if entry.get("exception") is not None:
+            raise entry["exception"]
+        return entry["result"]
+
+    # record モード
+    started = time.monotonic()
+    entry = {"source": source, "operation": operation, "request": request,
+             "recorded_at": datetime.datetime.now().isoformat(), "result": None, "exception": None}
+    try:
+        result = live_fn()
+    except Exception as e:
+        entry["elapsed_sec"] = time.monotonic() - started
+        entry["exception"] = _picklable_exception(e)
+        _save_recording(path, entry)
+        raise
+    entry["elapsed_sec"] = time.monotonic() - started
+    entry["result"] = result
+    _save_recording(path, entry)
+    return result
@@ -1,5 +1,4 @@
 # file_manager.py
-import streamlit as st
 import pandas as pd
 import os
 import json
@@ -10,6 +9,7 @@ from typing import List
 
 # config から設定をインポート
 import config as app_config
+import cache_backend
 
 
 # Cloud Run環境でのみGCSライブラリをインポート
@@ -99,7 +99,7 @@ class FileManager:
                 raise ValueError(f"ファイルID '{file_id}' のColabパス (path_colab) がメタデータに定義されていません。")
             return self._read_local_file_bytes(colab_path)
 
-    @st.cache_data(ttl=3600)
+    @cache_backend.cached("file_manager.load_text", ttl=3600)
     def load_text(_self, file_id: str, default_encoding: str = 'utf-8') -> str:
         """
         指定されたファイルIDのテキストデータを読み込みます。
@@ -159,7 +159,7 @@ class FileManager:
         logger.warning(f"CSVファイル '{source_filename_log}' の全てのエンコーディング試行に失敗。\n試行ログ:\n" + "\n".join(trial_log) + f"\n{detected_encoding_info}")
         return None, None
 
-    @st.cache_data(ttl=3600)
+    @cache_backend.cached("file_manager.load_csv", ttl=3600, should_cache=lambda result: result[2] is None)
     def load_csv(_self, file_id: str) -> tuple[pd.DataFrame | None, str | None, str | None]:
         """
         指定されたファイルIDのCSVデータを読み込みます。
@@ -221,7 +221,7 @@ class FileManager:
             return None
 
     # ★★★★★ ここからがチャレンジチャット機能のために追加されたメソッドです ★★★★★
-    @st.cache_data(ttl=300)
+    @cache_backend.cached("file_manager.list_files", ttl=300)
     def list_files(_self, dir_id: str) -> List[str]:
         """
         指定されたディレクトリID内のファイル名の一覧を取得します。
@@ -261,7 +261,7 @@ class FileManager:
 
         return filenames
 
-    @st.cache_data(ttl=3600)
+    @cache_backend.cached("file_manager.read_text_from_dir", ttl=3600)
     def read_text_from_dir(_self, dir_id: str, filename: str, encoding: str = 'utf-8') -> str:
         """
         指定されたディレクトリID内の特定のファイル名を読み込み、テキストとして返します。
@@ -0,0 +1,72 @@
+# http_client.py
+# 外部APIへの HTTP リクエストに使う、プロセス共通の requests.Session。
+# ホストごとの接続プールを持ち、Keep-Alive で TCP/TLS 接続を使い回すため、同じAPIへの2回目以降のリクエストでは
+# 接続確立 (TCP ハンドシェイク + TLS ネゴシエーション) の時間がかかりません。
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config as app_config
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """共有のセッションを返します (初回呼び出し時に作成)。複数スレッドから同時に使用できます。"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            cfg = app_config.HTTP_CLIENT_CONFIG
+            adapter = HTTPAdapter(pool_connections=cfg["pool_connections"], pool_maxsize=cfg["pool_maxsize"])
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+            logger.info(f"HTTPセッションを作成しました (ホスト数上限 {cfg['pool_connections']}, ホストごとの接続数上限 {cfg['pool_maxsize']})。")
+        return _session
+
+
+def get_pool_stats() -> list[dict]:
+    """
+    ホストごとの接続プールの利用状況を返します。
+    requests: 送信したリクエスト数, connections_opened: 新たに確立した接続数,
+    reused: 既存の接続を使い回したリクエスト数, idle: プール内で待機中の接続数。
+    """
+    with _session_lock:
+        session = _session
+    if session is None:
+        return []
+    stats = []
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for pool_key in list(pools.keys()):
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            num_requests = getattr(pool, "num_requests", 0)
+            num_connections = getattr(pool, "num_connections", 0)
+            stats.append({
+                "host": pool.host, "scheme": pool.scheme, "requests": num_requests,
+                "connections_opened": num_connections, "reused": max(0, num_requests - num_connections),
+                # プールの待ち行列には未使用の枠が None として入っているため、実際の接続だけを数える
+                "idle": sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0,
+            })
+    return stats
+
+
+def log_pool_stats(context: str = ""):
+    """接続プールの利用状況をホストごとにログへ出力します。"""
+    for s in get_pool_stats():
+        reuse_rate = s["reused"] / s["requests"] * 100 if s["requests"] else 0.0
+        logger.info(f"HTTP接続プール{f' ({context})' if context else ''}: {s['scheme']}://{s['host']} "
+                    f"リクエスト {s['requests']} / 新規接続 {s['connections_opened']} / 再利用 {s['reused']} "
+                    f"(再利用率 {reuse_rate:.0f}%) / 待機中の接続 {s['idle']}")
@@ -242,8 +242,8 @@ def _run_challenge_chat_generation(sm, fm, akm, active_model):
             "balance": balance_df_data.to_markdown(index=False) if not balance_df_data.empty else "資産状況なし",
             "financials": fin_df.head().to_markdown(index=True) if fin_df is not None and not fin_df.empty else "データなし",
             "quarterly_financials": q_fin_df.head().to_markdown(index=True) if q_fin_df is not None and not q_fin_df.empty else "データなし",
-            "company_news": comp_news_df.head(3).to_markdown(index=False) if not comp_news_df.empty else "関連ニュースなし",
-            "market_news": mkt_news_df.head(3).to_markdown(index=False) if not mkt_news_df.empty else "市場ニュースなし",
+            "company_news": comp_news_df.head(3).drop(columns=['関連URL'], errors='ignore').to_markdown(index=False) if not comp_news_df.empty else "関連ニュースなし",
+            "market_news": mkt_news_df.head(3).drop(columns=['関連URL'], errors='ignore').to_markdown(index=False) if not mkt_news_df.empty else "市場ニュースなし",
             "price_history": price_hist_markdown
         }
         status_list.append("関連データ取得完了。"); status_placeholder.info("処理状況:\n" + "\n".join(status_list))
@@ -384,8 +384,8 @@ def render_page(sm, fm, akm, active_model):
   - 主人公の資産状況: {balance_df.to_markdown(index=False) if not balance_df.empty else "なし"}
   - 企業の年次財務(一部): {fin_df.head().to_markdown() if fin_df is not None and not fin_df.empty else "なし"}
   - 企業の四半期財務(一部): {q_fin_df.head().to_markdown() if q_fin_df is not None and not q_fin_df.empty else "なし"}
-  - 関連ニュース(一部): {news_df.head(3).to_markdown(index=False) if not news_df.empty else "なし"}
-  - 市場ニュース(一部): {market_df.head(3).to_markdown(index=False) if not market_df.empty else "なし"}
+  - 関連ニュース(一部): {news_df.head(3).drop(columns=['関連URL'], errors='ignore').to_markdown(index=False) if not news_df.empty else "なし"}
+  - 市場ニュース(一部): {market_df.head(3).drop(columns=['関連URL'], errors='ignore').to_markdown(index=False) if not market_df.empty else "なし"}
   - 注目企業の直近30日間の終値:
 {price_hist_markdown}
 #### **本番：正しいJSON出力 (この下に生成してください)**
@@ -233,8 +233,8 @@ def _run_challenge_novel_generation(sm, fm, akm, active_model):
             "balance": balance_df.to_markdown(index=False) if not balance_df.empty else "資産状況なし",
             "financials": fin_df.head().to_markdown(index=True) if fin_df is not None and not fin_df.empty else "データなし",
             "quarterly_financials": q_fin_df.head().to_markdown(index=True) if q_fin_df is not None and not q_fin_df.empty else "データなし",
-            "company_news": comp_news_df.head(3).to_markdown(index=False) if not comp_news_df.empty else "関連ニュースなし",
-            "market_news": mkt_news_df.head(3).to_markdown(index=False) if not mkt_news_df.empty else "市場ニュースなし",
+            "company_news": comp_news_df.head(3).drop(columns=['関連URL'], errors='ignore').to_markdown(index=False) if not comp_news_df.empty else "関連ニュースなし",
+            "market_news": mkt_news_df.head(3).drop(columns=['関連URL'], errors='ignore').to_markdown(index=False) if not mkt_news_df.empty else "市場ニュースなし",
             "price_history": price_hist_markdown
         }
         status_list.append("関連データ取得完了。")
@@ -0,0 +1,224 @@
+# news_cache_store.py
+# ニュースキャッシュを1つの SQLite ファイルに保存するストア。
+# 以前は銘柄ごとに整形済み記事と各APIの生レスポンスをまとめた JSON ファイルを書いていましたが、
+# Cloud Run では /tmp (メモリ上) に際限なく溜まり、読み込むたびにファイル全体をパースしていました。
+# ここでは記事と生レスポンスを1件1行で保存し、エントリのキーで読み込みます。
+# 生レスポンスはデバッグ表示でしか使わないため、zlib 圧縮して内容のハッシュ (ID) で別テーブルに保存し、
+# エントリには ID だけを持たせます。通常の読み込み (load) では本文を読まず、表示するときに get_raw() で取り出します。
+# 期限切れとしても使わなくなった (NEWS_SERVICE_CONFIG["stale_hard_expiry_hours"] を過ぎた) エントリは削除し、全体のサイズ (参照されていない生レスポンスを含む) が
+# 上限を超えたら、参照されていない生レスポンスの古いものから、次に最も長く使われていないエントリから追い出します。
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import config as app_config
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA_VERSION = 4  # テーブル構成を変えたら上げる (古いファイルは作り直す。キャッシュなので中身は取り直せばよい)
+_TABLES = ("news_cache_entries", "news_articles", "news_raw_responses", "news_raw_refs", "news_raw_blobs")
+_SCHEMA = [
+    # キャッシュの単位 (企業ニュースは銘柄ごと、市場ニュースは1つ)
+    """CREATE TABLE IF NOT EXISTS news_cache_entries (
+        cache_key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, size_bytes INTEGER NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS idx_news_cache_entries_accessed_at ON news_cache_entries (accessed_at)",
+    "CREATE INDEX IF NOT EXISTS idx_news_cache_entries_fetched_at ON news_cache_entries (fetched_at)",
+    # エントリの記事 (表示順)。記事はエントリ単位でしか読まないため、検索用の列は持たない
+    """CREATE TABLE IF NOT EXISTS news_articles (
+        cache_key TEXT NOT NULL, position INTEGER NOT NULL, article_json TEXT NOT NULL, PRIMARY KEY (cache_key, position))""",
+    # エントリから生レスポンスへの参照
+    """CREATE TABLE IF NOT EXISTS news_raw_refs (
+        cache_key TEXT NOT NULL, api_name TEXT NOT NULL, phase TEXT NOT NULL, raw_id TEXT NOT NULL,
+        PRIMARY KEY (cache_key, api_name, phase))""",
+    "CREATE INDEX IF NOT EXISTS idx_news_raw_refs_raw_id ON news_raw_refs (raw_id)",
+    # 生レスポンス本文 (zlib 圧縮)。同じ内容は1つだけ保存される
+    """CREATE TABLE IF NOT EXISTS news_raw_blobs (
+        raw_id TEXT PRIMARY KEY, body_zlib BLOB NOT NULL, size_bytes INTEGER NOT NULL, stored_at REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS idx_news_raw_blobs_stored_at ON news_raw_blobs (stored_at)",
+]
+
+_conn = None
+_conn_path = None
+_lock = threading.Lock()
+
+
+def get_db_path() -> str:
+    cfg = app_config.NEWS_SERVICE_CONFIG
+    base_dir = cfg["cache_dir_cloud_run"] if app_config.IS_CLOUD_RUN else cfg["cache_dir_colab"]
+    return os.path.join(base_dir, cfg["cache_db_filename"])
+
+
+def _get_conn() -> sqlite3.Connection:
+    # 呼び出し側で _lock を保持していること
+    global _conn, _conn_path
+    db_path = get_db_path()
+    if _conn is None or _conn_path != db_path:
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        _conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        if _conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            for table in _TABLES:
+                _conn.execute(f"DROP TABLE IF EXISTS {table}")
+            _conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        for statement in _SCHEMA:
+            _conn.execute(statement)
+        _conn_path = db_path
+        logger.info(f"ニュースキャッシュDBを開きました: {db_path}")
+    return _conn
+
+
+def make_cache_key(news_type: str, stock_name: str | None = None) -> str:
+    """企業ニュースは "company_news:<銘柄名>"、市場ニュースは "market_news"。"""
+    if news_type == "market_news":
+        return "market_news"
+    if news_type == "company_news":
+        if not stock_name:
+            raise ValueError("企業ニュースのキャッシュキー生成には銘柄名が必要です。")
+        return f"company_news:{stock_name}"
+    raise ValueError(f"未知のニュースタイプ: {news_type}")
+
+
+def load(cache_key: str) -> tuple[list, dict, float] | None:
+    """(整形済み記事, {API名: {フェーズ: 生レスポンスのID}}, 取得時刻 (UNIX秒)) を返します。エントリがなければ None。"""
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute("SELECT fetched_at FROM news_cache_entries WHERE cache_key = ?", (cache_key,)).fetchone()
+        if row is None:
+            return None
+        articles = [json.loads(r[0]) for r in conn.execute(
+            "SELECT article_json FROM news_articles WHERE cache_key = ? ORDER BY position", (cache_key,))]
+        raw_ids = {}
+        for api_name, phase, raw_id in conn.execute(
+                "SELECT api_name, phase, raw_id FROM news_raw_refs WHERE cache_key = ?", (cache_key,)):
+            raw_ids.setdefault(api_name, {})[phase] = raw_id
+        conn.execute("UPDATE news_cache_entries SET accessed_at = ? WHERE cache_key = ?", (time.time(), cache_key))
+    return articles, raw_ids, row[0]
+
+
+def put_raw_many(bodies: list) -> list:
+    """生レスポンス本文を圧縮して保存し、それぞれの ID (内容のハッシュ) を同じ順序で返します。"""
+    level = app_config.NEWS_SERVICE_CONFIG["raw_response_compress_level"]
+    now = time.time()
+    rows, raw_ids = {}, []
+    for body in bodies:
+        encoded = (body or "").encode("utf-8")
+        raw_id = hashlib.sha256(encoded).hexdigest()[:32]
+        raw_ids.append(raw_id)
+        if raw_id not in rows:
+            compressed = zlib.compress(encoded, level)
+            rows[raw_id] = (raw_id, compressed, len(compressed), now)
+    with _lock:
+        conn = _get_conn()
+        # 既にある内容は保存時刻だけ更新する (参照されていない生レスポンスは保存時刻から一定時間で削除されるため)
+        conn.executemany("INSERT INTO news_raw_blobs (raw_id, body_zlib, size_bytes, stored_at) VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT (raw_id) DO UPDATE SET stored_at = excluded.stored_at", list(rows.values()))
+    return raw_ids
+
+
+def get_raw(raw_id: str) -> str | None:
+    """ID の生レスポンス本文を返します。削除済み・未知の ID なら None。"""
+    with _lock:
+        row = _get_conn().execute("SELECT body_zlib FROM news_raw_blobs WHERE raw_id = ?", (raw_id,)).fetchone()
+    return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+
+def save(cache_key: str, articles: list, raw_ids: dict):
+    """
+    エントリを丸ごと置き換えて保存し、期限切れの削除とサイズ上限による追い出しを行います。
+    raw_ids は {API名: {フェーズ: 生レスポンスのID (put_raw_many の戻り値)}}。
+    """
+    now = time.time()
+    article_rows = [(cache_key, position, json.dumps(article, ensure_ascii=False, default=str)) for position, article in enumerate(articles)]
+    ref_rows = [(cache_key, api_name, phase, raw_id)
+                for api_name, phases in raw_ids.items() for phase, raw_id in phases.items() if raw_id]
+    size_bytes = sum(len(r[2].encode('utf-8')) for r in article_rows)
+
+    with _lock:
+        conn = _get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _delete_entries(conn, [cache_key])
+            # 参照する生レスポンスの圧縮後のサイズもエントリの大きさに含める
+            for _, _, _, raw_id in ref_rows:
+                row = conn.execute("SELECT size_bytes FROM news_raw_blobs WHERE raw_id = ?", (raw_id,)).fetchone()
+                size_bytes += row[0] if row else 0
+            conn.execute("INSERT INTO news_cache_entries (cache_key, fetched_at, accessed_at, size_bytes) VALUES (?, ?, ?, ?)",
+                         (cache_key, now, now, size_bytes))
+            conn.executemany("INSERT INTO news_articles (cache_key, position, article_json) VALUES (?, ?, ?)", article_rows)
+            conn.executemany("INSERT INTO news_raw_refs (cache_key, api_name, phase, raw_id) VALUES (?, ?, ?, ?)", ref_rows)
+            _expire_and_evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _delete_entries(conn: sqlite3.Connection, cache_keys: list):
+    for table in ("news_articles", "news_raw_refs", "news_cache_entries"):
+        conn.executemany(f"DELETE FROM {table} WHERE cache_key = ?", [(k,) for k in cache_keys])
+
+
+def _expire_and_evict(conn: sqlite3.Connection, now: float):
+    cfg = app_config.NEWS_SERVICE_CONFIG
+    expired = [r[0] for r in conn.execute("SELECT cache_key FROM news_cache_entries WHERE fetched_at < ?",
+                                          (now - cfg["stale_hard_expiry_hours"] * 3600,))]
+    if expired:
+        _delete_entries(conn, expired)
+        logger.info(f"ニュースキャッシュ: 有効期限切れの {len(expired)} 件を削除しました。")
+
+    # どのエントリからも参照されていない生レスポンス (キャッシュしなかった取得分・置き換えられた古い分) は、
+    # 画面のデバッグ表示から参照されうる間 (raw_response_retention_hours) だけ残す
+    orphaned = conn.execute(
+        "DELETE FROM news_raw_blobs WHERE stored_at < ? AND raw_id NOT IN (SELECT raw_id FROM news_raw_refs)",
+        (now - cfg["raw_response_retention_hours"] * 3600,)).rowcount
+    if orphaned:
+        logger.info(f"ニュースキャッシュ: 参照されていない生レスポンス {orphaned} 件を削除しました。")
+
+    # 上限には、エントリ (参照する生レスポンスを含む) に加えて、まだ残している参照されていない生レスポンスも数える
+    max_bytes = cfg["cache_max_bytes"]
+    total_bytes = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM news_cache_entries").fetchone()[0]
+    orphan_rows = conn.execute("SELECT raw_id, size_bytes FROM news_raw_blobs WHERE raw_id NOT IN (SELECT raw_id FROM news_raw_refs) "
+                               "ORDER BY stored_at").fetchall()
+    total_bytes += sum(size_bytes for _, size_bytes in orphan_rows)
+    if total_bytes <= max_bytes:
+        return
+
+    # まずは参照されていない生レスポンスを古いものから削除する (デバッグ表示でしか使わないため)
+    orphan_victims = []
+    for raw_id, size_bytes in orphan_rows:
+        if total_bytes <= max_bytes:
+            break
+        orphan_victims.append(raw_id)
+        total_bytes -= size_bytes
+    conn.executemany("DELETE FROM news_raw_blobs WHERE raw_id = ?", [(raw_id,) for raw_id in orphan_victims])
+
+    # それでも超えていれば、最も長く使われていないエントリから追い出し、それによって参照されなくなった生レスポンスも削除する
+    victims = []
+    for cache_key, size_bytes in conn.execute("SELECT cache_key, size_bytes FROM news_cache_entries ORDER BY accessed_at"):
+        if total_bytes <= max_bytes:
+            break
+        victims.append(cache_key)
+        total_bytes -= size_bytes
+    if victims:
+        victim_raw_ids = {r[0] for key in victims for r in conn.execute("SELECT raw_id FROM news_raw_refs WHERE cache_key = ?", (key,))}
+        _delete_entries(conn, victims)
+        conn.executemany("DELETE FROM news_raw_blobs WHERE raw_id = ? AND raw_id NOT IN (SELECT raw_id FROM news_raw_refs)",
+                         [(raw_id,) for raw_id in victim_raw_ids])
+    logger.info(f"ニュースキャッシュ: サイズ上限 ({max_bytes:,} バイト) を超えたため、参照されていない生レスポンス {len(orphan_victims)} 件と"
+                f"エントリ {len(victims)} 件を追い出しました。")
+
+
+def get_stats() -> dict:
+    """エントリ数・記事数・合計サイズ・保存している生レスポンスの数と圧縮後のサイズを返します。"""
+    with _lock:
+        conn = _get_conn()
+        entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM news_cache_entries").fetchone()
+        articles = conn.execute("SELECT COUNT(*) FROM news_articles").fetchone()[0]
+        raw_blobs, raw_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM news_raw_blobs").fetchone()
+    return {"entries": entries, "articles": articles, "total_bytes": total_bytes, "raw_blobs": raw_blobs, "raw_bytes": raw_bytes}
@@ -0,0 +1,195 @@
+# news_dedup.py
+# 複数のニュースAPIから集めた記事の「ほぼ同じ記事」をまとめる処理。
+# 同じ配信記事でも提供元によって見出しの表記 (末尾の媒体名、助詞、「トヨタ」/「トヨタ自動車」、全角/半角など) が少しずつ異なるため、
+# タイトルの先頭一致では取り除けません。ここではタイトル (+ 概要の先頭) の文字 n-gram の集合の Jaccard 係数が
+# 閾値以上のものを同じ記事とみなします。
+# 全ての組を比べないよう、n-gram 集合の MinHash 署名をバンドに分けたバケットから候補を探し (LSH)、
+# 候補だけを実際の Jaccard 係数で確かめるため、記事数に対してほぼ線形の時間で済みます。
+# 「日経平均、反発」/「日経平均、反落」のように文字はほとんど同じでも値動きの向きが逆の見出しや、
+# 「トヨタ、…」/「ホンダ、…」のように主語 (見出しの先頭) が異なる見出しは別の記事として扱います。
+import hashlib
+import re
+import unicodedata
+from urllib.parse import urlparse
+
+# MinHash 署名のバンド数と1バンドあたりの行数。Jaccard 係数 J の組が候補になる確率は 1 - (1 - J^ROWS)^BANDS
+# (J=0.5 で 99.7%、J=0.2 で 56%、無関係な見出し (J≈0.02) で 1% 未満)。
+LSH_BANDS = 20
+LSH_ROWS = 2
+
+_MERSENNE_PRIME = (1 << 61) - 1
+# MinHash の各ハッシュ関数 (a * x + b) mod p の係数。プロセスごとに変わらないよう固定の種から作る
+_MINHASH_PARAMS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_MERSENNE_PRIME - 1) + 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME)
+    for i in range(LSH_BANDS * LSH_ROWS)
+]
+
+# 見出し末尾の「 - Reuters」「｜日本経済新聞」のような媒体名
+_SOURCE_SUFFIX_PATTERN = re.compile(r"(?:\s+[-–—]\s+|\s*[|｜]\s*)[^|｜]{1,40}$")
+# 見出し先頭の「【速報】」「[update 1]」のようなラベル
+_LEADING_LABEL_PATTERN = re.compile(r"^\s*(?:【[^】]{0,20}】|\[[^\]]{0,20}\])\s*")
+# 比較に使わない文字 (空白・記号)
+_NOISE_PATTERN = re.compile(r"[\W_]+", re.UNICODE)
+# 値動き・業績の向きを表す語。片方の見出しにだけ上向きの語、もう片方にだけ下向きの語があれば別の記事とみなす
+_UP_TERMS = ("反発", "続伸", "上昇", "高値", "最高", "増益", "増収", "増配", "上方修正", "上振れ", "急騰", "大幅高",
+             "rise", "rises", "rose", "gain", "gains", "jump", "jumps", "rally", "rallies", "surge", "surges", "record", "raise", "raises", "up")
+_DOWN_TERMS = ("反落", "続落", "下落", "安値", "最低", "減益", "減収", "減配", "下方修正", "下振れ", "急落", "大幅安", "減少", "赤字",
+               "fall", "falls", "fell", "drop", "drops", "slump", "slumps", "slide", "slides", "plunge", "plunges", "loss", "cut", "cuts", "down")
+_WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+def normalize_text(text: str, strip_source_suffix: bool = False) -> str:
+    """NFKC 正規化・小文字化し、空白と記号を取り除きます。"""
+    return _NOISE_PATTERN.sub("", _normalize_title(text, strip_source_suffix))
+
+
+def _normalize_title(text: str, strip_source_suffix: bool) -> str:
+    # NFKC 正規化・小文字化 (と媒体名の除去) だけを行い、英単語の区切りを残す
+    if not text or text == 'N/A':
+        return ""
+    text = _LEADING_LABEL_PATTERN.sub("", unicodedata.normalize("NFKC", str(text)).lower())
+    if strip_source_suffix:
+        stripped = _SOURCE_SUFFIX_PATTERN.sub("", text)
+        if len(stripped) >= len(text) // 2:  # 見出しの大半を削ってしまう場合は媒体名ではないとみなす
+            text = stripped
+    return text
+
+
+def shingles(text: str, size: int = 2) -> set:
+    """文字 n-gram の集合を返します (text は normalize_text 済みのもの)。"""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _hash64(token: str) -> int:
+    # 組み込みの hash() はプロセスごとに値が変わるため、キャッシュや再生でも同じ結果になる blake2b を使う
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash_signature(shingle_set: set) -> tuple:
+    """n-gram 集合の MinHash 署名 (LSH_BANDS * LSH_ROWS 個の最小ハッシュ値) を返します。"""
+    hashes = [_hash64(s) for s in shingle_set]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _MINHASH_PARAMS)
+
+
+def _direction(title: str) -> set:
+    # 見出しに含まれる向きの語 ("up" / "down")。英語は単語単位、日本語は部分文字列で探す
+    words = set(_WORD_PATTERN.findall(title))
+    directions = set()
+    for label, terms in (("up", _UP_TERMS), ("down", _DOWN_TERMS)):
+        if any((term in words) if term.isascii() else (term in title) for term in terms):
+            directions.add(label)
+    return directions
+
+
+def is_direction_conflict(title_a: str, title_b: str) -> bool:
+    """一方が上向きだけ、もう一方が下向きだけの語を含む (例: 「反発」と「反落」) なら True。"""
+    a = _direction(_normalize_title(title_a, True))
+    b = _direction(_normalize_title(title_b, True))
+    return len(a) == 1 and len(b) == 1 and a != b
+
+
+def is_same_subject(title_a: str, title_b: str) -> bool:
+    """
+    見出しの先頭 (多くの場合は主語) が食い違わなければ True。
+    日本語は記号を除いた先頭2文字 (「トヨタ」/「トヨタ自動車」は同じ、「トヨタ」/「ホンダ」は異なる)、
+    英語は先頭の単語が一致するか、相手の見出しに含まれるか、相手の先頭の語の頭文字語 ("BOJ" と "Bank of Japan") なら同じとみなす。
+    """
+    a, b = _normalize_title(title_a, True), _normalize_title(title_b, True)
+    words_a, words_b = _WORD_PATTERN.findall(a), _WORD_PATTERN.findall(b)
+    if a[:1].isascii() and b[:1].isascii() and words_a and words_b:
+        first_a, first_b = words_a[0], words_b[0]
+        return (first_a == first_b or first_a in words_b or first_b in words_a
+                or "".join(w[0] for w in words_a[:len(first_b)]) == first_b
+                or "".join(w[0] for w in words_b[:len(first_a)]) == first_a)
+    if a[:1].isascii() != b[:1].isascii():
+        return True  # 日本語と英語の見出しは n-gram がほとんど重ならないため、ここでは判定しない
+    return normalize_text(a)[:2] == normalize_text(b)[:2]
+
+
+def _normalize_url(url: str) -> str:
+    parsed = urlparse(url)
+    if parsed.scheme and parsed.netloc:
+        return f"{parsed.netloc.lower().removeprefix('www.')}{parsed.path.rstrip('/')}"
+    return url.lower()
+
+
+def _fingerprint_text(article: dict, summary_chars: int) -> str:
+    text = normalize_text(article.get('タイトル', ''), strip_source_suffix=True)
+    if summary_chars > 0:
+        text += normalize_text(article.get('概要', ''))[:summary_chars]
+    return text
+
+
+def cluster_articles(articles: list, min_jaccard: float = 0.5, shingle_size: int = 2, summary_chars: int = 0) -> list[list[int]]:
+    """
+    ほぼ同じ記事のまとまりを、元のリストのインデックスのリストで返します (各まとまりと、その中は元の順序)。
+    同じ URL の記事、またはタイトルの文字 n-gram 集合の Jaccard 係数が min_jaccard 以上で、
+    主語と値動きの向きが食い違わない記事を同じまとまりにします。
+    """
+    band_buckets = {}   # (バンド番号, バンドの値) -> そのバンド値を持つまとまり番号
+    representatives = []  # まとまり番号 -> 代表 (最初の記事) の (n-gram 集合, タイトル)
+    url_index = {}      # 正規化した URL -> まとまり番号
+    clusters = []
+
+    for idx, article in enumerate(articles):
+        url = article.get('URL', '#')
+        url_key = _normalize_url(url) if url and url != '#' else None
+        title = article.get('タイトル', '')
+        shingle_set = shingles(_fingerprint_text(article, summary_chars), shingle_size)
+        signature = minhash_signature(shingle_set) if shingle_set else None
+        band_keys = [(band_no, signature[band_no * LSH_ROWS:(band_no + 1) * LSH_ROWS])
+                     for band_no in range(LSH_BANDS)] if signature else []
+
+        cluster_id = url_index.get(url_key) if url_key else None
+        if cluster_id is None and band_keys:
+            candidates = {cid for key in band_keys for cid in band_buckets.get(key, ())}
+            best_similarity = min_jaccard
+            for candidate_id in sorted(candidates):
+                candidate_shingles, candidate_title = representatives[candidate_id]
+                similarity = jaccard(shingle_set, candidate_shingles)
+                if (similarity >= best_similarity and is_same_subject(title, candidate_title)
+                        and not is_direction_conflict(title, candidate_title)):
+                    best_similarity, cluster_id = similarity, candidate_id
+
+        if cluster_id is None:
+            cluster_id = len(clusters)
+            clusters.append([])
+            # 比較対象はまとまりの最初の記事 (代表) だけにし、連鎖的にまとまりが広がらないようにする
+            representatives.append((shingle_set, title))
+            for key in band_keys:
+                band_buckets.setdefault(key, []).append(cluster_id)
+        clusters[cluster_id].append(idx)
+        if url_key and url_key not in url_index:
+            url_index[url_key] = cluster_id
+    return clusters
+
+
+def merge_cluster(articles: list) -> dict:
+    """
+    まとまりの最初の記事を代表として返します。代表の 'ソース' には各記事の媒体名を " / " でつなげ、
+    '関連URL' には代表以外の記事の URL (重複なし) を入れます。
+    """
+    representative = dict(articles[0])
+    sources, related_urls = [], []
+    seen_urls = {representative.get('URL', '#')}
+    for article in articles:
+        source = article.get('ソース', 'N/A')
+        if source and source != 'N/A' and source not in sources:
+            sources.append(source)
+        url = article.get('URL', '#')
+        if url and url != '#' and url not in seen_urls:
+            seen_urls.add(url)
+            related_urls.append(url)
+    if sources:
+        representative['ソース'] = " / ".join(sources)
+    representative['関連URL'] = related_urls
+    return representative
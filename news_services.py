@@ -9,11 +9,20 @@ import time
 import os
 import streamlit as st # キャッシュ用
 import re # スニペットからの日付抽出用
-from concurrent.futures import ThreadPoolExecutor, as_completed # ★ 並列処理のために追加
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait # ★ 並列処理のために追加
 from functools import partial # ★ 並列処理のために追加
 
 # config から設定をインポート
 import config as app_config
+import data_sources
+import http_client
+import news_cache_store
+import news_dedup
+import provider_health
+import rate_limiter
 
 # Google API Client Library (オプション)
 try:
@@ -38,79 +47,124 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 # --- キャッシュ関連ヘルパー関数 ---
-def _get_cache_filepath(news_type: str, stock_name_for_company: str = None, is_cloud_run: bool = False) -> str | None:
-    base_dir = app_config.NEWS_SERVICE_CONFIG["cache_dir_colab"]
-    if is_cloud_run:
-        base_dir = "/tmp/news_cache_gcr" # Cloud Runでは一時ディレクトリを使用
-    if not os.path.exists(base_dir) and not is_cloud_run: # Cloud Runでは/tmpは常に存在すると仮定
-        try: os.makedirs(base_dir)
-        except OSError as e: logger.error(f"キャッシュディレクトリの作成に失敗: {base_dir}, エラー: {e}"); return None
-    elif not os.path.exists(base_dir) and is_cloud_run: # Cloud Runで/tmp/news_cache_gcrが存在しない場合
-        try: os.makedirs(base_dir)
-        except OSError as e: logger.error(f"Cloud Run キャッシュディレクトリの作成に失敗: {base_dir}, エラー: {e}"); return None
-
-    filename_part = ""
-    if news_type == "market_news": filename_part = "market_news_cache"
-    elif news_type == "company_news":
-        if not stock_name_for_company: logger.error("企業ニュースのキャッシュファイル名生成には銘柄名が必要です。"); return None
-        safe_stock_name = "".join(c if c.isalnum() else "_" for c in stock_name_for_company)
-        filename_part = f"{safe_stock_name}_company_news_cache"
-    else: logger.error(f"未知のニュースタイプ: {news_type}"); return None
-    return os.path.join(base_dir, f"{filename_part}.json")
-
-def _load_from_cache(filepath: str | None, expiry_hours: int) -> tuple[list | None, dict | None]:
-    """キャッシュファイルから整形済みデータと生レスポンスを読み込み、有効期限内であれば返す"""
-    if filepath is None or not os.path.exists(filepath): return None, None
+# キャッシュは news_cache_store (SQLite) に記事・生レスポンスを1件1行で保存する
+def _get_cache_key(news_type: str, stock_name_for_company: str = None) -> str | None:
     try:
-        with open(filepath, 'r', encoding='utf-8') as f: cache_data = json.load(f)
-        timestamp_str = cache_data.get("timestamp")
-        if timestamp_str:
-            cached_time_naive = datetime.datetime.fromisoformat(timestamp_str)
-            if cached_time_naive.tzinfo is None:
-                    cached_time_utc = cached_time_naive.replace(tzinfo=datetime.timezone.utc)
-            else:
-                    cached_time_utc = cached_time_naive.astimezone(datetime.timezone.utc)
-
-            if datetime.datetime.now(datetime.timezone.utc) - cached_time_utc < datetime.timedelta(hours=expiry_hours):
-                logger.info(f"有効なキャッシュが見つかりました: {filepath}")
-                formatted_data = cache_data.get("formatted_data", [])
-                raw_responses = cache_data.get("raw_api_responses_cache", {})
-                return formatted_data, raw_responses
-        logger.info(f"キャッシュは古いか、タイムスタンプが無効です: {filepath}")
-    except (IOError, json.JSONDecodeError, KeyError, ValueError) as e:
-        logger.error(f"キャッシュファイルの読み込み/解析に失敗: {filepath}, エラー: {e}")
-    return None, None
-
-def _save_to_cache(filepath: str | None, formatted_data: list, raw_responses_to_cache: dict):
-    """取得した整形済みデータと生レスポンスをキャッシュファイルに保存する"""
-    if filepath is None: logger.error("キャッシュファイルパスがNoneのため、保存できません。"); return
+        return news_cache_store.make_cache_key(news_type, stock_name_for_company)
+    except ValueError as e:
+        logger.error(f"キャッシュキーを生成できません: {e}")
+        return None
+
+def _load_from_cache(cache_key: str | None, expiry_hours: float, stale_hard_expiry_hours: float | None = None) -> tuple[list | None, dict | None, bool]:
+    """
+    キャッシュから (整形済みデータ, 生レスポンスのID, 期限切れか) を返す。
+    有効期限 (expiry_hours) 内ならそのまま返し、期限切れでも stale_hard_expiry_hours 内であれば期限切れの印を付けて返す
+    (stale-while-revalidate 用)。それより古い・読めない場合は (None, None, False)。
+    """
+    if cache_key is None: return None, None, False
     try:
-        cache_content = {
-            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-            "formatted_data": formatted_data,
-            "raw_api_responses_cache": raw_responses_to_cache
-        }
-        cache_dir = os.path.dirname(filepath)
-        if not os.path.exists(cache_dir):
-            try:
-                os.makedirs(cache_dir)
-                logger.info(f"キャッシュディレクトリを作成しました: {cache_dir}")
-            except OSError as e:
-                logger.error(f"キャッシュディレクトリの作成に失敗: {cache_dir}, エラー: {e}")
-                return
+        entry = news_cache_store.load(cache_key)
+    except sqlite3.Error as e:
+        logger.error(f"ニュースキャッシュの読み込みに失敗: {cache_key}, エラー: {e}")
+        return None, None, False
+    if entry is None: return None, None, False
+    formatted_data, raw_ids, fetched_at = entry
+    age_hours = (time.time() - fetched_at) / 3600
+    if age_hours < expiry_hours:
+        logger.info(f"有効なキャッシュが見つかりました: {cache_key}")
+        return formatted_data, raw_ids, False
+    if stale_hard_expiry_hours is not None and age_hours < stale_hard_expiry_hours:
+        logger.info(f"期限切れのキャッシュを使用します (取得から {age_hours:.1f}時間): {cache_key}")
+        return formatted_data, raw_ids, True
+    logger.info(f"キャッシュは古いため使用しません: {cache_key}")
+    return None, None, False
+
+def _save_to_cache(cache_key: str | None, formatted_data: list, raw_ids_to_cache: dict):
+    """取得した整形済みデータと生レスポンスのIDをキャッシュに保存する (エントリ単位のトランザクションで置き換える)"""
+    if cache_key is None: logger.error("キャッシュキーがNoneのため、保存できません。"); return
+    try:
+        news_cache_store.save(cache_key, formatted_data, raw_ids_to_cache)
+        logger.info(f"データをキャッシュに保存しました: {cache_key} ({len(formatted_data)}件)")
+    except (sqlite3.Error, OSError) as e: logger.error(f"ニュースキャッシュへの保存に失敗: {cache_key}, エラー: {e}")
+
+# 生レスポンスはデバッグ表示でしか使わないため、取得結果やセッションには ID だけを持たせ、本文は圧縮して news_cache_store に置く
+def _store_raw_responses(bodies: list) -> list:
+    """生レスポンス本文を保存し、ID のリストを返す。保存できなかった場合は全て None。"""
+    if not bodies: return []
+    try:
+        return news_cache_store.put_raw_many(bodies)
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"ニュースAPIの生レスポンスの保存に失敗: {e}")
+        return [None] * len(bodies)
+
+def load_raw_api_response(raw_id: str | None) -> str | None:
+    """fetch_all_stock_news の raw_api_response_ids の ID から、生レスポンス本文を読み込む (保存期間を過ぎていれば None)。"""
+    if not raw_id: return None
+    try:
+        return news_cache_store.get_raw(raw_id)
+    except (sqlite3.Error, OSError, zlib.error) as e:
+        logger.error(f"ニュースAPIの生レスポンスの読み込みに失敗: {raw_id}, エラー: {e}")
+        return None
+
+# --- ニュース取得用の共有スレッドプール ---
+# 呼び出しごとにスレッドプールを作ると、そのたびにスレッドの生成・破棄が発生し、同時に複数の銘柄を取得すると
+# スレッド数が際限なく増えるため、全てのニュース取得で1つのプール (上限 NEWS_SERVICE_CONFIG["max_workers"]) を共有する
+_news_executor = None
+_news_executor_lock = threading.Lock()
+_news_executor_stats = {"submitted": 0, "active": 0, "peak_active": 0}
+
+
+def _get_news_executor() -> ThreadPoolExecutor:
+    global _news_executor
+    with _news_executor_lock:
+        if _news_executor is None:
+            _news_executor = ThreadPoolExecutor(max_workers=app_config.NEWS_SERVICE_CONFIG["max_workers"], thread_name_prefix="news")
+        return _news_executor
+
+
+def _submit_news_task(task):
+    def _run():
+        with _news_executor_lock:
+            _news_executor_stats["active"] += 1
+            _news_executor_stats["peak_active"] = max(_news_executor_stats["peak_active"], _news_executor_stats["active"])
+        try:
+            return task()
+        finally:
+            with _news_executor_lock:
+                _news_executor_stats["active"] -= 1
+
+    executor = _get_news_executor()
+    with _news_executor_lock:
+        _news_executor_stats["submitted"] += 1
+    return executor.submit(_run)
+
+
+def get_news_executor_stats() -> dict:
+    """共有スレッドプールの利用状況 (投入したタスク数・実行中の数・実行中の最大数・ワーカー数) を返します。"""
+    with _news_executor_lock:
+        return {**_news_executor_stats, "max_workers": app_config.NEWS_SERVICE_CONFIG["max_workers"]}
 
-        with open(filepath, 'w', encoding='utf-8') as f: json.dump(cache_content, f, ensure_ascii=False, indent=4)
-        logger.info(f"データをキャッシュに保存しました: {filepath}")
-    except IOError as e: logger.error(f"キャッシュファイルへの保存に失敗: {filepath}, エラー: {e}")
 
 # --- 共通ヘルパー関数 (APIリクエスト、日付パース) ---
-def _make_api_request(url, params=None, headers=None, api_name="API", method="GET", data=None, timeout=15, return_raw_text=False):
+def _make_api_request(url, params=None, headers=None, api_name="API", method="GET", data=None, timeout=None, return_raw_text=False):
+    if timeout is None:
+        timeout = _current_request_timeout()
+    # ヘッダーは認証情報しか載せていないため記録のキーに含めず、params / data からは APIキー類を除く
+    request = {"url": url, "method": method.upper(), "params": data_sources.redact(params),
+               "data": data_sources.redact(data), "return_raw_text": return_raw_text}
+    return data_sources.call(
+        "news", api_name, request,
+        lambda: _send_api_request(url, params, headers, api_name, method, data, timeout, return_raw_text))
+
+
+def _send_api_request(url, params=None, headers=None, api_name="API", method="GET", data=None, timeout=None, return_raw_text=False):
     logger.debug(f"{api_name} - リクエスト開始: {method} {url}, Params: {params}, Headers: {headers is not None}, Data: {data is not None}")
     # 初期値をエラーを示すJSON文字列にすることも検討 (ただし、成功時は上書きされる)
     raw_text_response_for_debug = json.dumps({"status": "initiated", "api": api_name, "url": url})
     try:
-        if method.upper() == "POST": response = requests.post(url, params=params, headers=headers, json=data, timeout=timeout)
-        else: response = requests.get(url, params=params, headers=headers, timeout=timeout)
+        session = http_client.get_session() # 接続を使い回すため、共有セッション経由でリクエストする
+        if method.upper() == "POST": response = session.post(url, params=params, headers=headers, json=data, timeout=timeout)
+        else: response = session.get(url, params=params, headers=headers, timeout=timeout)
         raw_text_response_for_debug = response.text
         response.raise_for_status() # HTTPエラーがあればここで例外発生
         logger.debug(f"{api_name} - リクエスト成功: Status {response.status_code}")
@@ -487,6 +541,11 @@ def _format_tavily_articles(articles_response, news_type_for_log=""):
         })
     return news_list
 
+def _execute_tavily_search(api_key, query, days, api_name):
+    request = {"query": query, "search_depth": "basic", "topic": "news",
+               "max_results": app_config.NEWS_SERVICE_CONFIG["max_news_per_api"], "include_domains": ["*.jp"], "days": days}
+    return data_sources.call("news", api_name, request, lambda: TavilyClient(api_key=api_key).search(**request))
+
 def fetch_tavily_company_news(stock_name, api_key):
     err_msg_sdk = "Tavily SDK未インストール"
     if TavilyClient is None: return [], err_msg_sdk, _generate_error_response_text("Tavily (Company)", err_msg_sdk, details="SDK not found.")
@@ -494,10 +553,8 @@ def fetch_tavily_company_news(stock_name, api_key):
     if not api_key: return [], err_msg_key, _generate_error_response_text("Tavily (Company)", err_msg_key, "401")
     raw_resp_text = _generate_error_response_text("Tavily (Company)", "API call initiated, no response yet.") # Default error
     try:
-        client = TavilyClient(api_key=api_key)
         query = f'"{stock_name}"の業績、決算、株価、経営見通し、新製品、または提携に関する日本の最新ニュース'
-        resp_json = client.search(query=query, search_depth="basic", topic="news",
-                                  max_results=app_config.NEWS_SERVICE_CONFIG["max_news_per_api"], include_domains=["*.jp"], days=30)
+        resp_json = _execute_tavily_search(api_key, query, 30, "Tavily (Company)")
         raw_resp_text = json.dumps(resp_json, ensure_ascii=False, indent=2) if resp_json else _generate_error_response_text("Tavily (Company)", "API returned None or empty response.")
         if resp_json and "results" in resp_json: # Check for successful response structure
             formatted_news = _format_tavily_articles(resp_json, "Company")
@@ -516,10 +573,8 @@ def fetch_tavily_market_news(api_key):
     if not api_key: return [], err_msg_key, _generate_error_response_text("Tavily (Market)", err_msg_key, "401")
     raw_resp_text = _generate_error_response_text("Tavily (Market)", "API call initiated, no response yet.")
     try:
-        client = TavilyClient(api_key=api_key)
         query = "日本の株式市場の動向、日経平均、TOPIX、または一般的な相場見通しに関する最新ニュース"
-        resp_json = client.search(query=query, search_depth="basic", topic="news",
-                                  max_results=app_config.NEWS_SERVICE_CONFIG["max_news_per_api"], include_domains=["*.jp"], days=7)
+        resp_json = _execute_tavily_search(api_key, query, 7, "Tavily (Market)")
         raw_resp_text = json.dumps(resp_json, ensure_ascii=False, indent=2) if resp_json else _generate_error_response_text("Tavily (Market)", "API returned None or empty response.")
         if resp_json and "results" in resp_json:
             formatted_news = _format_tavily_articles(resp_json, "Market")
@@ -613,6 +668,15 @@ def _format_google_cse_articles(articles_response, news_type_for_log=""):
         })
     return news_list
 
+def _execute_google_cse(api_key, cse_id, query, api_name):
+    num = app_config.NEWS_SERVICE_CONFIG["max_news_per_api"]
+
+    def _live():
+        service = google_build_service("customsearch", "v1", developerKey=api_key)
+        return service.cse().list(q=query, cx=cse_id, lr='lang_ja', num=num).execute()
+
+    return data_sources.call("news", api_name, {"q": query, "lr": "lang_ja", "num": num}, _live)
+
 def fetch_google_cse_company_news(stock_name, api_key, cse_id):
     err_msg_sdk = "google-api-python-client未インストール"
     if google_build_service is None: return [], err_msg_sdk, _generate_error_response_text("GoogleCSE (Company)", err_msg_sdk, details="SDK not found.")
@@ -625,8 +689,7 @@ def fetch_google_cse_company_news(stock_name, api_key, cse_id):
     query = f'"{stock_name}" (業績 OR 決算 OR 株価 OR 見通し OR 新製品 OR 提携) site:.jp after:{one_month_ago.strftime("%Y-%m-%d")}'
     raw_resp_text = _generate_error_response_text("GoogleCSE (Company)", "API call initiated, no response yet.")
     try:
-        service = google_build_service("customsearch", "v1", developerKey=api_key)
-        resp_json = service.cse().list(q=query, cx=cse_id, lr='lang_ja', num=app_config.NEWS_SERVICE_CONFIG["max_news_per_api"]).execute()
+        resp_json = _execute_google_cse(api_key, cse_id, query, "GoogleCSE (Company)")
         raw_resp_text = json.dumps(resp_json, ensure_ascii=False, indent=2) if resp_json else _generate_error_response_text("GoogleCSE (Company)", "API returned None or empty response.")
         if resp_json and "items" in resp_json: # Check for successful response structure
             formatted_news = _format_google_cse_articles(resp_json, "Company")
@@ -660,8 +723,7 @@ def fetch_google_cse_market_news(api_key, cse_id):
     query = f"(日本株 OR 株式市場 OR 日経平均 OR TOPIX OR 相場見通し) site:.jp after:{one_week_ago.strftime('%Y-%m-%d')}"
     raw_resp_text = _generate_error_response_text("GoogleCSE (Market)", "API call initiated, no response yet.")
     try:
-        service = google_build_service("customsearch", "v1", developerKey=api_key)
-        resp_json = service.cse().list(q=query, cx=cse_id, lr='lang_ja', num=app_config.NEWS_SERVICE_CONFIG["max_news_per_api"]).execute()
+        resp_json = _execute_google_cse(api_key, cse_id, query, "GoogleCSE (Market)")
         raw_resp_text = json.dumps(resp_json, ensure_ascii=False, indent=2) if resp_json else _generate_error_response_text("GoogleCSE (Market)", "API returned None or empty response.")
         if resp_json and "items" in resp_json:
             formatted_news = _format_google_cse_articles(resp_json, "Market")
@@ -743,162 +805,273 @@ def fetch_bing_market_news(api_key):
 
 
 # --- 重複削除処理 ---
-def _deduplicate_news_list(articles_list: list, prefix_length: int) -> list:
-    seen_identifiers = set()
+def _deduplicate_news_list(articles_list: list) -> list:
+    """
+    同じ URL の記事と、見出しがほぼ同じ記事 (提供元ごとの表記ゆれ) を1件にまとめる (news_dedup.py)。
+    まとめた記事の 'ソース' には各提供元の媒体名を、'関連URL' には他の記事の URL を入れる。
+    """
+    cfg = app_config.NEWS_SERVICE_CONFIG
+    clusters = news_dedup.cluster_articles(
+        articles_list, min_jaccard=cfg["near_duplicate_min_jaccard"],
+        shingle_size=cfg["near_duplicate_shingle_size"], summary_chars=cfg["near_duplicate_summary_chars"])
     deduplicated_list = []
-    for article in articles_list:
-        title = article.get('タイトル', 'N/A')
-        url = article.get('URL', '#')
-        parsed_url = urlparse(url)
-        normalized_url = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}" if parsed_url.scheme and parsed_url.netloc else url
-        check_key_title_part = title[:prefix_length].strip().lower() if title != 'N/A' and prefix_length > 0 else title.lower()
-        identifier = (check_key_title_part, normalized_url.lower())
-        if title == 'N/A' and url == '#':
-            deduplicated_list.append(article); continue
-        if identifier not in seen_identifiers:
-            seen_identifiers.add(identifier)
-            deduplicated_list.append(article)
-        else: logger.debug(f"重複項目（キー: '{identifier}'）を検出、削除: {title} (URL: {url})")
+    for cluster in clusters:
+        members = [articles_list[i] for i in cluster]
+        for duplicate in members[1:]:
+            logger.debug(f"重複記事を検出、統合: {duplicate.get('タイトル', 'N/A')} (URL: {duplicate.get('URL', '#')}) -> {members[0].get('タイトル', 'N/A')}")
+        deduplicated_list.append(news_dedup.merge_cluster(members))
+    if len(deduplicated_list) < len(articles_list):
+        logger.info(f"ニュースの重複除去: {len(articles_list)}件 -> {len(deduplicated_list)}件")
     return deduplicated_list
 
 # --- ▼▼▼ ここから修正 ▼▼▼ ---
+_NEWS_API_FETCHERS = {
+    "newsapi": (fetch_newsapi_company_news, fetch_newsapi_market_news), "gnews": (fetch_gnews_company_news, fetch_gnews_market_news),
+    "brave": (fetch_brave_company_news, fetch_brave_market_news), "tavily": (fetch_tavily_company_news, fetch_tavily_market_news),
+    "google_cse": (fetch_google_cse_company_news, fetch_google_cse_market_news), "bing": (fetch_bing_company_news, fetch_bing_market_news),
+}
+_NEWS_API_KEY_NAMES = {
+    "newsapi": "NEWS_API_KEY", "gnews": "GNEWS_API_KEY", "brave": "BRAVE_API_KEY", "tavily": "TAVILY_API_KEY",
+    "google_cse": "GOOGLE_CSE_API_KEY", "bing": "BING_API_KEY",
+}
+_GOOGLE_CSE_ID_KEY_NAME = "GOOGLE_CSE_ID"
+_PHASE_LABELS = {"company": ("企業", "Company"), "market": ("市場", "Market")}
+
+_refreshing_cache_keys = set()  # バックグラウンドで更新中のキャッシュキー (同じキャッシュの更新を重複して走らせない)
+_refreshing_lock = threading.Lock()
+
+# プロバイダーごとの同時実行数の上限 (複数銘柄をまとめて取得するときに、1つのAPIへリクエストが集中しないようにする)
+_provider_semaphores = {}
+# 実行中のプロバイダータスクの情報 (_make_api_request がタイムアウトを決めるために参照する)
+_provider_context = threading.local()
+
+
+def _resolve_news_credentials(active_apis: dict, api_key_manager) -> dict:
+    """{API名: (APIキー, Google CSE ID)} を返す。api_key_manager はセッションに依存するため、呼び出し元のスレッドで解決する。"""
+    credentials = {}
+    for api_name in active_apis:
+        api_key_actual_name = _NEWS_API_KEY_NAMES.get(api_name)
+        api_key_value = api_key_manager.get_api_key(api_key_actual_name) if api_key_actual_name else None
+        cse_id_value = api_key_manager.get_api_key(_GOOGLE_CSE_ID_KEY_NAME) if api_name == "google_cse" else None
+        credentials[api_name] = (api_key_value, cse_id_value)
+    return credentials
+
+
+def _get_provider_semaphore(api_name: str) -> threading.BoundedSemaphore:
+    with _news_executor_lock:
+        semaphore = _provider_semaphores.get(api_name)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(app_config.NEWS_SERVICE_CONFIG["provider_max_concurrency"])
+            _provider_semaphores[api_name] = semaphore
+        return semaphore
+
+
+def _current_request_timeout() -> float:
+    """
+    実行中のプロバイダーの適応タイムアウト (provider_health) を返す。締め切りが先に来る場合はそこまでの残り時間。
+    プロバイダータスクの外から呼ばれた場合は既定値。
+    """
+    api_name = getattr(_provider_context, "api_name", None)
+    if api_name is None:
+        return app_config.PROVIDER_HEALTH_CONFIG["default_timeout_sec"]
+    timeout = provider_health.get_health(f"news_{api_name}").timeout()
+    return max(1.0, min(timeout, _provider_context.deadline - time.monotonic()))
+
+
+def get_news_provider_health() -> list[dict]:
+    """ニュースAPIごとの状態 (遮断中か、直近のエラー率、応答時間の p50/p95、現在のタイムアウトなど) を返す (診断表示用)。"""
+    return [h for h in provider_health.get_all_snapshots() if h["name"].startswith("news_")]
+
+
+def _run_provider_task(api_name: str, task, deadline: float, track_health: bool = True):
+    """
+    プロバイダーごとの同時実行数の上限とレート制限 (rate_limiter の "news_<API名>") の範囲で task を実行する。
+    締め切り (time.monotonic() の値) までに順番が回ってこなければ、リクエストを送らずに TimeoutError を送出する。
+    track_health が True なら応答時間と成否 (エラーを返したか) を provider_health に記録し、遮断中のプロバイダーは呼び出さない。
+    締め切りを過ぎてから返った呼び出しは記録しない (呼び出し側がタイムアウトとして失敗を記録するため)。
+    """
+    health = provider_health.get_health(f"news_{api_name}") if track_health else None
+    if health is not None and not health.allow_request():
+        message = f"直近のエラーが多いため一時的に呼び出しを停止しています ({api_name})"
+        return [], message, _generate_error_response_text(api_name, "Circuit breaker open", status_code="503", details=message)
+    semaphore = _get_provider_semaphore(api_name)
+    if not semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+        raise TimeoutError("同時実行数の上限")
+    try:
+        if not rate_limiter.get_limiter(f"news_{api_name}").acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise TimeoutError("レート制限")
+        _provider_context.api_name, _provider_context.deadline = api_name, deadline
+        started = time.monotonic()
+        ok = False
+        try:
+            result = task()
+            ok = result[1] is None
+            return result
+        finally:
+            _provider_context.api_name = None
+            if health is not None and time.monotonic() <= deadline:
+                health.record(time.monotonic() - started, ok)
+    finally:
+        semaphore.release()
+
+
+def _fetch_news_jobs(jobs: list, credentials: dict) -> dict:
+    """
+    jobs [(銘柄名, フェーズ, キャッシュキー)] のニュースを全プロバイダーから同時に取得し、締め切りまでに届いた分を返す
+    (市場ニュースの銘柄名は None)。タイムアウトしたプロバイダーがないジョブはキャッシュに保存する。
+    戻り値: {(銘柄名, フェーズ): {"news": [記事], "errors": {API名: エラー}, "raw": {API名: 生レスポンスのID}, "timed_out": bool}}
+    """
+    results = {(stock_name, phase): {"news": [], "errors": {}, "raw": {}, "timed_out": False} for stock_name, phase, _ in jobs}
+    future_to_task = {}
+    deadline_sec = app_config.NEWS_SERVICE_CONFIG["fetch_deadline_sec"]
+    deadline = time.monotonic() + deadline_sec
+    job_labels = ", ".join(f"{stock_name or '市場'}:{_PHASE_LABELS[phase][0]}" for stock_name, phase, _ in jobs)
+    logger.info(f"--- ニュース取得開始 [{job_labels}, 並列処理] ---")
+    # 銘柄ごとに全プロバイダーのタスクを並べて投入し、同じプロバイダーのタスクが固まってワーカーを占有しないようにする
+    for stock_name, phase, _ in jobs:
+        for api_name, (api_key_value, cse_id_value) in credentials.items():
+            fetch_func = _NEWS_API_FETCHERS[api_name][0 if phase == "company" else 1]
+            args = (stock_name,) if phase == "company" else ()
+            args += (api_key_value, cse_id_value) if api_name == "google_cse" else (api_key_value,)
+            logger.info(f"  Submitting {phase} news task for {api_name.upper()}{f' ({stock_name})' if stock_name else ''}...")
+            # APIキーがない場合はリクエストを送らずにエラーを返すだけなので、プロバイダーの状態には数えない
+            track_health = bool(api_key_value) and (api_name != "google_cse" or bool(cse_id_value))
+            task = partial(_run_provider_task, api_name, partial(fetch_func, *args), deadline, track_health=track_health)
+            future_to_task[_submit_news_task(task)] = (stock_name, phase, api_name, track_health)
+
+    # 全体で1つの締め切りまで待ち、間に合わなかったプロバイダーはタイムアウトとして扱って、取得できた分だけを返す
+    done, _ = wait(future_to_task, timeout=deadline_sec) if future_to_task else (set(), set())
+    for future, (stock_name, phase, api_name, track_health) in future_to_task.items():  # 投入順に処理して、重複除去の結果を実行ごとに揃える
+        label_ja, label_en = _PHASE_LABELS[phase]
+        result = results[(stock_name, phase)]
+        try:
+            if future not in done:
+                # 締め切りの時点でまだ応答を待っていた (取り消せなかった) 呼び出しは、プロバイダーの失敗として記録する。
+                # 遅れて返った結果は使わず、成功としても数えない (_run_provider_task を参照)
+                if not future.cancel() and track_health:
+                    provider_health.get_health(f"news_{api_name}").record(deadline_sec, ok=False)
+                raise TimeoutError()
+            news_items, err, raw_resp_text = future.result()
+            result["news"].extend(news_items)
+            result["errors"][api_name] = err
+            result["raw"][api_name] = raw_resp_text if raw_resp_text else _generate_error_response_text(api_name, f"No response text from fetch function ({label_en}).")
+            logger.info(f"  {api_name.upper()} {label_ja}ニュース取得完了{f' ({stock_name})' if stock_name else ''} (件数: {len(news_items)}, エラー: {err})")
+        except TimeoutError as exc:
+            # 締め切りまでに応答がなかった、またはプロバイダーの同時実行数・レート制限で順番が回ってこなかった
+            result["timed_out"] = True
+            result["errors"][api_name] = f"{label_ja}ニュース取得がタイムアウトしました ({api_name}, {deadline_sec}秒{f', {exc}' if str(exc) else ''})"
+            logger.warning(f"{result['errors'][api_name]}{f' ({stock_name})' if stock_name else ''}")
+            result["raw"][api_name] = _generate_error_response_text(api_name, f"Deadline exceeded ({label_en})", status_code="408", details=f"No response within {deadline_sec} seconds.")
+        except Exception as exc:
+            result["errors"][api_name] = f"{label_ja}ニュースの並列取得中に例外発生 ({api_name}): {exc}"
+            logger.error(result["errors"][api_name], exc_info=True)
+            result["raw"][api_name] = _generate_error_response_text(api_name, f"Exception during parallel fetch ({label_en})", details=str(exc))
+
+    # 生レスポンス本文はまとめて圧縮・保存し、結果には ID だけを残す
+    raw_slots = [(result["raw"], api_name) for result in results.values() for api_name in result["raw"]]
+    for (raw, api_name), raw_id in zip(raw_slots, _store_raw_responses([raw[api_name] for raw, api_name in raw_slots])):
+        raw[api_name] = raw_id
+
+    # タイムアウトしたプロバイダーがあるジョブは、欠けた結果で有効期限までキャッシュを埋めないよう保存しない
+    for stock_name, phase, cache_key in jobs:
+        result = results[(stock_name, phase)]
+        if not result["timed_out"] and cache_key:
+            _save_to_cache(cache_key, result["news"], {api_name: {phase: raw} for api_name, raw in result["raw"].items()})
+    timed_out_labels = [f"{stock_name or '市場'}:{_PHASE_LABELS[phase][0]}" for (stock_name, phase), r in results.items() if r["timed_out"]]
+    logger.info(f"--- ニュース取得終了 [タイムアウト: {timed_out_labels or 'なし'}] ---")
+    executor_stats = get_news_executor_stats()
+    logger.info(f"ニューススレッドプール: 実行中 {executor_stats['active']}/{executor_stats['max_workers']}, "
+                f"最大同時実行 {executor_stats['peak_active']}, 累計タスク {executor_stats['submitted']}")
+    http_client.log_pool_stats(job_labels)
+    return results
+
+
+def _start_background_refresh(jobs: list, credentials: dict):
+    """期限切れのキャッシュを返した後、別スレッドで jobs を取り直してキャッシュを更新する。同じキャッシュの更新が進行中のジョブは除く。"""
+    with _refreshing_lock:
+        jobs = [job for job in jobs if job[2] and job[2] not in _refreshing_cache_keys]
+        _refreshing_cache_keys.update(cache_key for _, _, cache_key in jobs)
+    if not jobs:
+        return
+
+    def _refresh():
+        try:
+            _fetch_news_jobs(jobs, credentials)
+        except Exception as e:
+            logger.error(f"ニュースキャッシュのバックグラウンド更新に失敗 ({[cache_key for _, _, cache_key in jobs]}): {e}", exc_info=True)
+        finally:
+            with _refreshing_lock:
+                _refreshing_cache_keys.difference_update(cache_key for _, _, cache_key in jobs)
+
+    logger.info(f"ニュースキャッシュをバックグラウンドで更新します ({[cache_key for _, _, cache_key in jobs]})")
+    threading.Thread(target=_refresh, name="news-refresh", daemon=True).start()
+
+
+def fetch_news_for_stocks(
+        stock_names: list,
+        active_apis_config: dict,
+        api_key_manager
+    ) -> dict:
+    """
+    複数銘柄のニュースをまとめて取得し、{銘柄名: fetch_all_stock_news と同じ形式の dict} を返す。
+    各APIの生レスポンスは "raw_api_response_ids" ({API名: {"company"/"market": ID}}) として返し、本文は load_raw_api_response() で読み込む。
+    市場ニュースは全銘柄で共通のため1回だけ取得 (またはキャッシュから読み込み) し、各銘柄の結果で同じリストを共有する。
+    キャッシュにない銘柄の企業ニュースは、銘柄 × プロバイダーのタスクを一度に投入して1つの締め切りまで待つ
+    (プロバイダーごとの同時実行数とレート制限の範囲で並列に実行される)。
+    """
+    cfg = app_config.NEWS_SERVICE_CONFIG
+    stock_names = list(dict.fromkeys(stock_names))  # 同じ銘柄は1回だけ取得する
+    active_apis = {k: v for k, v in active_apis_config.items() if v and k in _NEWS_API_FETCHERS}
+    targets = [(stock_name, "company", _get_cache_key("company_news", stock_name)) for stock_name in stock_names]
+    targets.append((None, "market", _get_cache_key("market_news")))
+
+    # --- キャッシュの確認 ---
+    # 有効期限内のキャッシュはそのまま使う。stale-while-revalidate が有効なら、期限切れでも上限 (stale_hard_expiry_hours)
+    # 内のキャッシュはすぐに返し、裏で取り直す。キャッシュがない・古すぎるものだけ、この場で外部APIを待つ。
+    stale_hard_expiry_hours = cfg["stale_hard_expiry_hours"] if cfg.get("stale_while_revalidate") else None
+    fetched = {}  # (銘柄名, フェーズ) -> {"news": [記事], "errors": {API名: エラー}, "raw": {API名: 生レスポンスのID}, "from_cache": bool}
+    blocking_jobs, stale_jobs = [], []
+    for stock_name, phase, cache_key in targets:
+        cached_news, cached_raw_ids, is_stale = _load_from_cache(cache_key, cfg["cache_expiry_hours"], stale_hard_expiry_hours)
+        if cached_news is None or cached_raw_ids is None:
+            blocking_jobs.append((stock_name, phase, cache_key))
+            continue
+        if is_stale:
+            stale_jobs.append((stock_name, phase, cache_key))
+        raw = {api_name: raw_ids[phase] for api_name, raw_ids in cached_raw_ids.items() if raw_ids.get(phase)}
+        fetched[(stock_name, phase)] = {"news": cached_news, "errors": {}, "raw": raw, "from_cache": True}
+        logger.info(f"{_PHASE_LABELS[phase][0]}ニュースと生レスポンスをキャッシュからロード: {len(cached_news)}件 ({cache_key}{', 期限切れ' if is_stale else ''})")
+
+    credentials = _resolve_news_credentials(active_apis, api_key_manager) if blocking_jobs or stale_jobs else {}
+    if blocking_jobs:
+        for job_key, result in _fetch_news_jobs(blocking_jobs, credentials).items():
+            fetched[job_key] = {**result, "from_cache": False}
+    if stale_jobs:
+        _start_background_refresh(stale_jobs, credentials)
+
+    market = fetched[(None, "market")]
+    deduplicated_market_news = _deduplicate_news_list(market["news"])
+    results = {}
+    for stock_name in stock_names:
+        company = fetched[(stock_name, "company")]
+        api_errors, raw_api_response_ids = {}, {}
+        for api_name in active_apis_config.keys():
+            api_errors[api_name] = {"company": company["errors"].get(api_name), "market": market["errors"].get(api_name)}
+            # 呼び出さなかったAPI (無効化されている等) の ID は None
+            raw_api_response_ids[api_name] = {"company": company["raw"].get(api_name), "market": market["raw"].get(api_name)}
+        results[stock_name] = {
+            "stock_name": stock_name,
+            "retrieved_from_cache": {"company_news": company["from_cache"], "market_news": market["from_cache"]},
+            "all_company_news_deduplicated": _deduplicate_news_list(company["news"]), "all_market_news_deduplicated": deduplicated_market_news,
+            "api_errors": api_errors, "raw_api_response_ids": raw_api_response_ids
+        }
+    return results
+
+
 def fetch_all_stock_news(
         stock_name: str,
         active_apis_config: dict,
         api_key_manager
     ) -> dict:
-    all_fetched_company_news = []
-    all_fetched_market_news = []
-    api_errors = {api_name: {"company": None, "market": None} for api_name in active_apis_config.keys()}
-    default_unprocessed_company = _generate_error_response_text("N/A", "Company news processing not initiated for this API.")
-    default_unprocessed_market = _generate_error_response_text("N/A", "Market news processing not initiated for this API.")
-    raw_api_responses = {
-        api_name: {
-            "company": default_unprocessed_company.replace('"api": "N/A"', f'"api": "{api_name} (Company)"'),
-            "market": default_unprocessed_market.replace('"api": "N/A"', f'"api": "{api_name} (Market)"')
-        } for api_name in active_apis_config.keys()
-    }
-
-    api_fetchers = {
-        "newsapi": (fetch_newsapi_company_news, fetch_newsapi_market_news), "gnews": (fetch_gnews_company_news, fetch_gnews_market_news),
-        "brave": (fetch_brave_company_news, fetch_brave_market_news), "tavily": (fetch_tavily_company_news, fetch_tavily_market_news),
-        "google_cse": (fetch_google_cse_company_news, fetch_google_cse_market_news), "bing": (fetch_bing_company_news, fetch_bing_market_news),
-    }
-    api_key_names_map = {
-        "newsapi": "NEWS_API_KEY", "gnews": "GNEWS_API_KEY", "brave": "BRAVE_API_KEY", "tavily": "TAVILY_API_KEY",
-        "google_cse": "GOOGLE_CSE_API_KEY", "bing": "BING_API_KEY",
-    }
-    google_cse_id_key_name = "GOOGLE_CSE_ID"
-
-    # --- 企業ニュース取得 ---
-    logger.info(f"--- 企業ニュース取得フェーズ開始 ({stock_name}) [並列処理] ---")
-    company_cache_filepath = _get_cache_filepath("company_news", stock_name, app_config.IS_CLOUD_RUN)
-    cached_company_news, cached_company_raw_responses = _load_from_cache(company_cache_filepath, app_config.NEWS_SERVICE_CONFIG["cache_expiry_hours"])
-
-    if cached_company_news is not None and cached_company_raw_responses is not None:
-        all_fetched_company_news = cached_company_news
-        for api_name_key, responses_for_api in cached_company_raw_responses.items():
-            if api_name_key not in raw_api_responses: raw_api_responses[api_name_key] = {}
-            raw_api_responses[api_name_key]["company"] = responses_for_api.get("company", raw_api_responses[api_name_key]["company"])
-            if responses_for_api.get("market"):
-                raw_api_responses[api_name_key]["market"] = responses_for_api.get("market", raw_api_responses[api_name_key]["market"])
-        logger.info(f"企業ニュースと生レスポンスをキャッシュからロード: {len(all_fetched_company_news)}件 ({company_cache_filepath})")
-    else:
-        with ThreadPoolExecutor(max_workers=len(active_apis_config)) as executor:
-            future_to_api = {}
-            active_apis = {k: v for k, v in active_apis_config.items() if v and k in api_fetchers}
-
-            for api_name in active_apis:
-                api_key_actual_name = api_key_names_map.get(api_name)
-                api_key_value = api_key_manager.get_api_key(api_key_actual_name) if api_key_actual_name else None
-                fetch_comp_func = api_fetchers[api_name][0]
-
-                if api_name == "google_cse":
-                    cse_id_value = api_key_manager.get_api_key(google_cse_id_key_name)
-                    task = partial(fetch_comp_func, stock_name, api_key_value, cse_id_value)
-                else:
-                    task = partial(fetch_comp_func, stock_name, api_key_value)
-
-                logger.info(f"  Submitting company news task for {api_name.upper()}...")
-                future_to_api[executor.submit(task)] = api_name
-
-            for future in as_completed(future_to_api):
-                api_name = future_to_api[future]
-                try:
-                    comp_news, err_comp, raw_comp_resp_text = future.result()
-                    all_fetched_company_news.extend(comp_news)
-                    api_errors[api_name]["company"] = err_comp
-                    raw_api_responses[api_name]["company"] = raw_comp_resp_text if raw_comp_resp_text else _generate_error_response_text(api_name, "No response text from fetch function (Company).")
-                    logger.info(f"  {api_name.upper()} 企業ニュース取得完了 (件数: {len(comp_news)}, エラー: {err_comp})")
-                except Exception as exc:
-                    err_msg = f"企業ニュースの並列取得中に例外発生 ({api_name}): {exc}"
-                    logger.error(err_msg, exc_info=True)
-                    api_errors[api_name]["company"] = err_msg
-                    raw_api_responses[api_name]["company"] = _generate_error_response_text(api_name, "Exception during parallel fetch (Company)", details=str(exc))
-
-        if company_cache_filepath:
-            _save_to_cache(company_cache_filepath, all_fetched_company_news, raw_api_responses)
-    logger.info(f"--- 企業ニュース取得フェーズ終了 ({stock_name}) ---")
-
-    # --- 市場ニュース取得 ---
-    logger.info("--- 市場ニュース取得フェーズ開始 [並列処理] ---")
-    market_cache_filepath = _get_cache_filepath("market_news", is_cloud_run=app_config.IS_CLOUD_RUN)
-    cached_market_news_data, cached_market_raw_responses_only_market = _load_from_cache(market_cache_filepath, app_config.NEWS_SERVICE_CONFIG["cache_expiry_hours"])
-
-    if cached_market_news_data is not None and cached_market_raw_responses_only_market is not None:
-        all_fetched_market_news = cached_market_news_data
-        for api_name_key, responses_for_api in cached_market_raw_responses_only_market.items():
-            if api_name_key not in raw_api_responses: raw_api_responses[api_name_key] = {}
-            if responses_for_api.get("market"):
-                raw_api_responses[api_name_key]["market"] = responses_for_api.get("market", raw_api_responses[api_name_key]["market"])
-        logger.info(f"市場ニュースと生レスポンスをキャッシュからロード: {len(all_fetched_market_news)}件 ({market_cache_filepath})")
-    else:
-        market_specific_raw_responses_for_cache = {api_name: {"market": _generate_error_response_text(api_name, "Not processed", details="Market news for cache not initiated.")} for api_name in active_apis_config.keys()}
-        with ThreadPoolExecutor(max_workers=len(active_apis_config)) as executor:
-            future_to_api_market = {}
-            active_apis = {k: v for k, v in active_apis_config.items() if v and k in api_fetchers}
-
-            for api_name in active_apis:
-                api_key_actual_name = api_key_names_map.get(api_name)
-                api_key_value = api_key_manager.get_api_key(api_key_actual_name) if api_key_actual_name else None
-                fetch_mkt_func = api_fetchers[api_name][1]
-
-                if api_name == "google_cse":
-                    cse_id_value = api_key_manager.get_api_key(google_cse_id_key_name)
-                    task = partial(fetch_mkt_func, api_key_value, cse_id_value)
-                else:
-                    task = partial(fetch_mkt_func, api_key_value)
-
-                logger.info(f"  Submitting market news task for {api_name.upper()}...")
-                future_to_api_market[executor.submit(task)] = api_name
-
-            for future in as_completed(future_to_api_market):
-                api_name = future_to_api_market[future]
-                try:
-                    mkt_news, err_mkt, raw_mkt_resp_text = future.result()
-                    all_fetched_market_news.extend(mkt_news)
-                    api_errors[api_name]["market"] = err_mkt
-                    raw_api_responses[api_name]["market"] = raw_mkt_resp_text if raw_mkt_resp_text else _generate_error_response_text(api_name, "No response text from fetch function (Market).")
-                    if api_name in market_specific_raw_responses_for_cache:
-                        market_specific_raw_responses_for_cache[api_name]["market"] = raw_api_responses[api_name]["market"]
-                    logger.info(f"  {api_name.upper()} 市場ニュース取得完了 (件数: {len(mkt_news)}, エラー: {err_mkt})")
-                except Exception as exc:
-                    err_msg = f"市場ニュースの並列取得中に例外発生 ({api_name}): {exc}"
-                    logger.error(err_msg, exc_info=True)
-                    api_errors[api_name]["market"] = err_msg
-                    raw_api_responses[api_name]["market"] = _generate_error_response_text(api_name, "Exception during parallel fetch (Market)", details=str(exc))
-
-        if market_cache_filepath:
-            _save_to_cache(market_cache_filepath, all_fetched_market_news, market_specific_raw_responses_for_cache)
-    logger.info("--- 市場ニュース取得フェーズ終了 ---")
-
-    deduplicated_company_news = _deduplicate_news_list(all_fetched_company_news, app_config.NEWS_SERVICE_CONFIG["duplicate_title_prefix_length"])
-    deduplicated_market_news = _deduplicate_news_list(all_fetched_market_news, app_config.NEWS_SERVICE_CONFIG["duplicate_title_prefix_length"])
-
-    return {
-        "stock_name": stock_name,
-        "retrieved_from_cache": {"company_news": cached_company_news is not None, "market_news": cached_market_news_data is not None},
-        "all_company_news_deduplicated": deduplicated_company_news, "all_market_news_deduplicated": deduplicated_market_news,
-        "api_errors": api_errors, "raw_api_responses": raw_api_responses
-    }
+    return fetch_news_for_stocks([stock_name], active_apis_config, api_key_manager)[stock_name]
 # --- ▲▲▲ ここまで修正 ▲▲▲ ---
@@ -0,0 +1,359 @@
+# ohlcv_store.py
+# 株価 (OHLCV) を銘柄・足種ごとにローカルディスクへ保存するストア。
+# 要求された期間のうち、まだ保存していない範囲 (先頭側の不足分と、未確定の末尾) だけを yfinance から取得し、
+# 残りはディスクから返します。同じ銘柄の5年チャートを再表示するときはネットワークにアクセスしません。
+# 保存するのは日足だけで、週足・月足・四半期足は保存済みの日足から集計して作ります。
+# pyarrow があれば Parquet、なければ pickle で保存します。
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+
+import pandas as pd
+
+import config as app_config
+import data_sources
+import rate_limiter
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+    logging.getLogger(__name__).warning("yfinance がインストールされていないため、株価データを新たに取得できません。")
+
+try:
+    import pyarrow  # noqa: F401 (pandas の Parquet エンジンとして使用)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# 日足から作る足種: (ある日付を含む足の開始日を返す関数, pandas のリサンプル規則)。
+# yfinance と同じく、週足は月曜始まり、月足・四半期足は月初始まりで、足の開始日をラベルにします。
+# 日足とここにある足種以外 (1m, 1h などの日中足) はストアを経由せず、毎回 yfinance から取得します。
+_DERIVED_INTERVALS = {
+    '1wk': (lambda d: d - datetime.timedelta(days=d.weekday()), 'W-MON'),
+    '1mo': (lambda d: d.replace(day=1), 'MS'),
+    '3mo': (lambda d: d.replace(month=(d.month - 1) // 3 * 3 + 1, day=1), 'QS'),
+}
+_OHLCV_AGGREGATION = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+_PERIOD_PATTERN = re.compile(r"^([0-9]+)(d|wk|mo|y)$")
+
+# 同じ銘柄・足種のファイルを複数のセッションが同時に更新しないためのロック
+_entry_locks = {}
+_entry_locks_guard = threading.Lock()
+
+
+# --- 日付・期間のヘルパー ---
+def _to_date(value) -> datetime.date:
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def period_to_range(period: str, today: datetime.date | None = None) -> tuple[datetime.date, datetime.date]:
+    """
+    yfinance の period 指定 ('30d', '6mo', '1y', 'ytd', 'max' など) を (開始日, 終了日) に変換します。
+    終了日は yfinance と同じく含まないため、今日の翌日を返します。
+    """
+    today = today or datetime.date.today()
+    end = today + datetime.timedelta(days=1)
+    if period == 'max':
+        return datetime.date(1970, 1, 1), end
+    if period == 'ytd':
+        return datetime.date(today.year, 1, 1), end
+    match = _PERIOD_PATTERN.match(str(period).strip())
+    if not match:
+        raise ValueError(f"未対応の期間指定です: {period}")
+    n, unit = int(match.group(1)), match.group(2)
+    if unit == 'd':
+        start = today - datetime.timedelta(days=n)
+    elif unit == 'wk':
+        start = today - datetime.timedelta(weeks=n)
+    elif unit == 'mo':
+        start = (pd.Timestamp(today) - pd.DateOffset(months=n)).date()
+    else:
+        start = (pd.Timestamp(today) - pd.DateOffset(years=n)).date()
+    return start, end
+
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name='Date'), dtype=float)
+
+
+def _slice(df: pd.DataFrame | None, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+    if df is None or df.empty:
+        return _empty_frame()
+    mask = (df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))
+    return df.loc[mask].copy()
+
+
+# --- yfinance からの取得 ---
+def normalize_ohlcv(data: pd.DataFrame | None) -> pd.DataFrame:
+    """
+    yfinance の結果を、列名が 'Open', 'High', 'Low', 'Close', 'Volume' で、
+    インデックスがタイムゾーンなしの日付 ('Date') の DataFrame に揃えます。
+    """
+    if data is None or data.empty:
+        return _empty_frame()
+    data = data.copy()
+    # 単一ティッカーでも、yfinance のバージョンによっては (項目, ティッカー) の MultiIndex になる
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    data.columns = [str(col).capitalize() for col in data.columns]
+    # auto_adjust=True では 'Close' が調整済み終値。'Adj Close' しかない場合だけそれを使う
+    if 'Close' not in data.columns and 'Adj close' in data.columns:
+        data = data.rename(columns={'Adj close': 'Close'})
+    data = data[[col for col in OHLCV_COLUMNS if col in data.columns]]
+    data = data.loc[:, ~data.columns.duplicated()]
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    data.index = index.rename('Date')
+    data = data[~data.index.duplicated(keep='last')].sort_index()
+    return data.astype(float)
+
+
+def fetch_from_yfinance(ticker: str, start: datetime.date, end: datetime.date, interval: str) -> pd.DataFrame:
+    """
+    yfinance から [start, end) の調整済み OHLCV を取得します。データがなければ空の DataFrame を返します。
+    yf.download はモジュール共通の状態に結果を書き込み、複数スレッドから同時に呼ぶと結果が混ざることがあるため、
+    銘柄ごとに独立した Ticker.history を使います。
+    """
+    def _live():
+        if yf is None:
+            raise RuntimeError("yfinance がインストールされていません。")
+        rate_limiter.get_limiter("yfinance").acquire()
+        return yf.Ticker(ticker).history(
+            start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"), interval=interval, auto_adjust=True
+        )
+
+    request = {"ticker": ticker, "start": start.isoformat(), "end": end.isoformat(), "interval": interval}
+    return normalize_ohlcv(data_sources.call("yfinance", "history", request, _live))
+
+
+# --- ディスク上のエントリ (データ本体 + 保存範囲のメタデータ) ---
+def get_store_dir() -> str | None:
+    """ストアのディレクトリを用意してパスを返します。作成できない場合は None を返します。"""
+    cfg = app_config.OHLCV_STORE_CONFIG
+    base_dir = cfg["cache_dir_cloud_run"] if app_config.IS_CLOUD_RUN else cfg["cache_dir_colab"]
+    if not os.path.exists(base_dir):
+        try:
+            os.makedirs(base_dir, exist_ok=True)
+        except OSError as e:
+            logger.error(f"OHLCVストアのディレクトリ作成に失敗: {base_dir}, エラー: {e}")
+            return None
+    return base_dir
+
+
+def _entry_base_path(store_dir: str, ticker: str, interval: str) -> str:
+    safe_ticker = re.sub(r"[^0-9A-Za-z.\-]", "_", ticker.strip().upper())
+    return os.path.join(store_dir, interval, safe_ticker)
+
+
+def _entry_lock(base_path: str) -> threading.Lock:
+    with _entry_locks_guard:
+        return _entry_locks.setdefault(base_path, threading.Lock())
+
+
+def _load_entry(base_path: str) -> tuple[pd.DataFrame | None, dict | None]:
+    meta_path = f"{base_path}.json"
+    if not os.path.exists(meta_path):
+        return None, None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') == 'parquet':
+            if not PARQUET_AVAILABLE:
+                return None, None
+            df = pd.read_parquet(f"{base_path}.parquet")
+        else:
+            df = pd.read_pickle(f"{base_path}.pkl")
+    except Exception as e:
+        # 壊れたエントリは取得し直す
+        logger.warning(f"OHLCVストアの読み込みに失敗したため再取得します: {base_path}, エラー: {e}")
+        return None, None
+    meta = {
+        'covered_start': _to_date(meta['covered_start']),
+        'covered_end': _to_date(meta['covered_end']),
+        'fetched_until': _to_date(meta['fetched_until']),
+        'fetched_at': datetime.datetime.fromisoformat(meta['fetched_at']),
+    }
+    return df, meta
+
+
+def _save_entry(base_path: str, df: pd.DataFrame, meta: dict):
+    # 書き込み途中のファイルを読まないよう、一時ファイルに書いてから置き換える。
+    # メタデータはデータ本体の後に書くので、途中で失敗しても保存範囲を実際より広く記録することはない
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    fmt = 'parquet' if PARQUET_AVAILABLE else 'pickle'
+    data_path = f"{base_path}.parquet" if fmt == 'parquet' else f"{base_path}.pkl"
+    meta_path = f"{base_path}.json"
+    try:
+        if fmt == 'parquet':
+            df.to_parquet(f"{data_path}.tmp")
+        else:
+            df.to_pickle(f"{data_path}.tmp")
+        os.replace(f"{data_path}.tmp", data_path)
+        with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({
+                'format': fmt,
+                'covered_start': meta['covered_start'].isoformat(),
+                'covered_end': meta['covered_end'].isoformat(),
+                'fetched_until': meta['fetched_until'].isoformat(),
+                'fetched_at': meta['fetched_at'].isoformat(),
+            }, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+    except Exception as e:
+        logger.error(f"OHLCVストアの保存に失敗: {base_path}, エラー: {e}")
+
+
+# --- 取得範囲の決定と結合 ---
+def _plan_fetch(meta: dict | None, start: datetime.date, end: datetime.date,
+                now: datetime.datetime, cfg: dict) -> tuple[str, datetime.date, datetime.date] | None:
+    """
+    取得が必要な範囲を ('full' | 'head' | 'tail', 開始日, 終了日) で返します。不要なら None。
+    covered_end より前の日足は確定済みとして再取得せず、それ以降 (当日の足) は
+    前回の取得から refresh_interval_minutes が経過していれば取得し直します。
+    """
+    if meta is None:
+        return ('full', start, end)
+    covered_start, covered_end = meta['covered_start'], meta['covered_end']
+    need_head = start < covered_start
+    need_tail = end > covered_end
+    if need_tail:
+        fresh = now - meta['fetched_at'] < datetime.timedelta(minutes=cfg["refresh_interval_minutes"])
+        if fresh and end <= meta['fetched_until']:
+            need_tail = False
+    if need_head and need_tail:
+        return ('full', start, end)
+    if need_head:
+        return ('head', start, covered_start)
+    if need_tail:
+        # 直近の数日分も取り直し、値の修正や分割・配当による調整の有無を確認する
+        return ('tail', covered_end - datetime.timedelta(days=cfg["overlap_days"]), end)
+    return None
+
+
+def _replace_range(stored: pd.DataFrame | None, fetched: pd.DataFrame, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+    """保存済みデータの [start, end) と、新たに取得した日付の行を、取得結果で置き換えます。"""
+    if stored is None or stored.empty:
+        return fetched
+    in_range = (stored.index >= pd.Timestamp(start)) & (stored.index < pd.Timestamp(end))
+    keep = stored.loc[~in_range & ~stored.index.isin(fetched.index)]
+    if fetched.empty:
+        return keep
+    return pd.concat([keep, fetched]).sort_index()
+
+
+def _adjustment_detected(stored: pd.DataFrame, fetched: pd.DataFrame, settled_before: datetime.date, tolerance: float) -> bool:
+    """
+    確定済みの足の終値が変わっていれば True を返します。
+    auto_adjust=True の価格は分割や配当のたびに過去分も遡って調整されるため、保存済みの履歴全体を取り直す必要があります。
+    """
+    if 'Close' not in stored.columns or 'Close' not in fetched.columns:
+        return False
+    common = stored.index.intersection(fetched.index)
+    common = common[common < pd.Timestamp(settled_before)]
+    if common.empty:
+        return False
+    old_close = stored.loc[common, 'Close']
+    new_close = fetched.loc[common, 'Close']
+    rel_diff = ((new_close - old_close).abs() / old_close.abs()).max()
+    return bool(rel_diff > tolerance)
+
+
+def resample_ohlcv(daily: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    日足を週足 ('1wk')・月足 ('1mo')・四半期足 ('3mo') に集計します。
+    始値は期間の最初、高値は最大、安値は最小、終値は最後の値で、出来高は合計です。取引のない期間の足は作りません。
+    """
+    if daily is None or daily.empty:
+        return _empty_frame()
+    _, rule = _DERIVED_INTERVALS[interval]
+    aggregation = {col: how for col, how in _OHLCV_AGGREGATION.items() if col in daily.columns}
+    bars = daily.resample(rule, label='left', closed='left').agg(aggregation)
+    if 'Close' in bars.columns:
+        bars = bars.dropna(subset=['Close'])
+    bars.index.name = 'Date'
+    return bars
+
+
+def get_ohlcv(ticker: str, start, end, interval: str = "1d", fetcher=None, now: datetime.datetime | None = None) -> pd.DataFrame:
+    """
+    ticker の [start, end) の OHLCV を返します (end は yfinance と同じく含みません)。
+    保存済みの範囲はディスクから読み、不足している範囲だけを fetcher (既定: yfinance) で取得して保存します。
+    週足・月足・四半期足は、start を含む足の開始日からの日足を同じ方法で取得して集計します (最後の足は end の前日までの集計)。
+    取得に失敗した場合は保存済みのデータだけを返し、何もなければ空の DataFrame を返します。
+    """
+    fetcher = fetcher or fetch_from_yfinance
+    start, end = _to_date(start), _to_date(end)
+    now = now or datetime.datetime.now()
+    cfg = app_config.OHLCV_STORE_CONFIG
+
+    if interval in _DERIVED_INTERVALS:
+        bar_start = _DERIVED_INTERVALS[interval][0](start)
+        daily = get_ohlcv(ticker, bar_start, end, interval='1d', fetcher=fetcher, now=now)
+        return resample_ohlcv(daily, interval)
+
+    store_dir = get_store_dir() if cfg.get("enabled", True) and interval == '1d' else None
+    if store_dir is None:
+        return _slice(normalize_ohlcv(fetcher(ticker, start, end, interval)), start, end)
+
+    base_path = _entry_base_path(store_dir, ticker, interval)
+    with _entry_lock(base_path):
+        stored, meta = _load_entry(base_path)
+        plan = _plan_fetch(meta, start, end, now, cfg)
+        if plan is None:
+            return _slice(stored, start, end)
+
+        kind, fetch_start, fetch_end = plan
+        try:
+            fetched = normalize_ohlcv(fetcher(ticker, fetch_start, fetch_end, interval))
+            if kind == 'tail' and _adjustment_detected(stored, fetched, meta['covered_end'], cfg["adjustment_tolerance"]):
+                logger.info(f"OHLCVストア: {ticker} ({interval}) の過去の価格が調整されたため、保存済みの期間を取り直します。")
+                kind, fetch_start = 'full', min(start, meta['covered_start'])
+                stored, meta = None, None
+                fetched = normalize_ohlcv(fetcher(ticker, fetch_start, fetch_end, interval))
+        except Exception as e:
+            logger.warning(f"OHLCVストア: {ticker} ({interval}) の {fetch_start} - {fetch_end} の取得に失敗したため、保存済みのデータを返します: {e}")
+            return _slice(stored, start, end)
+
+        if stored is None and fetched.empty:
+            # 銘柄コードの誤りなども考えられるため、何もない結果は保存しない
+            return _empty_frame()
+        if fetched.empty and not _slice(stored, fetch_start, fetch_end).empty:
+            # 保存済みの足がある範囲で何も返らないのは取得の失敗 (yfinance は失敗しても空の結果を返す)
+            logger.warning(f"OHLCVストア: {ticker} ({interval}) の {fetch_start} - {fetch_end} が空だったため、保存済みのデータを返します。")
+            return _slice(stored, start, end)
+
+        stored = _replace_range(stored, fetched, fetch_start, fetch_end)
+        # 今日の足はまだ確定していないので、保存範囲の終わりは今日まで (今日を含まない)
+        settled_end = min(fetch_end, now.date())
+        if meta is None:
+            meta = {'covered_start': fetch_start, 'covered_end': settled_end, 'fetched_until': fetch_end, 'fetched_at': now}
+        else:
+            # 先頭側で空だった範囲は、上場前などデータが存在しない期間として扱う
+            meta['covered_start'] = min(meta['covered_start'], fetch_start)
+            if kind != 'head':
+                meta['covered_end'] = max(meta['covered_end'], settled_end)
+                meta['fetched_until'] = max(meta['fetched_until'], fetch_end)
+                meta['fetched_at'] = now
+        _save_entry(base_path, stored, meta)
+        logger.info(f"OHLCVストア: {ticker} ({interval}) の {fetch_start} - {fetch_end} を取得して保存しました ({len(fetched)}行)。")
+    return _slice(stored, start, end)
+
+
+def get_ohlcv_for_period(ticker: str, period: str, interval: str = "1d", fetcher=None, now: datetime.datetime | None = None) -> pd.DataFrame:
+    """yfinance の period 指定 ('30d', '1y' など) で get_ohlcv を呼び出します。"""
+    now = now or datetime.datetime.now()
+    start, end = period_to_range(period, now.date())
+    return get_ohlcv(ticker, start, end, interval=interval, fetcher=fetcher, now=now)
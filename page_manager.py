@@ -16,6 +16,7 @@ import data_display_page
 import technical_analysis_page # テクニカル分析ページ
 import edinet_viewer_page
 import edinet_sort_page # --- ここを追加 ---
+import technical_screener_page
 
 # api_services は各ページで直接インポートされるか、引数で渡される想定
 # ここでは、Gemini APIの初期化状態チェックのためにインポート
@@ -39,7 +40,8 @@ PAGE_MODULE_MAPPING = {
     7: data_display_page,         # ステップ7: 抽出データ表示 (LLM使用可能性あり)
     8: technical_analysis_page,   # ステップ8: テクニカル分析 (LLM使用可能性あり)
     9: edinet_viewer_page,        # ステップ9: EDINET報告書ビューア (LLM使用可能性あり)
-    10: edinet_sort_page         # --- ここを追加 ---
+    10: edinet_sort_page,        # --- ここを追加 ---
+    11: technical_screener_page   # ステップ11: テクニカルスクリーナー
 }
 
 # --- Gemini APIが必須または推奨されるページのステップ番号リスト ---
@@ -84,7 +86,8 @@ def render_current_page(current_step: int, sm, fm, akm, active_model_global: str
             "- **ステップ7**: アップロード/抽出済みデータの表示 (AI活用可能性あり)\n"
             "- **ステップ8**: 高度な株価テクニカル分析 (ローソク足、各種指標、AI分析)\n"
             "- **ステップ9**: EDINET提出書類の検索・閲覧 (AI活用可能性あり)\n"
-            "- **ステップ10**: LLMによるEDINETデータの高度分析・抽出 (LLM必須)" # --- ここを追加 ---
+            "- **ステップ10**: LLMによるEDINETデータの高度分析・抽出 (LLM必須)\n" # --- ここを追加 ---
+            "- **ステップ11**: 全銘柄のテクニカル指標による条件検索 (スクリーナー)"
         )
         if st.button("次へ (ステップ1: ポートフォリオ入力へ)", type="primary", key="s0_next_to_s1_page_manager_v2", use_container_width=True):
             logger.info("[DASHBOARD] 'Next to Step 1' button clicked.")
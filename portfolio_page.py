@@ -61,19 +61,21 @@ def _fetch_and_process_data(stock_df, akm):
     tickers_to_fetch["^N225"] = {"name": "日経平均株価", "amount_jpy": 0}
 
     with st.spinner("各銘柄および日経平均の過去1年間の株価データを取得中..."):
+        # 全銘柄を並列でまとめて取得し、日付で揃えた終値の表として受け取る
+        close_df, price_errors = api_services.get_stock_price_histories(tuple(tickers_to_fetch.keys()), period="1y", interval="1d")
         for ticker, info in tickers_to_fetch.items():
-            df, err = api_services.get_stock_price_history(ticker, period="1y", interval="1d")
-            if err or df is None or df.empty:
-                error_messages.append(f"'{info['name']}' ({ticker}) の株価取得に失敗しました: {err}")
+            if ticker in price_errors or ticker not in close_df.columns:
+                error_messages.append(f"'{info['name']}' ({ticker}) の株価取得に失敗しました: {price_errors.get(ticker)}")
                 continue
+            df = close_df[[ticker]].rename(columns={ticker: 'Close'}).dropna()
             performance_data[ticker] = { "name": info["name"], "df": df, "amount_jpy": info["amount_jpy"] }
         logger.info(f"株価取得完了。取得成功: {len(performance_data)}件")
 
     with st.spinner("関連ニュースを取得中..."):
-        for ticker, info in tickers_to_fetch.items():
-            if ticker == "^N225": continue
-            name = info['name']
-            news_result = news_services.fetch_all_stock_news(name, app_config.NEWS_SERVICE_CONFIG["active_apis"], akm)
+        # 全銘柄の企業ニュースをまとめて取得する (市場ニュースは1回だけ取得され、各銘柄で共有される)
+        stock_names = [info['name'] for ticker, info in tickers_to_fetch.items() if ticker != "^N225"]
+        news_results = news_services.fetch_news_for_stocks(stock_names, app_config.NEWS_SERVICE_CONFIG["active_apis"], akm)
+        for name, news_result in news_results.items():
             company_news = news_result.get("all_company_news_deduplicated", [])
             if company_news: all_news_articles.extend(company_news)
             if news_result.get("api_errors"):
@@ -0,0 +1,147 @@
+# provider_health.py
+# 外部API (プロバイダー) ごとの応答時間・エラー率を記録し、サーキットブレーカーと適応タイムアウトを提供する。
+# 同じ名前 (例: "news_bing") の記録は、どのページ・セッション・スレッドから呼び出しても同一のものが使われます (rate_limiter と同様)。
+#   サーキットブレーカー: 直近の呼び出しのエラー率が閾値を超えたプロバイダーは、クールダウンの間呼び出さずに即座に失敗扱いにする。
+#                         クールダウン後は1回だけ試し (half-open)、成功すれば元に戻し、失敗すれば再びクールダウンに入る。
+#   適応タイムアウト   : 成功した呼び出しの p95 応答時間 × 倍率 を、上下限の範囲でリクエストのタイムアウトにする。
+import collections
+import logging
+import math
+import threading
+import time
+
+import config as app_config
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"        # 正常 (呼び出す)
+STATE_OPEN = "open"            # 遮断中 (クールダウンが終わるまで呼び出さない)
+STATE_HALF_OPEN = "half_open"  # クールダウン明け (試しに1回だけ呼び出す)
+
+
+def _percentile(sorted_values: list, pct: float) -> float | None:
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class ProviderHealth:
+    """1つのプロバイダーの直近の呼び出し結果 (時刻, 応答時間, 成否) と、サーキットブレーカーの状態を持つ。複数スレッドから安全に呼び出せます。"""
+
+    def __init__(self, name: str, cfg: dict):
+        self.name = name
+        self.cfg = cfg
+        self._samples = collections.deque(maxlen=cfg["window_size"])
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._probe_started_at = None
+        self._consecutive_failures = 0
+        self._total_calls = 0
+        self._total_failures = 0
+        self._rejected = 0
+
+    def _recent(self, now: float) -> list:
+        # 呼び出し側で _lock を保持していること
+        return [s for s in self._samples if now - s[0] <= self.cfg["window_sec"]]
+
+    def allow_request(self) -> bool:
+        """呼び出してよければ True。遮断中なら False (呼び出さずに失敗扱いにすること)。"""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == STATE_OPEN:
+                if now - self._opened_at < self.cfg["cooldown_sec"]:
+                    self._rejected += 1
+                    return False
+                self._state = STATE_HALF_OPEN
+                self._probe_started_at = None
+                logger.info(f"プロバイダー '{self.name}': クールダウンが終わったため、試しに呼び出します。")
+            if self._state == STATE_HALF_OPEN:
+                # 試しの呼び出しは1つだけ。結果が返らないまま最大タイムアウトを過ぎたら、次の呼び出しに譲る
+                if self._probe_started_at is not None and now - self._probe_started_at < self.cfg["max_timeout_sec"]:
+                    self._rejected += 1
+                    return False
+                self._probe_started_at = now
+            return True
+
+    def record(self, latency_sec: float, ok: bool):
+        """呼び出し結果を記録し、サーキットブレーカーの状態を更新する。"""
+        with self._lock:
+            now = time.monotonic()
+            self._samples.append((now, latency_sec, ok))
+            self._total_calls += 1
+            if ok:
+                self._consecutive_failures = 0
+                if self._state != STATE_CLOSED:
+                    logger.info(f"プロバイダー '{self.name}': 呼び出しが成功したため、遮断を解除します。")
+                self._state = STATE_CLOSED
+                self._probe_started_at = None
+                return
+            self._total_failures += 1
+            self._consecutive_failures += 1
+            if self._state == STATE_HALF_OPEN:
+                self._open(now, "試しの呼び出しが失敗")
+                return
+            recent = self._recent(now)
+            failures = sum(1 for s in recent if not s[2])
+            error_rate = failures / len(recent) if recent else 0.0
+            if self._state == STATE_CLOSED and (
+                    (len(recent) >= self.cfg["min_calls"] and error_rate >= self.cfg["error_rate_threshold"])
+                    or self._consecutive_failures >= self.cfg["consecutive_failures_threshold"]):
+                self._open(now, f"エラー率 {error_rate:.0%} ({failures}/{len(recent)}), 連続失敗 {self._consecutive_failures}回")
+
+    def _open(self, now: float, reason: str):
+        # 呼び出し側で _lock を保持していること
+        self._state = STATE_OPEN
+        self._opened_at = now
+        self._probe_started_at = None
+        logger.warning(f"プロバイダー '{self.name}' を {self.cfg['cooldown_sec']}秒間遮断します ({reason})。")
+
+    def timeout(self) -> float:
+        """成功した呼び出しの p95 応答時間から決めたタイムアウト (秒)。記録が少ないうちは既定値。"""
+        with self._lock:
+            latencies = sorted(s[1] for s in self._recent(time.monotonic()) if s[2])
+        cfg = self.cfg
+        if len(latencies) < cfg["min_samples_for_timeout"]:
+            return cfg["default_timeout_sec"]
+        return min(cfg["max_timeout_sec"], max(cfg["min_timeout_sec"], _percentile(latencies, 95) * cfg["timeout_p95_multiplier"]))
+
+    def snapshot(self) -> dict:
+        """状態・直近のエラー率・応答時間の p50/p95・現在のタイムアウトなどを返す (診断表示用)。"""
+        timeout_sec = self.timeout()
+        with self._lock:
+            now = time.monotonic()
+            recent = self._recent(now)
+            latencies = sorted(s[1] for s in recent if s[2])
+            failures = sum(1 for s in recent if not s[2])
+            cooldown_remaining = max(0.0, self.cfg["cooldown_sec"] - (now - self._opened_at)) if self._state == STATE_OPEN else 0.0
+            p50, p95 = _percentile(latencies, 50), _percentile(latencies, 95)
+            return {
+                "name": self.name, "state": self._state, "recent_calls": len(recent),
+                "error_rate": round(failures / len(recent), 3) if recent else None,
+                "p50_sec": round(p50, 3) if p50 is not None else None, "p95_sec": round(p95, 3) if p95 is not None else None,
+                "timeout_sec": round(timeout_sec, 2), "cooldown_remaining_sec": round(cooldown_remaining, 1),
+                "total_calls": self._total_calls, "total_failures": self._total_failures, "rejected": self._rejected,
+            }
+
+
+_healths = {}
+_healths_lock = threading.Lock()
+
+
+def get_health(name: str) -> ProviderHealth:
+    """名前ごとに共有の ProviderHealth を返します。設定は config.PROVIDER_HEALTH_CONFIG から読みます。"""
+    with _healths_lock:
+        health = _healths.get(name)
+        if health is None:
+            health = ProviderHealth(name, app_config.PROVIDER_HEALTH_CONFIG)
+            _healths[name] = health
+        return health
+
+
+def get_all_snapshots() -> list[dict]:
+    """これまでに使われた全プロバイダーの snapshot() を名前順に返します。"""
+    with _healths_lock:
+        healths = sorted(_healths.values(), key=lambda h: h.name)
+    return [h.snapshot() for h in healths]
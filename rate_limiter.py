@@ -0,0 +1,61 @@
+# rate_limiter.py
+# 外部APIへのリクエスト間隔を制御する、プロセス全体で共有のトークンバケット。
+# 同じ名前 (例: "yfinance") のリミッターは、どのページ・セッション・スレッドから呼び出しても同一のものが使われます。
+import logging
+import threading
+import time
+
+import config as app_config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    1秒あたり rate 個のトークンが補充され、最大 capacity 個まで貯まるバケット。
+    acquire() はトークンが得られるまで待ってから消費します。複数スレッドから安全に呼び出せます。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate と capacity は正の値である必要があります。")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens: float = 1.0, timeout: float | None = None) -> bool:
+        """トークンが得られるまで待って消費します。timeout 秒以内に得られなければ False を返します。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_sec = (tokens - self._tokens) / self.rate
+            if deadline is not None and now + wait_sec > deadline:
+                return False
+            time.sleep(wait_sec)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> TokenBucket:
+    """名前ごとに共有のリミッターを返します。設定は config.RATE_LIMIT_CONFIG (未定義の名前は "default") から読みます。"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            cfg = app_config.RATE_LIMIT_CONFIG.get(name, app_config.RATE_LIMIT_CONFIG["default"])
+            limiter = TokenBucket(cfg["rate_per_sec"], cfg["burst"])
+            _limiters[name] = limiter
+            logger.info(f"レートリミッター '{name}' を作成しました (毎秒 {cfg['rate_per_sec']} 回, バースト {cfg['burst']})。")
+        return limiter
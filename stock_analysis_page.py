@@ -7,13 +7,15 @@ import time
 import logging
 import re
 import datetime
-import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import ui_styles # HTML生成関数がここにある
 import config as app_config # リファクタリング後の設定ファイル
 import api_services as api_services # リファクタリングされたAPIサービス
 import news_services as news_services # リファクタリングされたニュースサービス
 import stock_utils # stock_utils.py は前回提供したものを使用
+import ohlcv_store
+import ticker_metadata
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +32,7 @@ KEY_PAGE_LEVEL_ERROR = f"{KEY_PREFIX}page_level_error"
 KEY_DEBUG_STOCK_DATA_SUMMARY = f"{KEY_PREFIX}debug_stock_data_summary"
 KEY_DEBUG_JS_DATA_STRING_PREVIEW = f"{KEY_PREFIX}debug_js_data_string_preview"
 KEY_TARGET_STOCKS_JSON_INPUT = f"{KEY_PREFIX}target_stocks_json_input"
-KEY_RAW_NEWS_API_RESPONSES = f"{KEY_PREFIX}raw_news_api_responses"
+KEY_RAW_NEWS_API_RESPONSE_IDS = f"{KEY_PREFIX}raw_news_api_response_ids" # 生レスポンス本文は news_services.load_raw_api_response で読み込む
 KEY_COLLECT_RELATED_STOCKS = f"{KEY_PREFIX}collect_related_stocks"
 KEY_ALL_STOCK_DATA_FOR_REPORT = f"{KEY_PREFIX}all_stock_data_for_report"
 KEY_EXTENDED_TARGET_STOCKS_OPTIONS = f"{KEY_PREFIX}extended_target_stocks_options"
@@ -166,8 +168,41 @@ def process_financial_summary_for_report(financial_data_df, period_type_jp):
                 "backgroundColor": 'rgba(255, 159, 64, 0.6)', "borderColor": 'rgba(255, 159, 64, 1)', "borderWidth": 1})
     return table_html, chart_data
 
-def get_stock_data_for_html_report(ticker_code_input: str, company_name_jp: str, akm, sm) -> dict:
-    logger.info(f"レポート用データ取得開始: {company_name_jp} ({ticker_code_input})")
+# --- レポート用データの取得 ---
+# 1銘柄あたりの yfinance 呼び出し (基本情報・株価履歴・業績・決算日・アナリスト推奨) とニュース取得は互いに独立しているため、
+# 全銘柄分をまとめてワーカープールで並列に実行する。yfinance への呼び出しは ticker_metadata / ohlcv_store がキャッシュし、
+# プロセス共通のレートリミッターで間隔を制御する。
+def _fetch_recommendations(ticker_code_input: str):
+    reco_df_raw = ticker_metadata.get_field(ticker_code_input, "recommendations_summary")
+    if reco_df_raw is None or reco_df_raw.empty:
+        reco_df_raw = ticker_metadata.get_field(ticker_code_input, "recommendations")
+    return reco_df_raw
+
+# レポートの各項目の取得関数 (引数はティッカー)。ワーカースレッドで実行されるため StateManager には触れないこと
+REPORT_YFINANCE_SOURCES = {
+    "info": lambda ticker: ticker_metadata.get_field(ticker, "info"),
+    "history": lambda ticker: ohlcv_store.get_ohlcv_for_period(ticker, "1y", interval="1mo"),
+    "financials": lambda ticker: ticker_metadata.get_field(ticker, "financials"),
+    "quarterly_financials": lambda ticker: ticker_metadata.get_field(ticker, "quarterly_financials"),
+    "earnings_dates": lambda ticker: ticker_metadata.get_field(ticker, "earnings_dates"),
+    "recommendations": _fetch_recommendations,
+}
+
+def _source_value(sources: dict, name: str):
+    """取得結果 {項目名: (値, 例外)} から値を返す。取得時に例外が発生していれば、ここで送出し直す。"""
+    value, error = sources[name]
+    if error is not None:
+        raise error
+    return value
+
+def build_stock_report_payload(ticker_code_input: str, company_name_jp: str, sources: dict) -> tuple[dict, dict, str | None]:
+    """
+    取得済みの各項目 (REPORT_YFINANCE_SOURCES と "news") からレポート用データを組み立て、
+    (レポート用データ, ニュースAPIの生レスポンスのID, ページ全体のエラーメッセージ) を返す。
+    """
+    raw_news_response_ids = {}
+    page_error = None
+    logger.info(f"レポート用データ組み立て開始: {company_name_jp} ({ticker_code_input})")
     data_payload = {
         "companyName": company_name_jp, "ticker": ticker_code_input.split('.')[0], "currentPrice": None,
         "logo_url": f"https://placehold.co/120x60/e0e7ff/3730a3?text={ticker_code_input.split('.')[0]}_Init",
@@ -176,8 +211,7 @@ def get_stock_data_for_html_report(ticker_code_input: str, company_name_jp: str,
         "financialSummaryChart": {"labels": [], "datasets": []}, "earningsDatesHtml": "", "recommendationsHtml": "", "news": []
     }
     try:
-        ticker_data = yf.Ticker(ticker_code_input)
-        info = ticker_data.info
+        info = _source_value(sources, "info")
         if not info or not info.get('symbol'):
             logger.warning(f"ティッカー {ticker_code_input} の基本情報(info)を取得できませんでした。")
             data_payload["financials"] = [{"label": "エラー", "value": "基本情報取得失敗"}]
@@ -186,7 +220,7 @@ def get_stock_data_for_html_report(ticker_code_input: str, company_name_jp: str,
             data_payload["earningsDatesHtml"] = "<p class='text-sm text-red-500'>基本情報なしのため決算日データ取得失敗</p>"
             data_payload["recommendationsHtml"] = "<p class='text-sm text-red-500'>基本情報なしのためアナリスト推奨データ取得失敗</p>"
             data_payload["news"] = [{"date": "N/A", "title": "ニュース取得失敗(基本情報なし)", "source":"システム", "url":"#"}]
-            return data_payload
+            return data_payload, raw_news_response_ids, page_error
 
         data_payload.update({
             "companyName": info.get('longName', company_name_jp),
@@ -199,7 +233,7 @@ def get_stock_data_for_html_report(ticker_code_input: str, company_name_jp: str,
         data_payload["priceChange"] = f"{price_change_val:+.2f} ({format_percentage(price_change_percent_val, 2)})"
         data_payload["priceChangeColor"] = "text-green-600" if price_change_val >= 0 else "text-red-600"
 
-        hist = ticker_data.history(period="1y", interval="1mo")
+        hist = _source_value(sources, "history")
         if not hist.empty:
             data_payload["historicalPrices"] = {
                 "labels": [f"{idx.year}-{idx.month:02d}月" for idx in hist.index],
@@ -220,7 +254,7 @@ def get_stock_data_for_html_report(ticker_code_input: str, company_name_jp: str,
         ]
 
         try:
-            financials_annual_df = ticker_data.financials
+            financials_annual_df = _source_value(sources, "financials")
             table_html_annual, chart_data_annual = process_financial_summary_for_report(financials_annual_df, "通期")
             data_payload["financialSummaryAnnual"]["table_html"] = table_html_annual
             if chart_data_annual: data_payload["financialSummaryChart"] = chart_data_annual
@@ -229,7 +263,7 @@ def get_stock_data_for_html_report(ticker_code_input: str, company_name_jp: str,
             data_payload["financialSummaryAnnual"]["table_html"] = f"<p class='text-sm text-red-500'>通期業績エラー: {e_fin_an}</p>"
 
         try:
-            financials_quarterly_df = ticker_data.quarterly_financials
+            financials_quarterly_df = _source_value(sources, "quarterly_financials")
             table_html_quarterly, _ = process_financial_summary_for_report(financials_quarterly_df, "四半期")
             data_payload["financialSummaryQuarterly"]["table_html"] = table_html_quarterly
         except Exception as e_fin_q:
@@ -237,7 +271,7 @@ def get_stock_data_for_html_report(ticker_code_input: str, company_name_jp: str,
             data_payload["financialSummaryQuarterly"]["table_html"] = f"<p class='text-sm text-red-500'>四半期業績エラー: {e_fin_q}</p>"
 
         try:
-            earnings_df_raw = ticker_data.earnings_dates
+            earnings_df_raw = _source_value(sources, "earnings_dates")
             if earnings_df_raw is not None and not earnings_df_raw.empty:
                 earnings_df_processed = earnings_df_raw.copy().reset_index()
                 earnings_df_processed.columns = [col.replace(' ', '_') for col in earnings_df_processed.columns]
@@ -269,9 +303,7 @@ def get_stock_data_for_html_report(ticker_code_input: str, company_name_jp: str,
             data_payload["earningsDatesHtml"] = f"<p class='text-sm text-red-500'>決算発表日エラー: {e_earn}</p>"
 
         try:
-            reco_df_raw = ticker_data.recommendations_summary
-            if reco_df_raw is None or reco_df_raw.empty:
-                reco_df_raw = ticker_data.recommendations
+            reco_df_raw = _source_value(sources, "recommendations")
 
             if reco_df_raw is not None and not reco_df_raw.empty:
                 reco_df_processed = reco_df_raw.copy()
@@ -302,7 +334,7 @@ def get_stock_data_for_html_report(ticker_code_input: str, company_name_jp: str,
             logger.warning(f"アナリスト推奨データ処理エラー ({ticker_code_input}): {e_reco}")
             data_payload["recommendationsHtml"] = f"<p class='text-sm text-red-500'>アナリスト推奨エラー: {e_reco}</p>"
 
-        news_data_result = news_services.fetch_all_stock_news(company_name_jp, app_config.NEWS_SERVICE_CONFIG["active_apis"], akm)
+        news_data_result = _source_value(sources, "news")
         company_news_items = news_data_result.get("all_company_news_deduplicated", [])
         data_payload["news"] = [{"date": item.get('日付', 'N/A'), "title": item.get('タイトル', 'N/A'), "source": item.get('ソース', 'N/A'), "url": item.get('URL', '#')} for item in company_news_items[:5]]
         if not data_payload["news"]:
@@ -313,30 +345,29 @@ def get_stock_data_for_html_report(ticker_code_input: str, company_name_jp: str,
 
             data_payload["news"] = [{"date": "N/A", "title": news_api_message, "source": "システムメッセージ", "url": "#"}]
 
-        if sm:
-            raw_responses_all = sm.get_value(KEY_RAW_NEWS_API_RESPONSES, {})
-            raw_responses_all[data_payload['ticker']] = news_data_result.get("raw_api_responses", {})
-            sm.set_value(KEY_RAW_NEWS_API_RESPONSES, raw_responses_all)
+        raw_news_response_ids = news_data_result.get("raw_api_response_ids", {})
 
-        logger.info(f"レポート用データ取得完了: {company_name_jp} ({ticker_code_input})")
+        logger.info(f"レポート用データ組み立て完了: {company_name_jp} ({ticker_code_input})")
     except Exception as e:
-        logger.error(f"get_stock_data_for_html_report で予期せぬエラー ({ticker_code_input}): {e}", exc_info=True)
-        if sm: sm.set_value(KEY_PAGE_LEVEL_ERROR, f"銘柄「{company_name_jp}」のデータ取得中に予期せぬエラー: {e}")
+        logger.error(f"build_stock_report_payload で予期せぬエラー ({ticker_code_input}): {e}", exc_info=True)
+        page_error = f"銘柄「{company_name_jp}」のデータ取得中に予期せぬエラー: {e}"
         data_payload["financials"] = [{"label": "エラー", "value": f"データ取得全体エラー: {e}"}]
         data_payload["financialSummaryAnnual"]["table_html"] = f"<p class='text-sm text-red-500'>通期業績データ取得エラー: {e}</p>"
         data_payload["financialSummaryQuarterly"]["table_html"] = f"<p class='text-sm text-red-500'>四半期業績データ取得エラー: {e}</p>"
         data_payload["earningsDatesHtml"] = f"<p class='text-sm text-red-500'>決算日データ取得エラー: {e}</p>"
         data_payload["recommendationsHtml"] = f"<p class='text-sm text-red-500'>アナリスト推奨データ取得エラー: {e}</p>"
         data_payload["news"] = [{"date": "N/A", "title": f"ニュースデータ取得エラー: {e}", "source": "システム", "url":"#"}]
-    return data_payload
+    return data_payload, raw_news_response_ids, page_error
 
 # --- ▼▼▼ ここから修正 ▼▼▼ ---
 # @st.cache_dataデコレータを削除し、通常の関数に変更
 # 引数にsmとakmを明示的に受け取るように変更
-def load_all_stock_data_for_report(stocks_dict, akm, sm):
+def load_all_stock_data_for_report(stocks_dict, akm, sm, progress_callback=None):
     """
     指定された銘柄辞書のすべての銘柄について、レポート用のデータを取得する。
-    この関数はセッションステートにアクセス・更新するため、キャッシュしない。
+    全銘柄の yfinance の各取得項目をワーカープールで、全銘柄のニュースを別スレッドで1回にまとめて並列に実行し、1銘柄分がそろうたびに組み立てて
+    progress_callback(完了銘柄数, 全銘柄数, 銘柄名) を呼び出す。
+    この関数はセッションステートにアクセス・更新するため、キャッシュしない (StateManagerへの書き込みはメインスレッドでのみ行う)。
     """
     all_data = {}
     total_stocks = len(stocks_dict)
@@ -347,25 +378,94 @@ def load_all_stock_data_for_report(stocks_dict, akm, sm):
         logger.error("load_all_stock_data_for_report: StateManagerが提供されていません。")
         return {}
 
-    # ニュースの生レスポンスを保存する領域を初期化
-    sm.set_value(KEY_RAW_NEWS_API_RESPONSES, {})
-
-    for i, (ticker_code, name) in enumerate(stocks_dict.items()):
-        logger.info(f"データ取得中 ({i+1}/{total_stocks}): {name} ({ticker_code})")
-        try:
-            # get_stock_data_for_html_reportにakmとsmを渡す
-            stock_data = get_stock_data_for_html_report(ticker_code, name, akm, sm)
-            all_data[str(ticker_code).split('.')[0]] = stock_data
-        except Exception as e:
-            logger.error(f"load_all_stock_data_for_report内でエラー: {name} ({ticker_code}) - {e}", exc_info=True)
-            all_data[str(ticker_code).split('.')[0]] = {"companyName": name, "ticker": str(ticker_code).split('.')[0], "error": str(e)}
-        # APIへの連続リクエストを避けるための短い待機
-        time.sleep(0.2)
-
-    logger.info(f"全{total_stocks}銘柄のレポート用データ取得処理完了。")
+    # ニュースの生レスポンスのIDを保存する領域を初期化 (本文はデバッグ表示を開いたときに読み込む)
+    sm.set_value(KEY_RAW_NEWS_API_RESPONSE_IDS, {})
+    raw_response_ids_all = {}
+    source_count = len(REPORT_YFINANCE_SOURCES) + 1  # + ニュース
+    sources_by_ticker = {ticker_code: {} for ticker_code in stocks_dict}
+    completed = 0
+    start_time = time.time()
+
+    # ニュースは全銘柄分を1回の fetch_news_for_stocks でまとめて取得する (市場ニュースの取得も1回で済む)。
+    # ニュースの取得は締め切りまでワーカーを占有しうるため、yfinance のワーカープールとは別のスレッドで実行する
+    with ThreadPoolExecutor(max_workers=1) as news_executor, \
+            ThreadPoolExecutor(max_workers=app_config.STOCK_REPORT_MAX_WORKERS) as executor:
+        news_future = news_executor.submit(news_services.fetch_news_for_stocks, list(stocks_dict.values()),
+                                           app_config.NEWS_SERVICE_CONFIG["active_apis"], akm)
+        future_to_source = {news_future: (None, "news")}
+        # 銘柄ごとに順に投入するので、先頭の銘柄から順にそろっていく
+        for ticker_code in stocks_dict:
+            for source_name, fetch in REPORT_YFINANCE_SOURCES.items():
+                future_to_source[executor.submit(fetch, ticker_code)] = (ticker_code, source_name)
+
+        for future in as_completed(future_to_source):
+            ticker_code, source_name = future_to_source[future]
+            if source_name == "news":
+                try:
+                    news_by_stock, news_error = future.result(), None
+                except Exception as e:
+                    logger.warning(f"レポート用ニュース取得エラー: {e}")
+                    news_by_stock, news_error = {}, e
+                for code, name in stocks_dict.items():
+                    sources_by_ticker[code]["news"] = (news_by_stock.get(name, {}), news_error)
+                ready_codes = list(stocks_dict)
+            else:
+                try:
+                    sources_by_ticker[ticker_code][source_name] = (future.result(), None)
+                except Exception as e:
+                    logger.warning(f"レポート用データ取得エラー ({ticker_code}, {source_name}): {e}")
+                    sources_by_ticker[ticker_code][source_name] = (None, e)
+                ready_codes = [ticker_code]
+
+            for ticker_code in ready_codes:
+                if ticker_code not in sources_by_ticker or len(sources_by_ticker[ticker_code]) < source_count:
+                    continue
+                name = stocks_dict[ticker_code]
+                ticker_key = str(ticker_code).split('.')[0]
+                try:
+                    stock_data, raw_news_response_ids, page_error = build_stock_report_payload(ticker_code, name, sources_by_ticker.pop(ticker_code))
+                    all_data[ticker_key] = stock_data
+                    raw_response_ids_all[stock_data['ticker']] = raw_news_response_ids
+                    if page_error:
+                        sm.set_value(KEY_PAGE_LEVEL_ERROR, page_error)
+                except Exception as e:
+                    logger.error(f"load_all_stock_data_for_report内でエラー: {name} ({ticker_code}) - {e}", exc_info=True)
+                    all_data[ticker_key] = {"companyName": name, "ticker": ticker_key, "error": str(e)}
+                completed += 1
+                logger.info(f"データ取得完了 ({completed}/{total_stocks}): {name} ({ticker_code})")
+                if progress_callback:
+                    progress_callback(completed, total_stocks, name)
+
+    sm.set_value(KEY_RAW_NEWS_API_RESPONSE_IDS, raw_response_ids_all)
+    # 表示順は入力した銘柄の順にそろえる
+    ordered_keys = [str(ticker_code).split('.')[0] for ticker_code in stocks_dict]
+    all_data = {key: all_data[key] for key in dict.fromkeys(ordered_keys) if key in all_data}
+    logger.info(f"全{total_stocks}銘柄のレポート用データ取得処理完了。所要時間: {time.time() - start_time:.1f}秒")
     return all_data
 # --- ▲▲▲ ここまで修正 ▲▲▲ ---
 
+# --- デバッグ表示 ---
+def render_raw_news_responses_debug(sm):
+    """ニュースAPIの生レスポンスを表示するデバッグ用エクスパンダー。本文はチェックを入れたときに選択中の銘柄の分だけ読み込む。"""
+    raw_response_ids_all = sm.get_value(KEY_RAW_NEWS_API_RESPONSE_IDS, {})
+    if not raw_response_ids_all:
+        return
+    with st.expander("🔧 ニュースAPIの生レスポンス (デバッグ用)"):
+        selected_ticker = st.selectbox("銘柄", options=list(raw_response_ids_all.keys()), key=f"{KEY_PREFIX}raw_news_debug_ticker")
+        if not st.checkbox("生レスポンスを読み込んで表示する", key=f"{KEY_PREFIX}raw_news_debug_load"):
+            return
+        for api_name, ids_by_phase in raw_response_ids_all.get(selected_ticker, {}).items():
+            for phase, raw_id in ids_by_phase.items():
+                st.markdown(f"**{api_name} ({phase})**")
+                if raw_id is None:
+                    st.caption("このAPIは呼び出されていません。")
+                    continue
+                body = news_services.load_raw_api_response(raw_id)
+                if body is None:
+                    st.caption("保存期間を過ぎたため表示できません。レポートを再生成してください。")
+                else:
+                    st.code(body[:20000], language="json")
+
 # --- メインページ描画関数 ---
 def render_page(sm, fm, akm, active_model):
     st.header("ステップ3: 株式情報レポート & AI分析")
@@ -545,10 +645,15 @@ def render_page(sm, fm, akm, active_model):
                 sm.set_value(KEY_REPORT_BUTTON_CLICKED, False); st.rerun(); return
 
             status_placeholder_report.info(f"全{len(effective_target_stocks)}銘柄のデータ取得開始...", icon="⏳")
+            report_progress_bar = st.progress(0.0, text=f"銘柄データを取得中... (0/{len(effective_target_stocks)})")
+
+            def on_report_progress(done, total, name):
+                report_progress_bar.progress(done / total, text=f"銘柄データを取得中... ({done}/{total}) {name} 完了")
 
             # --- ▼▼▼ ここから修正 ▼▼▼ ---
             # 修正したload_all_stock_data_for_report関数を呼び出す
-            all_stock_data = load_all_stock_data_for_report(effective_target_stocks, akm, sm)
+            all_stock_data = load_all_stock_data_for_report(effective_target_stocks, akm, sm, progress_callback=on_report_progress)
+            report_progress_bar.empty()
             # --- ▲▲▲ ここまで修正 ▲▲▲ ---
 
             if not all_stock_data:
@@ -589,6 +694,8 @@ def render_page(sm, fm, akm, active_model):
         else:
             st.markdown(html_content_val, unsafe_allow_html=True)
 
+        render_raw_news_responses_debug(sm)
+
         st.markdown("---")
         st.subheader("AIによる財務・関連ニュース分析")
         ai_status_placeholder = st.empty()
@@ -686,18 +793,17 @@ def render_page(sm, fm, akm, active_model):
 
                     try:
                         logger.info(f"AI分析用データ取得開始 (yfinance): {selected_name_ai} ({selected_ticker_ai_with_suffix})")
-                        ticker_obj_for_ai = yf.Ticker(selected_ticker_ai_with_suffix)
-                        info_for_ai = ticker_obj_for_ai.info
+                        info_for_ai = ticker_metadata.get_field(selected_ticker_ai_with_suffix, "info")
                         if not info_for_ai or not info_for_ai.get('symbol'):
                             raise ValueError(f"{selected_name_ai} の基本情報(info)をAI分析用に取得できませんでした。")
 
-                        fin_df_ai = ticker_obj_for_ai.financials
-                        q_fin_df_ai = ticker_obj_for_ai.quarterly_financials
-                        div_df_ai_raw = ticker_obj_for_ai.dividends
+                        fin_df_ai = ticker_metadata.get_field(selected_ticker_ai_with_suffix, "financials")
+                        q_fin_df_ai = ticker_metadata.get_field(selected_ticker_ai_with_suffix, "quarterly_financials")
+                        div_df_ai_raw = ticker_metadata.get_field(selected_ticker_ai_with_suffix, "dividends")
                         div_df_ai = div_df_ai_raw.reset_index() if div_df_ai_raw is not None and not div_df_ai_raw.empty else pd.DataFrame()
-                        earn_df_ai_raw = ticker_obj_for_ai.earnings_dates
+                        earn_df_ai_raw = ticker_metadata.get_field(selected_ticker_ai_with_suffix, "earnings_dates")
                         earn_df_ai = earn_df_ai_raw.reset_index() if earn_df_ai_raw is not None and not earn_df_ai_raw.empty else pd.DataFrame()
-                        reco_df_ai_raw = ticker_obj_for_ai.recommendations
+                        reco_df_ai_raw = ticker_metadata.get_field(selected_ticker_ai_with_suffix, "recommendations")
                         reco_df_ai = reco_df_ai_raw.reset_index() if reco_df_ai_raw is not None and not reco_df_ai_raw.empty else pd.DataFrame()
                         logger.info(f"AI分析用 yfinanceデータ取得完了: {selected_name_ai}")
                     except Exception as e_yf_ai:
@@ -26,7 +26,9 @@ except ImportError:
 try:
     from . import data_utils
     from . import plot_utils
-    from .indicators import trend_indicators, oscillator_indicators, volume_indicators, other_indicators
+    from .indicators import trend_indicators, oscillator_indicators, volume_indicators, other_indicators, sweep
+    from .indicators import engine as indicator_engine
+    from .indicators import incremental as incremental_indicators
     from . import chart_analyzer
     logger.info("stock_chart_app.app.py: Core utility modules imported successfully.")
 except ImportError as e:
@@ -36,42 +38,47 @@ except ImportError as e:
 # --- Constants and Configuration ---
 INDICATORS_CONFIG = {
     # --- トレンド系指標 ---
-    'sma': {'label': '単純移動平均線 (SMA)', 'module': trend_indicators, 'calc_func': 'calculate_sma', 'plot_func': 'add_sma_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"SMA_{p.get('window', 20)}"]},
-    'ema': {'label': '指数平滑移動平均線 (EMA)', 'module': trend_indicators, 'calc_func': 'calculate_ema', 'plot_func': 'add_ema_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"EMA_{p.get('window', 20)}"]},
-    'bollinger': {'label': 'ボリンジャーバンド (2σ & 3σ)', 'module': trend_indicators, 'calc_func': 'calculate_bollinger_bands', 'plot_func': 'add_bollinger_bands_traces', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"BB_Mid_{p.get('window', 20)}", f"BB_Upper_2std_{p.get('window', 20)}", f"BB_Lower_2std_{p.get('window', 20)}", f"BB_Upper_3std_{p.get('window', 20)}", f"BB_Lower_3std_{p.get('window', 20)}"]},
-    'ichimoku': {'label': '一目均衡表', 'module': trend_indicators, 'calc_func': 'calculate_ichimoku', 'plot_func': 'add_ichimoku_traces', 'params': {}, 'plot_on_price': True, 'data_cols': lambda p: ['tenkan_sen', 'kijun_sen', 'senkou_span_a', 'senkou_span_b', 'chikou_span']},
-    'psar': {'label': 'パラボリックSAR', 'module': trend_indicators, 'calc_func': 'calculate_parabolic_sar', 'plot_func': 'add_parabolic_sar_trace', 'params': {'initial_af': {'type': 'number_input', 'label': '初速AF', 'default': 0.02, 'min': 0.01, 'max': 0.2, 'step': 0.01}, 'af_increment': {'type': 'number_input', 'label': '加速AF', 'default': 0.02, 'min': 0.01, 'max': 0.2, 'step': 0.01}, 'max_af': {'type': 'number_input', 'label': '最大AF', 'default': 0.2, 'min': 0.1, 'max': 1.0, 'step': 0.05}}, 'plot_on_price': True, 'data_cols': lambda p: ['psar']},
-    'ma_envelope': {'label': 'エンベロープ', 'module': trend_indicators, 'calc_func': 'calculate_ma_envelope', 'plot_func': 'add_ma_envelope_traces', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}, 'percentage': {'type': 'number_input', 'label': '乖離率(%)', 'default': 2.5, 'min': 0.1, 'max': 50.0, 'step': 0.1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"envelope_upper_{p.get('window', 20)}", f"envelope_lower_{p.get('window', 20)}"]},
-    'donchian': {'label': 'ドンチアンチャネル', 'module': trend_indicators, 'calc_func': 'calculate_donchian_channel', 'plot_func': 'add_donchian_channel_traces', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"donchian_upper_{p.get('window', 20)}", f"donchian_lower_{p.get('window', 20)}"]},
-    'keltner': {'label': 'ケルトナーチャネル', 'module': trend_indicators, 'calc_func': 'calculate_keltner_channels', 'plot_func': 'add_keltner_channels_traces', 'params': {'ema_window': {'type': 'number_input', 'label': 'EMA期間', 'default': 20, 'min': 1, 'max': 100}, 'atr_window': {'type': 'number_input', 'label': 'ATR期間', 'default': 10, 'min': 1, 'max': 100}, 'atr_multiplier': {'type': 'number_input', 'label': 'ATR倍率', 'default': 2.0, 'min': 0.1, 'max': 10.0, 'step': 0.1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"kc_upper_{p.get('ema_window', 20)}", f"kc_lower_{p.get('ema_window', 20)}"]},
+    'sma': {'label': '単純移動平均線 (SMA)', 'module': trend_indicators, 'calc_func': 'calculate_sma', 'columns_func': 'sma_columns', 'plot_func': 'add_sma_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"SMA_{p.get('window', 20)}"]},
+    'ema': {'label': '指数平滑移動平均線 (EMA)', 'module': trend_indicators, 'calc_func': 'calculate_ema', 'columns_func': 'ema_columns', 'plot_func': 'add_ema_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"EMA_{p.get('window', 20)}"]},
+    'wma': {'label': '加重移動平均線 (WMA)', 'module': trend_indicators, 'calc_func': 'calculate_wma', 'columns_func': 'wma_columns', 'plot_func': 'add_wma_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"WMA_{p.get('window', 20)}"]},
+    'hma': {'label': 'ハル移動平均線 (HMA)', 'module': trend_indicators, 'calc_func': 'calculate_hma', 'columns_func': 'hma_columns', 'plot_func': 'add_hma_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 2, 'max': 200, 'step': 1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"HMA_{p.get('window', 20)}"]},
+    'sma_multi': {'label': '複数期間SMA (5/25/75/200)', 'module': trend_indicators, 'calc_func': 'calculate_sma_multi', 'columns_func': 'sma_multi_columns', 'plot_func': 'add_sma_multi_traces', 'params': {'windows': {'type': 'text_input', 'label': '期間 (カンマ区切り)', 'default': '5,25,75,200'}}, 'plot_on_price': True, 'data_cols': lambda p: [f"SMA_{w}" for w in sweep.parse_parameter_list(p.get('windows', '5,25,75,200'))]},
+    'ema_multi': {'label': '複数期間EMA (5/25/75/200)', 'module': trend_indicators, 'calc_func': 'calculate_ema_multi', 'columns_func': 'ema_multi_columns', 'plot_func': 'add_ema_multi_traces', 'params': {'windows': {'type': 'text_input', 'label': '期間 (カンマ区切り)', 'default': '5,25,75,200'}}, 'plot_on_price': True, 'data_cols': lambda p: [f"EMA_{w}" for w in sweep.parse_parameter_list(p.get('windows', '5,25,75,200'))]},
+    'bollinger': {'label': 'ボリンジャーバンド (2σ & 3σ)', 'module': trend_indicators, 'calc_func': 'calculate_bollinger_bands', 'columns_func': 'bollinger_bands_columns', 'plot_func': 'add_bollinger_bands_traces', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"BB_Mid_{p.get('window', 20)}", f"BB_Upper_2std_{p.get('window', 20)}", f"BB_Lower_2std_{p.get('window', 20)}", f"BB_Upper_3std_{p.get('window', 20)}", f"BB_Lower_3std_{p.get('window', 20)}"]},
+    'ichimoku': {'label': '一目均衡表', 'module': trend_indicators, 'calc_func': 'calculate_ichimoku', 'columns_func': 'ichimoku_columns', 'plot_func': 'add_ichimoku_traces', 'params': {}, 'plot_on_price': True, 'data_cols': lambda p: ['tenkan_sen', 'kijun_sen', 'senkou_span_a', 'senkou_span_b', 'chikou_span']},
+    'psar': {'label': 'パラボリックSAR', 'module': trend_indicators, 'calc_func': 'calculate_parabolic_sar', 'columns_func': 'parabolic_sar_columns', 'plot_func': 'add_parabolic_sar_trace', 'params': {'initial_af': {'type': 'number_input', 'label': '初速AF', 'default': 0.02, 'min': 0.01, 'max': 0.2, 'step': 0.01}, 'af_increment': {'type': 'number_input', 'label': '加速AF', 'default': 0.02, 'min': 0.01, 'max': 0.2, 'step': 0.01}, 'max_af': {'type': 'number_input', 'label': '最大AF', 'default': 0.2, 'min': 0.1, 'max': 1.0, 'step': 0.05}}, 'plot_on_price': True, 'data_cols': lambda p: ['psar', 'psar_trend', 'psar_af']},
+    'ma_envelope': {'label': 'エンベロープ', 'module': trend_indicators, 'calc_func': 'calculate_ma_envelope', 'columns_func': 'ma_envelope_columns', 'plot_func': 'add_ma_envelope_traces', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}, 'percentage': {'type': 'number_input', 'label': '乖離率(%)', 'default': 2.5, 'min': 0.1, 'max': 50.0, 'step': 0.1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"envelope_upper_{p.get('window', 20)}", f"envelope_lower_{p.get('window', 20)}"]},
+    'donchian': {'label': 'ドンチアンチャネル', 'module': trend_indicators, 'calc_func': 'calculate_donchian_channel', 'columns_func': 'donchian_channel_columns', 'plot_func': 'add_donchian_channel_traces', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1, 'max': 200, 'step': 1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"donchian_upper_{p.get('window', 20)}", f"donchian_lower_{p.get('window', 20)}"]},
+    'keltner': {'label': 'ケルトナーチャネル', 'module': trend_indicators, 'calc_func': 'calculate_keltner_channels', 'columns_func': 'keltner_channels_columns', 'plot_func': 'add_keltner_channels_traces', 'params': {'ema_window': {'type': 'number_input', 'label': 'EMA期間', 'default': 20, 'min': 1, 'max': 100}, 'atr_window': {'type': 'number_input', 'label': 'ATR期間', 'default': 10, 'min': 1, 'max': 100}, 'atr_multiplier': {'type': 'number_input', 'label': 'ATR倍率', 'default': 2.0, 'min': 0.1, 'max': 10.0, 'step': 0.1}}, 'plot_on_price': True, 'data_cols': lambda p: [f"kc_upper_{p.get('ema_window', 20)}", f"kc_lower_{p.get('ema_window', 20)}"]},
 
     # --- オシレーター系指標 ---
-    'macd': {'label': 'MACD', 'module': trend_indicators, 'calc_func': 'calculate_macd', 'plot_func': 'add_macd_traces', 'params': {'fast_period': {'type': 'number_input', 'label': '短期EMA', 'default': 12, 'min': 1}, 'slow_period': {'type': 'number_input', 'label': '長期EMA', 'default': 26, 'min': 1}, 'signal_period': {'type': 'number_input', 'label': 'シグナル', 'default': 9, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'MACD', 'data_cols': lambda p: ['MACD_Line', 'MACD_Signal', 'MACD_Hist']},
-    'rsi': {'label': 'RSI', 'module': oscillator_indicators, 'calc_func': 'calculate_rsi', 'plot_func': 'add_rsi_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'RSI', 'data_cols': lambda p: [f"RSI_{p.get('window', 14)}"]},
-    'stochastics': {'label': 'ストキャスティクス', 'module': oscillator_indicators, 'calc_func': 'calculate_stochastics', 'plot_func': 'add_stochastics_traces', 'params': {'k_window': {'type': 'number_input', 'label': '%K期間', 'default': 14, 'min': 1}, 'd_window': {'type': 'number_input', 'label': '%D期間', 'default': 3, 'min': 1}, 'smooth_k': {'type': 'number_input', 'label': '平滑化', 'default': 3, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Stochastics', 'data_cols': lambda p: [f"%K_{p.get('k_window', 14)}", f"%D_{p.get('d_window', 3)}"]},
-    'rci': {'label': 'RCI (順位相関指数)', 'module': oscillator_indicators, 'calc_func': 'calculate_rci', 'plot_func': 'add_rci_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 9, 'min': 2, 'max': 50}}, 'plot_on_price': False, 'subplot_name': 'RCI', 'data_cols': lambda p: [f"RCI_{p.get('window', 9)}"]},
-    'dmi_adx': {'label': 'DMI/ADX', 'module': oscillator_indicators, 'calc_func': 'calculate_dmi_adx', 'plot_func': 'add_dmi_adx_traces', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'DMI/ADX', 'data_cols': lambda p: [f"plus_di_{p.get('window',14)}", f"minus_di_{p.get('window',14)}", f"adx_{p.get('window',14)}"]},
-    'williams_r': {'label': 'ウィリアムズ %R', 'module': oscillator_indicators, 'calc_func': 'calculate_williams_r', 'plot_func': 'add_williams_r_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Williams %R', 'data_cols': lambda p: [f"williams_r_{p.get('window',14)}"]},
-    'aroon': {'label': 'アルーン', 'module': oscillator_indicators, 'calc_func': 'calculate_aroon', 'plot_func': 'add_aroon_traces', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 25, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Aroon', 'data_cols': lambda p: [f"aroon_up_{p.get('window', 25)}", f"aroon_down_{p.get('window', 25)}"]},
-    'coppock': {'label': 'コポックカーブ', 'module': oscillator_indicators, 'calc_func': 'calculate_coppock_curve', 'plot_func': 'add_coppock_curve_trace', 'params': {'roc1_period': {'type': 'number_input', 'label': 'ROC1期間', 'default': 14}, 'roc2_period': {'type': 'number_input', 'label': 'ROC2期間', 'default': 11}, 'wma_period': {'type': 'number_input', 'label': 'WMA期間', 'default': 10}}, 'plot_on_price': False, 'subplot_name': 'Coppock Curve', 'data_cols': lambda p: ['coppock']},
-    'force_index': {'label': 'フォースインデックス', 'module': oscillator_indicators, 'calc_func': 'calculate_force_index', 'plot_func': 'add_force_index_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 13, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Force Index', 'data_cols': lambda p: [f"force_index_{p.get('window',13)}"]},
-    'mass_index': {'label': 'マスインデックス', 'module': oscillator_indicators, 'calc_func': 'calculate_mass_index', 'plot_func': 'add_mass_index_trace', 'params': {'sum_period': {'type': 'number_input', 'label': '合計期間', 'default': 25, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Mass Index', 'data_cols': lambda p: [f"mass_index_{p.get('sum_period',25)}"]},
-    'psy_line': {'label': 'サイコロジカルライン', 'module': oscillator_indicators, 'calc_func': 'calculate_psychological_line', 'plot_func': 'add_psychological_line_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 12, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Psychological Line', 'data_cols': lambda p: [f"psy_line_{p.get('window',12)}"]},
-    'ma_dev_rate': {'label': '移動平均乖離率', 'module': oscillator_indicators, 'calc_func': 'calculate_ma_deviation_rate', 'plot_func': 'add_ma_deviation_rate_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'MA Deviation Rate', 'data_cols': lambda p: [f"ma_dev_rate_{p.get('window',20)}"]},
+    'macd': {'label': 'MACD', 'module': trend_indicators, 'calc_func': 'calculate_macd', 'columns_func': 'macd_columns', 'plot_func': 'add_macd_traces', 'params': {'fast_period': {'type': 'number_input', 'label': '短期EMA', 'default': 12, 'min': 1}, 'slow_period': {'type': 'number_input', 'label': '長期EMA', 'default': 26, 'min': 1}, 'signal_period': {'type': 'number_input', 'label': 'シグナル', 'default': 9, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'MACD', 'data_cols': lambda p: ['MACD_Line', 'MACD_Signal', 'MACD_Hist']},
+    'rsi': {'label': 'RSI', 'module': oscillator_indicators, 'calc_func': 'calculate_rsi', 'columns_func': 'rsi_columns', 'plot_func': 'add_rsi_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'RSI', 'data_cols': lambda p: [f"RSI_{p.get('window', 14)}"]},
+    'stochastics': {'label': 'ストキャスティクス', 'module': oscillator_indicators, 'calc_func': 'calculate_stochastics', 'columns_func': 'stochastics_columns', 'plot_func': 'add_stochastics_traces', 'params': {'k_window': {'type': 'number_input', 'label': '%K期間', 'default': 14, 'min': 1}, 'd_window': {'type': 'number_input', 'label': '%D期間', 'default': 3, 'min': 1}, 'smooth_k': {'type': 'number_input', 'label': '平滑化', 'default': 3, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Stochastics', 'data_cols': lambda p: [f"%K_{p.get('k_window', 14)}", f"%D_{p.get('d_window', 3)}"]},
+    'rci': {'label': 'RCI (順位相関指数)', 'module': oscillator_indicators, 'calc_func': 'calculate_rci', 'columns_func': 'rci_columns', 'plot_func': 'add_rci_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 9, 'min': 2, 'max': 50}}, 'plot_on_price': False, 'subplot_name': 'RCI', 'data_cols': lambda p: [f"RCI_{p.get('window', 9)}"]},
+    'rci_multi': {'label': 'RCI (短期・中期・長期)', 'module': oscillator_indicators, 'calc_func': 'calculate_rci_multi', 'columns_func': 'rci_multi_columns', 'plot_func': 'add_rci_multi_traces', 'params': {'short_window': {'type': 'number_input', 'label': '短期', 'default': 9, 'min': 2, 'max': 100}, 'mid_window': {'type': 'number_input', 'label': '中期', 'default': 26, 'min': 2, 'max': 200}, 'long_window': {'type': 'number_input', 'label': '長期', 'default': 52, 'min': 2, 'max': 300}}, 'plot_on_price': False, 'subplot_name': 'RCI (3本)', 'data_cols': lambda p: list(dict.fromkeys(f"RCI_{p.get(k, d)}" for k, d in (('short_window', 9), ('mid_window', 26), ('long_window', 52))))},
+    'dmi_adx': {'label': 'DMI/ADX', 'module': oscillator_indicators, 'calc_func': 'calculate_dmi_adx', 'columns_func': 'dmi_adx_columns', 'plot_func': 'add_dmi_adx_traces', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'DMI/ADX', 'data_cols': lambda p: [f"plus_di_{p.get('window',14)}", f"minus_di_{p.get('window',14)}", f"adx_{p.get('window',14)}"]},
+    'williams_r': {'label': 'ウィリアムズ %R', 'module': oscillator_indicators, 'calc_func': 'calculate_williams_r', 'columns_func': 'williams_r_columns', 'plot_func': 'add_williams_r_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Williams %R', 'data_cols': lambda p: [f"williams_r_{p.get('window',14)}"]},
+    'aroon': {'label': 'アルーン', 'module': oscillator_indicators, 'calc_func': 'calculate_aroon', 'columns_func': 'aroon_columns', 'plot_func': 'add_aroon_traces', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 25, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Aroon', 'data_cols': lambda p: [f"aroon_up_{p.get('window', 25)}", f"aroon_down_{p.get('window', 25)}"]},
+    'coppock': {'label': 'コポックカーブ', 'module': oscillator_indicators, 'calc_func': 'calculate_coppock_curve', 'columns_func': 'coppock_curve_columns', 'plot_func': 'add_coppock_curve_trace', 'params': {'roc1_period': {'type': 'number_input', 'label': 'ROC1期間', 'default': 14}, 'roc2_period': {'type': 'number_input', 'label': 'ROC2期間', 'default': 11}, 'wma_period': {'type': 'number_input', 'label': 'WMA期間', 'default': 10}}, 'plot_on_price': False, 'subplot_name': 'Coppock Curve', 'data_cols': lambda p: ['coppock']},
+    'force_index': {'label': 'フォースインデックス', 'module': oscillator_indicators, 'calc_func': 'calculate_force_index', 'columns_func': 'force_index_columns', 'plot_func': 'add_force_index_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 13, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Force Index', 'data_cols': lambda p: [f"force_index_{p.get('window',13)}"]},
+    'mass_index': {'label': 'マスインデックス', 'module': oscillator_indicators, 'calc_func': 'calculate_mass_index', 'columns_func': 'mass_index_columns', 'plot_func': 'add_mass_index_trace', 'params': {'sum_period': {'type': 'number_input', 'label': '合計期間', 'default': 25, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Mass Index', 'data_cols': lambda p: [f"mass_index_{p.get('sum_period',25)}"]},
+    'psy_line': {'label': 'サイコロジカルライン', 'module': oscillator_indicators, 'calc_func': 'calculate_psychological_line', 'columns_func': 'psychological_line_columns', 'plot_func': 'add_psychological_line_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 12, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Psychological Line', 'data_cols': lambda p: [f"psy_line_{p.get('window',12)}"]},
+    'ma_dev_rate': {'label': '移動平均乖離率', 'module': oscillator_indicators, 'calc_func': 'calculate_ma_deviation_rate', 'columns_func': 'ma_deviation_rate_columns', 'plot_func': 'add_ma_deviation_rate_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'MA Deviation Rate', 'data_cols': lambda p: [f"ma_dev_rate_{p.get('window',20)}"]},
 
     # --- 出来高系指標 ---
     'volume': {'label': '出来高', 'module': volume_indicators, 'calc_func': None, 'plot_func': 'add_volume_trace', 'params': {}, 'plot_on_price': False, 'subplot_name': '出来高', 'data_cols': lambda p: ['Volume']},
-    'volume_sma': {'label': '出来高移動平均', 'module': volume_indicators, 'calc_func': 'calculate_volume_sma', 'plot_func': 'add_volume_sma_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1}}, 'plot_on_price': False, 'on_subplot_of': 'volume', 'data_cols': lambda p: [f"Volume_SMA_{p.get('window', 20)}"]},
-    'obv': {'label': 'オンバランスボリューム (OBV)', 'module': volume_indicators, 'calc_func': 'calculate_obv', 'plot_func': 'add_obv_trace', 'params': {}, 'plot_on_price': False, 'subplot_name': 'OBV', 'data_cols': lambda p: ['obv']},
-    'mfi': {'label': 'マネーフローインデックス (MFI)', 'module': volume_indicators, 'calc_func': 'calculate_mfi', 'plot_func': 'add_mfi_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'MFI', 'data_cols': lambda p: [f"mfi_{p.get('window',14)}"]},
-    'vwap': {'label': 'VWAP (出来高加重平均価格)', 'module': volume_indicators, 'calc_func': 'calculate_vwap', 'plot_func': 'add_vwap_trace', 'params': {}, 'plot_on_price': True, 'data_cols': lambda p: ['vwap']},
-    'cmf': {'label': 'チャイキンマネーフロー (CMF)', 'module': volume_indicators, 'calc_func': 'calculate_cmf', 'plot_func': 'add_cmf_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'CMF', 'data_cols': lambda p: [f"cmf_{p.get('window',20)}"]},
-    'eom': {'label': 'イーズオブムーブメント (EOM)', 'module': volume_indicators, 'calc_func': 'calculate_eom', 'plot_func': 'add_eom_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'EOM', 'data_cols': lambda p: [f"eom_{p.get('window',14)}"]},
+    'volume_sma': {'label': '出来高移動平均', 'module': volume_indicators, 'calc_func': 'calculate_volume_sma', 'columns_func': 'volume_sma_columns', 'plot_func': 'add_volume_sma_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1}}, 'plot_on_price': False, 'on_subplot_of': 'volume', 'data_cols': lambda p: [f"Volume_SMA_{p.get('window', 20)}"]},
+    'obv': {'label': 'オンバランスボリューム (OBV)', 'module': volume_indicators, 'calc_func': 'calculate_obv', 'columns_func': 'obv_columns', 'plot_func': 'add_obv_trace', 'params': {}, 'plot_on_price': False, 'subplot_name': 'OBV', 'data_cols': lambda p: ['obv']},
+    'mfi': {'label': 'マネーフローインデックス (MFI)', 'module': volume_indicators, 'calc_func': 'calculate_mfi', 'columns_func': 'mfi_columns', 'plot_func': 'add_mfi_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'MFI', 'data_cols': lambda p: [f"mfi_{p.get('window',14)}"]},
+    'vwap': {'label': 'VWAP (出来高加重平均価格)', 'module': volume_indicators, 'calc_func': 'calculate_vwap', 'columns_func': 'vwap_columns', 'plot_func': 'add_vwap_trace', 'params': {}, 'plot_on_price': True, 'data_cols': lambda p: ['vwap']},
+    'cmf': {'label': 'チャイキンマネーフロー (CMF)', 'module': volume_indicators, 'calc_func': 'calculate_cmf', 'columns_func': 'cmf_columns', 'plot_func': 'add_cmf_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'CMF', 'data_cols': lambda p: [f"cmf_{p.get('window',20)}"]},
+    'eom': {'label': 'イーズオブムーブメント (EOM)', 'module': volume_indicators, 'calc_func': 'calculate_eom', 'columns_func': 'eom_columns', 'plot_func': 'add_eom_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'EOM', 'data_cols': lambda p: [f"eom_{p.get('window',14)}"]},
 
     # --- その他指標 ---
-    'atr': {'label': 'ATR (平均実質変動幅)', 'module': other_indicators, 'calc_func': 'calculate_atr', 'plot_func': 'add_atr_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'ATR', 'data_cols': lambda p: [f"atr_{p.get('window',14)}"]},
-    'std_dev': {'label': '標準偏差 (ボラティリティ)', 'module': other_indicators, 'calc_func': 'calculate_std_dev', 'plot_func': 'add_std_dev_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Standard Deviation', 'data_cols': lambda p: [f"std_dev_{p.get('window',20)}"]},
-    'pivot': {'label': 'ピボットポイント', 'module': other_indicators, 'calc_func': 'calculate_pivot_points', 'plot_func': 'add_pivot_points_traces', 'params': {}, 'plot_on_price': True, 'data_cols': lambda p: ['pivot', 'r1', 's1', 'r2', 's2', 'r3', 's3']},
+    'atr': {'label': 'ATR (平均実質変動幅)', 'module': other_indicators, 'calc_func': 'calculate_atr', 'columns_func': 'atr_columns', 'plot_func': 'add_atr_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 14, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'ATR', 'data_cols': lambda p: [f"atr_{p.get('window',14)}"]},
+    'std_dev': {'label': '標準偏差 (ボラティリティ)', 'module': other_indicators, 'calc_func': 'calculate_std_dev', 'columns_func': 'std_dev_columns', 'plot_func': 'add_std_dev_trace', 'params': {'window': {'type': 'number_input', 'label': '期間', 'default': 20, 'min': 1}}, 'plot_on_price': False, 'subplot_name': 'Standard Deviation', 'data_cols': lambda p: [f"std_dev_{p.get('window',20)}"]},
+    'pivot': {'label': 'ピボットポイント', 'module': other_indicators, 'calc_func': 'calculate_pivot_points', 'columns_func': 'pivot_points_columns', 'plot_func': 'add_pivot_points_traces', 'params': {}, 'plot_on_price': True, 'data_cols': lambda p: ['pivot', 'r1', 's1', 'r2', 's2', 'r3', 's3']},
 }
 
 DEFAULT_GEMINI_FLASH_MODEL_NAME = config_tech.DEFAULT_FLASH_MODEL_TECH
@@ -123,6 +130,9 @@ def _create_matplotlib_technical_chart_image(
                 win = params.get('window', p_def['window']['default'])
                 sma_col = f"SMA_{win}"
                 if sma_col in df.columns: main_ax.plot(df.index, df[sma_col], label=sma_col, lw=1.0, zorder=4)
+            if key in ('sma_multi', 'ema_multi'):
+                for ma_col in INDICATORS_CONFIG[key]['data_cols'](params):
+                    if ma_col in df.columns: main_ax.plot(df.index, df[ma_col], label=ma_col, lw=1.0, zorder=4)
             if key == 'bollinger':
                 win = params.get('window', p_def['window']['default'])
                 u2_col, l2_col = f"BB_Upper_2std_{win}", f"BB_Lower_2std_{win}"
@@ -229,21 +239,23 @@ def render_technical_analysis_content(
             return
 
         logger.info(f"Stock data obtained for {ticker_symbol}. Calculating {len(selected_indicator_keys)} indicators.")
-        stock_data_processed = stock_data_master.copy()
+        # 選択された指標をエンジンでまとめて計算 (共通の中間系列は一度だけ計算し、列は最後に一括で結合)
+        # stock_data_master はこの描画専用に取得したデータのため、OHLCV列はコピーせずに共有する
+        resolved_indicators = indicator_engine.resolve_indicators(selected_indicator_keys, indicator_params_values, INDICATORS_CONFIG)
+        # 同じ銘柄・足種・指標の再描画では、前回までの確定バーの状態から追加分のバーだけを更新する
+        incremental_signature = (ticker_symbol, interval, str(start_date),
+                                 tuple((key, tuple(sorted(final_params.items()))) for key, _, final_params in resolved_indicators))
+        indicator_columns, incremental_state = incremental_indicators.compute_columns_with_cache(
+            stock_data_master, resolved_indicators, incremental_signature,
+            sm_main_app.get_value("tech_analysis.incremental_state"))
+        sm_main_app.set_value("tech_analysis.incremental_state", incremental_state)
+        if indicator_columns is None:
+            indicator_columns = indicator_engine.compute_indicator_columns(stock_data_master, resolved_indicators)
+        stock_data_processed = indicator_engine.build_frame(stock_data_master, indicator_columns)
         ai_data_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
         indicator_column_labels_for_ai = {}
 
-        for key in selected_indicator_keys:
-            if key not in INDICATORS_CONFIG: continue
-            indicator_config = INDICATORS_CONFIG[key]
-            params = indicator_params_values.get(key, {})
-            default_params = {p_name: p_detail['default'] for p_name, p_detail in indicator_config.get('params', {}).items()}
-            final_params = {**default_params, **params}
-
-            if indicator_config.get('calc_func'):
-                calc_func = getattr(indicator_config['module'], indicator_config['calc_func'])
-                stock_data_processed = calc_func(stock_data_processed, **final_params)
-
+        for key, indicator_config, final_params in resolved_indicators:
             if 'data_cols' in indicator_config:
                 cols_for_this_indicator = indicator_config['data_cols'](final_params)
                 indicator_column_labels_for_ai[indicator_config['label']] = cols_for_this_indicator
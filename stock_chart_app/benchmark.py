@@ -0,0 +1,190 @@
+# stock_chart_app/benchmark.py
+# 指標計算のベンチマーク。
+# 合成したOHLCVデータ (既定: 1千本 / 10万本 / 100万本) で各指標モジュールの calculate_* をすべて計測し、
+# 1秒あたりの実行回数 (ops/sec) とピークメモリを表示します。yfinance などの外部アクセスは行いません。
+# 保存済みのベースラインと比較し、許容範囲を超えて遅く (またはメモリを多く使うように) なった指標があれば
+# 終了コード1で、比較するベースラインがなければ終了コード2で終了します。
+# ベースラインは計測したマシンでしか意味を持たないため、リポジトリには含めません (.gitignore 済み)。
+# 比較する前に、同じマシンで --save-baseline を実行して作成してください。
+#
+# 使い方:
+#   python -m stock_chart_app.benchmark                        # 計測してベースラインと比較
+#   python -m stock_chart_app.benchmark --save-baseline        # 計測結果をベースラインとして保存
+#   python -m stock_chart_app.benchmark --no-compare           # 計測結果を表示するだけ (比較しない)
+#   python -m stock_chart_app.benchmark --sizes 1000 100000 --filter rsi --tolerance 0.3
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from stock_chart_app.indicators import kernels, trend_indicators, oscillator_indicators, volume_indicators, other_indicators
+
+BENCHMARK_MODULES = (trend_indicators, oscillator_indicators, volume_indicators, other_indicators)
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# ピークメモリの比較では、これ未満の増加 (MB) は誤差として扱う
+_MEMORY_NOISE_FLOOR_MB = 1.0
+
+
+def make_synthetic_ohlcv(n_bars, seed=0):
+    """
+    幾何ランダムウォークから1分足の合成OHLCVデータを作ります。
+    実データに近づけるため、少数の欠損行と出来高0の行を含めます。
+    """
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.001, n_bars)))
+    open_ = close * np.exp(rng.normal(0, 0.0005, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0005, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0005, n_bars)))
+    volume = rng.integers(0, 100_000, n_bars).astype(float)
+    df = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                      index=pd.date_range('2020-01-01 09:00', periods=n_bars, freq='min', name='Date'))
+    if n_bars > 100:
+        df.iloc[rng.choice(n_bars, n_bars // 1000 + 1, replace=False)] = np.nan
+        df.iloc[rng.choice(n_bars, n_bars // 500 + 1, replace=False), df.columns.get_loc('Volume')] = 0
+    return df
+
+
+def discover_indicator_functions(modules=BENCHMARK_MODULES):
+    """各指標モジュールで定義されている calculate_* 関数を ('モジュール名.関数名', 関数) のリストで返します。"""
+    functions = []
+    for module in modules:
+        short_name = module.__name__.rsplit('.', 1)[-1]
+        for name, func in inspect.getmembers(module, inspect.isfunction):
+            if name.startswith('calculate_') and func.__module__ == module.__name__:
+                functions.append((f'{short_name}.{name}', func))
+    return functions
+
+
+def _time_function(func, df, repeat, min_time):
+    """少なくとも repeat 回、かつ合計 min_time 秒以上実行し、1回あたりの実行時間の中央値を返す。"""
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat or (time.perf_counter() - started < min_time and len(timings) < 1000):
+        t0 = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings), len(timings)
+
+
+def _peak_memory_mb(func, df):
+    """1回の実行中に新たに確保されたメモリのピーク (MB) を tracemalloc で計測する。"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        func(df)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - base) / (1024 * 1024)
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, name_filter=None, repeat=3, min_time=0.2, seed=0):
+    """各データサイズで全指標を計測し、{'meta': ..., 'results': {サイズ: {指標名: 計測値}}} を返します。"""
+    functions = [(name, func) for name, func in discover_indicator_functions() if not name_filter or name_filter in name]
+    results = {}
+    for n_bars in sizes:
+        df = make_synthetic_ohlcv(n_bars, seed=seed)
+        size_results = {}
+        for name, func in functions:
+            func(df)  # ウォームアップ (numbaのJITコンパイルや初回のインポートを計測から除く)
+            median_sec, runs = _time_function(func, df, repeat, min_time)
+            size_results[name] = {
+                'ops_per_sec': 1.0 / median_sec if median_sec > 0 else float('inf'),
+                'median_sec': median_sec,
+                'runs': runs,
+                'peak_mb': _peak_memory_mb(func, df),
+            }
+            print(f"  {n_bars:>9,} bars  {name:<50} {size_results[name]['ops_per_sec']:>12.2f} ops/s  "
+                  f"{size_results[name]['peak_mb']:>9.1f} MB", flush=True)
+        results[str(n_bars)] = size_results
+    meta = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'numba': kernels.NUMBA_AVAILABLE,
+        'machine': platform.machine(),
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    return {'meta': meta, 'results': results}
+
+
+def compare_with_baseline(current, baseline, tolerance=0.25, memory_tolerance=0.25):
+    """
+    ベースラインと比較し、退行した項目を文字列のリストで返します。
+    ops/sec がベースラインの (1 - tolerance) 倍を下回るか、ピークメモリが (1 + memory_tolerance) 倍を超えたものを退行とします。
+    ベースラインにない指標・サイズは比較しません。
+    """
+    regressions = []
+    for size, size_results in current['results'].items():
+        baseline_size = baseline.get('results', {}).get(size, {})
+        for name, result in size_results.items():
+            if name not in baseline_size: continue
+            base = baseline_size[name]
+            if result['ops_per_sec'] < base['ops_per_sec'] * (1 - tolerance):
+                regressions.append(f"{name} @ {size} bars: {result['ops_per_sec']:.2f} ops/s "
+                                   f"(baseline {base['ops_per_sec']:.2f}, {result['ops_per_sec'] / base['ops_per_sec'] - 1:+.0%})")
+            if (result['peak_mb'] > base['peak_mb'] * (1 + memory_tolerance)
+                    and result['peak_mb'] - base['peak_mb'] > _MEMORY_NOISE_FLOOR_MB):
+                regressions.append(f"{name} @ {size} bars: peak {result['peak_mb']:.1f} MB (baseline {base['peak_mb']:.1f} MB)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='stock_chart_app の指標計算ベンチマーク (オフライン・合成データ)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='計測するバー数')
+    parser.add_argument('--filter', dest='name_filter', default=None, help='指標名 (例: rsi) を含む関数だけを計測')
+    parser.add_argument('--repeat', type=int, default=3, help='1指標あたりの最小実行回数')
+    parser.add_argument('--min-time', type=float, default=0.2, help='1指標あたりの最小計測時間 (秒)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help='ベースラインJSONのパス')
+    parser.add_argument('--save-baseline', action='store_true', help='計測結果をベースラインとして保存する (比較は行わない)')
+    parser.add_argument('--no-compare', action='store_true', help='ベースラインと比較せず、計測結果を表示するだけにする')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='許容する ops/sec の低下率')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='許容するピークメモリの増加率')
+    parser.add_argument('--output', default=None, help='計測結果をJSONで保存するパス')
+    args = parser.parse_args(argv)
+
+    print(f"Benchmarking indicators (numba: {kernels.NUMBA_AVAILABLE}) ...")
+    current = run_benchmarks(args.sizes, args.name_filter, args.repeat, args.min_time)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if args.no_compare:
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # 比較を求められたのにベースラインがない場合は、回帰なしと区別できるよう失敗として返す
+        print(f"No baseline found at {args.baseline}. Run with --save-baseline to create one, or use --no-compare.")
+        return 2
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(current, baseline, args.tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print(f"\nNo regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
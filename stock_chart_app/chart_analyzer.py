@@ -6,6 +6,8 @@ import traceback
 import hashlib
 import logging # ロギング追加
 
+import data_sources
+
 
 # configからモデル名を取得（またはデフォルト値を設定）
 # from . import config_tech # config_tech py が同じディレクトリにある場合。app.pyから渡される想定なら不要。
@@ -224,10 +226,13 @@ MACDがゼロラインの上にあるか下にあるかで、トレンドの方
 
     try:
         logger.info(f"Gemini API ({model_name}) へリクエスト送信: {api_url}")
-        response = requests.post(api_url, json=payload, timeout=request_timeout_seconds)
-        response.raise_for_status() # HTTPエラーがあれば例外を発生させる
+        def _live():
+            response = requests.post(api_url, json=payload, timeout=request_timeout_seconds)
+            response.raise_for_status() # HTTPエラーがあれば例外を発生させる
+            return response.json()
 
-        result = response.json()
+        # APIキーを含む URL ではなく、モデル名とペイロードで記録を照合する
+        result = data_sources.call("gemini", "chart_analysis", {"model": effective_model_name, "payload": payload}, _live)
         logger.debug(f"Gemini APIからの生レスポンス: {json.dumps(result, indent=2, ensure_ascii=False)}")
         analysis_text = "[ERROR] AIからの応答取得に失敗しました（予期しない形式）。" # デフォルトエラーメッセージ
 
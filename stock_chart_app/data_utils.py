@@ -1,58 +1,26 @@
 
 # stock_chart_app/data_utils.py
-import yfinance as yf
 import pandas as pd
 import streamlit as st
 import traceback
 
+import ohlcv_store
+
 
 def download_stock_data(ticker_symbol, start_date, end_date, interval="1d"):
     """
-    yfinanceを使用して株価データをダウンロードし、基本的な前処理を行います。
-    auto_adjust=True を使用して、分割や配当を自動調整した価格を取得します。
+    株価データを取得し、基本的な前処理を行います。
+    データはローカルの OHLCV ストア (ohlcv_store.py) を経由して取得し、保存済みでない期間だけを yfinance からダウンロードします。
+    価格は分割や配当を自動調整したもの (auto_adjust=True) です。
     """
     # st.write(f"データ取得試行中: {ticker_symbol}, 開始: {start_date}, 終了: {end_date}, 足種: {interval}")
     try:
-        data = yf.download(
-            ticker_symbol,
-            start=start_date,
-            end=end_date,
-            auto_adjust=True,  # 分割や配当を自動調整し、'Adj Close' は不要になる
-            progress=False,
-            interval=interval
-        )
+        data = ohlcv_store.get_ohlcv(ticker_symbol, start_date, end_date, interval=interval)
 
         if data.empty:
             st.warning(f"yfinanceから取得したデータが空です: {ticker_symbol} ({interval}足), 期間: {start_date} - {end_date}")
             return None
 
-        # auto_adjust=True の場合、通常カラム名は 'Open', 'High', 'Low', 'Close', 'Volume'
-        # MultiIndex になるのは複数のティッカーを一度に取得した場合など。
-        # 単一ティッカーなら通常は発生しないが、念のためチェック。
-        if isinstance(data.columns, pd.MultiIndex):
-            # st.info(f"yfinanceからMultiIndexのカラムが返されました（ティッカー: {ticker_symbol}）。最初のレベルを使用します。カラム: {data.columns}") # この情報メッセージを削除
-            data.columns = data.columns.get_level_values(0)
-
-        # カラム名を標準形 (先頭大文字) に統一
-        data.columns = [str(col).capitalize() for col in data.columns]
-        # yfinance v0.2.1以降、auto_adjust=Trueの場合、'Adj Close'は通常なく、'Close'が調整済み終値
-        # 'Adj close' のような小文字カラムが存在する場合に備えて 'Adj Close' にリネーム
-        if 'Adj close' in data.columns:
-            data.rename(columns={'Adj close': 'Adj Close'}, inplace=True)
-
-        # auto_adjust=True を使っている場合、'Close' が調整済み終値のはず。
-        # もし 'Adj Close' が別途存在し、それが 'Close' と異なる場合、どちらを正とするか。
-        # yfinance の auto_adjust=True は 'Close' を調整済みにするので、通常 'Adj Close' は不要。
-        if 'Adj Close' in data.columns and 'Close' in data.columns and not data['Adj Close'].equals(data['Close']):
-            # st.info(f"'{ticker_symbol}': 'Close' と 'Adj Close' の両方が存在し値が異なります。" # 詳細情報なので削除またはデバッグレベルへ
-            #         "auto_adjust=True のため 'Close' が調整済み価格のはずですが、念のため確認してください。'Close' を使用します。")
-            pass # Closeを優先する
-        elif 'Adj Close' in data.columns and 'Close' not in data.columns:
-            # auto_adjust=True で 'Close' がなく 'Adj Close' だけの場合 (通常は考えにくい)
-            # st.info(f"'{ticker_symbol}': 'Adj Close' のみ存在するため、これを 'Close' として使用します。") # 詳細情報なので削除またはデバッグレベルへ
-            data.rename(columns={'Adj Close': 'Close'}, inplace=True)
-
-
         required_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
         missing_cols = [col for col in required_cols if col not in data.columns]
         if missing_cols:
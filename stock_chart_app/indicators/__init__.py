@@ -2,6 +2,7 @@
 # このファイルはindicatorsパッケージをPythonに認識させるために必要です。
 # 各指標モジュールをインポートします。
 
+from . import kernels
 from . import trend_indicators
 from . import oscillator_indicators
 from . import volume_indicators
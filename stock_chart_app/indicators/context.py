@@ -0,0 +1,161 @@
+# stock_chart_app/indicators/context.py
+# 複数の指標で共通して使う中間系列 (True Range, ATR, ローリング最大/最小, EMA など) を
+# 一度だけ計算して使い回すための計算コンテキスト。
+# 各指標の *_columns(ctx, **params) 関数はこのコンテキスト経由で中間系列を取得します。
+import numpy as np
+import pandas as pd
+
+
+class IndicatorContext:
+    """
+    OHLCVデータと、計算済みの中間系列を保持します。
+    中間系列は (種類, 入力列, パラメータ...) のタプルをキーにメモ化され、
+    同じキーが再度要求された場合は再計算せずにキャッシュを返します。
+    中間系列同士の依存 (例: ATR → True Range) は各メソッドの呼び出し関係がそのままDAGになります。
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.index = df.index
+        self.outputs = {}  # エンジンが登録した、計算済みの指標列
+        self._cache = {}
+        self.computed_keys = []  # 実際に計算した中間系列のキー (計算順)
+        self.cache_hits = 0
+
+    def memo(self, key, builder):
+        """key に対応する中間系列を返す。未計算なら builder() で計算して保存する。"""
+        if key in self._cache:
+            self.cache_hits += 1
+            return self._cache[key]
+        value = builder()
+        self._cache[key] = value
+        self.computed_keys.append(key)
+        return value
+
+    # --- 入力列 ---
+    def has_column(self, name):
+        return name in self.outputs or name in self.df.columns
+
+    def column(self, name):
+        """入力データ、またはこれまでに計算された指標列を返す。"""
+        if name in self.outputs:
+            return pd.Series(self.outputs[name], index=self.index, name=name, copy=False)
+        return self.df[name]
+
+    def register_outputs(self, columns):
+        """
+        指標の出力列をndarrayとして登録し、後続の指標から column() で参照できるようにする。
+        float64のSeriesはコピーせずに内部配列をそのまま保持する。
+        """
+        for name, values in columns.items():
+            self.outputs[name] = as_column_array(values)
+
+    # --- 基本の中間系列 ---
+    def diff(self, col, periods=1):
+        return self.memo(('diff', col, periods), lambda: self.column(col).diff(periods))
+
+    def shift(self, col, periods=1):
+        return self.memo(('shift', col, periods), lambda: self.column(col).shift(periods))
+
+    def rolling_max(self, col, window):
+        return self.memo(('rolling_max', col, window), lambda: self.column(col).rolling(window=window).max())
+
+    def rolling_min(self, col, window):
+        return self.memo(('rolling_min', col, window), lambda: self.column(col).rolling(window=window).min())
+
+    def rolling_mean(self, col, window, min_periods=None):
+        return self.memo(('rolling_mean', col, window, min_periods),
+                         lambda: self.column(col).rolling(window=window, min_periods=min_periods).mean())
+
+    def rolling_std(self, col, window, ddof=0):
+        return self.memo(('rolling_std', col, window, ddof), lambda: self.column(col).rolling(window=window).std(ddof=ddof))
+
+    def ewm_mean(self, col, span=None, com=None, alpha=None, min_periods=0):
+        """
+        adjust=False の指数移動平均。
+        span/com/alpha は同じ平滑化係数でも浮動小数点の丸めが異なるため、指定方法ごとに別キーで保持する。
+        min_periods は 0 と 1 が同じ結果になるため 1 にそろえる。
+        """
+        min_periods = max(min_periods, 1)
+        return self.memo(('ewm_mean', col, span, com, alpha, min_periods),
+                         lambda: self.column(col).ewm(span=span, com=com, alpha=alpha, adjust=False, min_periods=min_periods).mean())
+
+    # --- 価格から派生する中間系列 ---
+    def price_range(self):
+        """High - Low"""
+        return self.memo(('price_range',), lambda: self.column('High') - self.column('Low'))
+
+    def typical_price(self):
+        """(High + Low + Close) / 3"""
+        return self.memo(('typical_price',), lambda: (self.column('High') + self.column('Low') + self.column('Close')) / 3)
+
+    def true_range(self, strict=False):
+        """
+        True Range = max(High - Low, |High - 前日Close|, |Low - 前日Close|)。
+        strict=False はNaNを無視して最大値を取り (先頭バーは High - Low)、
+        strict=True はいずれかがNaNならNaNとする (先頭バーはNaN)。
+        """
+        def build():
+            prev_close = self.shift('Close', 1)
+            high_close = np.abs(self.column('High') - prev_close)
+            low_close = np.abs(self.column('Low') - prev_close)
+            reducer = np.maximum if strict else np.fmax
+            return reducer(reducer(self.price_range(), high_close), low_close)
+        return self.memo(('true_range', strict), build)
+
+    def atr(self, window, strict=False):
+        """
+        ATR。strict=False はNaN無視のTRを alpha=1/window で平滑化 (トレンド系/DMIと同じ定義)、
+        strict=True は厳密なTRを com=window-1 で平滑化します (その他指標のATRと同じ定義)。
+        """
+        def build():
+            tr = self.true_range(strict=strict)
+            if strict:
+                return tr.ewm(com=window - 1, adjust=False).mean()
+            return tr.ewm(alpha=1 / window, adjust=False).mean()
+        return self.memo(('atr', window, strict), build)
+
+
+def as_column_array(values):
+    """Series/配列を1次元のndarrayに変換する (可能な限りコピーしない)。"""
+    if isinstance(values, (pd.Series, pd.Index)):
+        return values.to_numpy()
+    return np.asarray(values)
+
+
+def wrap_like(template, values):
+    """
+    カーネルが返したndarrayを、template (Series または 銘柄ごとの列を持つDataFrame) と同じ形のpandasオブジェクトにする。
+    単一銘柄と複数銘柄 (パネル) の両方で同じ指標関数を使うためのヘルパー。
+    """
+    if isinstance(template, pd.DataFrame):
+        return pd.DataFrame(values, index=template.index, columns=template.columns, copy=False)
+    return pd.Series(values, index=template.index, copy=False)
+
+
+def build_frame(df, columns, copy=False):
+    """
+    入力データの列と計算済みの列 (ndarray) から、結果のDataFrameを一度だけ組み立てます。
+    入力に同名の列がある場合は元の位置のまま値を置き換えます。
+    copy=False の場合、入力の列配列をコピーせずに共有します。
+    """
+    data = {name: df[name].to_numpy(copy=copy) for name in df.columns}
+    used_arrays = {id(values) for values in data.values()}
+    for name, values in columns.items():
+        values = as_column_array(values)
+        # 同じ中間系列を複数の列が出力している場合 (例: BB_Mid と envelope_mid) は列ごとに独立させる
+        if id(values) in used_arrays:
+            values = values.copy()
+        used_arrays.add(id(values))
+        data[name] = values
+    return pd.DataFrame(data, index=df.index.copy() if copy else df.index, copy=False)
+
+
+def assign_columns(df_orig, columns_func, **params):
+    """
+    単一の指標を計算して、列を追加したDataFrameを返します (従来の calculate_* 用)。
+    入力データは結果の組み立て時に一度だけコピーします。
+    """
+    ctx = IndicatorContext(df_orig)
+    ctx.register_outputs(columns_func(ctx, **params))
+    return build_frame(df_orig, ctx.outputs, copy=True)
@@ -0,0 +1,50 @@
+# stock_chart_app/indicators/engine.py
+# 選択された複数の指標をまとめて計算するエンジン。
+# 各指標の *_columns(ctx, **params) を共通の IndicatorContext 上で実行するため、
+# True Range・ATR・ローリング最大/最小・EMA などの中間系列は指標をまたいで一度だけ計算されます。
+# 各指標は新しい列だけを返し (ndarrayとして保持)、結果のDataFrameは最後に一度だけ組み立てます。
+import logging
+
+from stock_chart_app.indicators.context import IndicatorContext, build_frame
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_indicators(selected_keys, indicator_params_values, indicators_config):
+    """
+    選択された指標キーを、(キー, 設定, デフォルト値で補完したパラメータ) のリストに解決します。
+    INDICATORS_CONFIG に存在しないキーは無視します。
+    """
+    resolved = []
+    for key in selected_keys:
+        if key not in indicators_config: continue
+        cfg = indicators_config[key]
+        default_params = {p_name: p_detail['default'] for p_name, p_detail in cfg.get('params', {}).items()}
+        final_params = {**default_params, **indicator_params_values.get(key, {})}
+        resolved.append((key, cfg, final_params))
+    return resolved
+
+
+def compute_indicator_columns(df, resolved_indicators):
+    """
+    解決済みの指標を選択順に計算し、列名 -> ndarray の辞書を返します。
+    後から計算した指標が同名の列を出力した場合は上書きされます (従来の逐次計算と同じ挙動)。
+    中間系列のキャッシュは関数を抜けると破棄され、出力列の配列だけが残ります。
+    """
+    ctx = IndicatorContext(df)
+    for key, cfg, params in resolved_indicators:
+        if not cfg.get('columns_func'): continue
+        columns_func = getattr(cfg['module'], cfg['columns_func'])
+        ctx.register_outputs(columns_func(ctx, **params))
+    logger.info(f"Indicator engine: {len(resolved_indicators)} indicators, {len(ctx.outputs)} columns, "
+                f"{len(ctx.computed_keys)} shared intermediates computed, {ctx.cache_hits} reused.")
+    return ctx.outputs
+
+
+def compute_indicators(df, selected_keys, indicator_params_values, indicators_config, copy=False):
+    """
+    選択された指標をすべて計算し、列を追加したDataFrameを返します。
+    copy=False の場合、結果は入力のOHLCV列の配列をコピーせずに共有します。
+    """
+    resolved = resolve_indicators(selected_keys, indicator_params_values, indicators_config)
+    return build_frame(df, compute_indicator_columns(df, resolved), copy=copy)
@@ -0,0 +1,552 @@
+# stock_chart_app/indicators/incremental.py
+# 新しいバーが追加されたときに、全履歴を再計算せずに指標を更新するための状態付き指標。
+# 各指標は from_frame() で履歴からバッチ計算の結果と内部状態を作り、
+# update() で1本またはN本の新しいバーを O(新しいバー数) で処理します。
+#
+# EMA系 (EMA, MACD, RSI, ATR, ケルトナー, フォースインデックス) は pandas の
+# ewm(adjust=False).mean() と同じ漸化式を使うため、バッチ計算と完全に同じ値になります。
+# 移動窓系 (SMA, ボリンジャー) と VWAP は、pandas のローリング計算/累積和とは加算順序や
+# 補正付き加算の有無が異なるため、浮動小数点の誤差 (1e-12 程度) の範囲で一致します。
+import copy
+import logging
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from stock_chart_app.indicators import trend_indicators, oscillator_indicators, volume_indicators, other_indicators
+from stock_chart_app.indicators.context import IndicatorContext
+
+logger = logging.getLogger(__name__)
+
+
+def _ewm_center_of_mass(span=None, com=None, alpha=None):
+    """pandas の ewm と同じ手順で center of mass を求める (丸め誤差まで一致させるため)。"""
+    if com is not None:
+        return float(com)
+    if span is not None:
+        return float((span - 1) / 2)
+    return float((1 - alpha) / alpha)
+
+
+class _EwmState:
+    """ewm(adjust=False, ignore_na=False).mean() の内部状態。"""
+
+    def __init__(self, span=None, com=None, alpha=None):
+        com = _ewm_center_of_mass(span=span, com=com, alpha=alpha)
+        self.new_wt = 1. / (1. + com)
+        self.old_wt_factor = 1. - self.new_wt
+        self.weighted = math.nan
+        self.old_wt = 1.
+        self.nobs = 0
+
+    def seed(self, values, output):
+        """履歴の入力値と、それに対するバッチ計算の出力から状態を復元する。"""
+        values = np.asarray(values, dtype=float)
+        observed = np.flatnonzero(~np.isnan(values))
+        self.nobs = len(observed)
+        if self.nobs == 0:
+            return
+        last = observed[-1]
+        self.weighted = float(np.asarray(output, dtype=float)[last])
+        self.old_wt = 1.
+        for _ in range(len(values) - last - 1):  # 末尾のNaNの間も重みは減衰する
+            self.old_wt *= self.old_wt_factor
+
+    def step(self, cur):
+        is_observation = cur == cur
+        self.nobs += is_observation
+        if self.weighted == self.weighted:
+            self.old_wt *= self.old_wt_factor
+            if is_observation:
+                if self.weighted != cur:
+                    self.weighted = (self.old_wt * self.weighted + self.new_wt * cur) / (self.old_wt + self.new_wt)
+                self.old_wt = 1.
+        elif is_observation:
+            self.weighted = cur
+        return self.weighted if self.nobs >= 1 else math.nan
+
+
+def _true_range(high, low, prev_close, strict):
+    values = (high - low, abs(high - prev_close), abs(low - prev_close))
+    if strict:
+        return math.nan if any(v != v for v in values) else max(values)
+    valid = [v for v in values if v == v]
+    return max(valid) if valid else math.nan
+
+
+class IncrementalIndicator:
+    """
+    状態付き指標の基底クラス。
+    サブクラスは columns_func (バッチ計算用の *_columns 関数)、column_names()、
+    _seed() (履歴からの状態復元) と _step() (1本分の更新) を実装します。
+    """
+    columns_func = None
+
+    def __init__(self, **params):
+        self.params = params
+
+    @classmethod
+    def from_frame(cls, df, **params):
+        """履歴データからバッチ計算を行い、(状態, 列名 -> ndarray) を返す。"""
+        indicator = cls(**params)
+        ctx = IndicatorContext(df)
+        ctx.register_outputs(cls.columns_func(ctx, **params))
+        if len(df):
+            indicator._seed(ctx, ctx.outputs)
+        return indicator, ctx.outputs
+
+    def update(self, bars):
+        """新しいバー (OHLCVのDataFrame) を処理し、それらのバーの指標値を列名 -> ndarray で返す。"""
+        high, low, close, volume = (bars[name].to_numpy(dtype=float) for name in ('High', 'Low', 'Close', 'Volume'))
+        rows = [self._step(bar) for bar in zip(bars.index, high, low, close, volume)]
+        if not rows:
+            return {name: np.empty(0) for name in self.column_names()}
+        return self._finalize(np.array(rows, dtype=float).reshape(len(rows), -1))
+
+    def column_names(self):
+        raise NotImplementedError
+
+    def _seed(self, ctx, columns):
+        raise NotImplementedError
+
+    def _step(self, bar):
+        """bar = (日時, High, Low, Close, Volume) を処理し、値のタプルを返す。"""
+        raise NotImplementedError
+
+    def _finalize(self, values):
+        """_step() の結果 (行=バー) を列に変換する。バッチ計算と同じ後処理 (fillna など) もここで行う。"""
+        return {name: values[:, i] for i, name in enumerate(self.column_names())}
+
+
+# --- EMA系 ---
+class EmaIndicator(IncrementalIndicator):
+    columns_func = staticmethod(trend_indicators.ema_columns)
+
+    def __init__(self, window=20):
+        super().__init__(window=window)
+        self.ema = _EwmState(span=window)
+
+    def column_names(self):
+        return [f"EMA_{self.params['window']}"]
+
+    def _seed(self, ctx, columns):
+        self.ema.seed(ctx.column('Close'), columns[f"EMA_{self.params['window']}"])
+
+    def _step(self, bar):
+        return (self.ema.step(bar[3]),)
+
+
+class MacdIndicator(IncrementalIndicator):
+    columns_func = staticmethod(trend_indicators.macd_columns)
+
+    def __init__(self, fast_period=12, slow_period=26, signal_period=9):
+        super().__init__(fast_period=fast_period, slow_period=slow_period, signal_period=signal_period)
+        self.fast = _EwmState(span=fast_period)
+        self.slow = _EwmState(span=slow_period)
+        self.signal = _EwmState(span=signal_period)
+
+    def column_names(self):
+        return ['MACD_Line', 'MACD_Signal', 'MACD_Hist']
+
+    def _seed(self, ctx, columns):
+        close = ctx.column('Close')
+        self.fast.seed(close, ctx.ewm_mean('Close', span=self.params['fast_period']))
+        self.slow.seed(close, ctx.ewm_mean('Close', span=self.params['slow_period']))
+        self.signal.seed(columns['MACD_Line'], columns['MACD_Signal'])
+
+    def _step(self, bar):
+        line = self.fast.step(bar[3]) - self.slow.step(bar[3])
+        signal = self.signal.step(line)
+        return line, signal, line - signal
+
+
+class RsiIndicator(IncrementalIndicator):
+    columns_func = staticmethod(oscillator_indicators.rsi_columns)
+
+    def __init__(self, window=14):
+        super().__init__(window=window)
+        self.avg_gain = _EwmState(com=window - 1)
+        self.avg_loss = _EwmState(com=window - 1)
+        self.prev_close = math.nan
+
+    def column_names(self):
+        return [f"RSI_{self.params['window']}"]
+
+    def _seed(self, ctx, columns):
+        window = self.params['window']
+        delta = ctx.diff('Close')
+        gain = delta.where(delta > 0, 0)
+        loss = -delta.where(delta < 0, 0)
+        self.avg_gain.seed(gain, gain.ewm(com=window - 1, adjust=False).mean())
+        self.avg_loss.seed(loss, loss.ewm(com=window - 1, adjust=False).mean())
+        self.prev_close = float(ctx.column('Close').iloc[-1])
+
+    def _step(self, bar):
+        delta = bar[3] - self.prev_close
+        self.prev_close = bar[3]
+        gain = delta if delta > 0 else 0.
+        loss = -delta if delta < 0 else 0.
+        return self.avg_gain.step(gain), self.avg_loss.step(loss)
+
+    def _finalize(self, values):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = values[:, 0] / values[:, 1]
+            rsi = 100.0 - (100.0 / (1.0 + rs))
+        rsi[np.isinf(rsi)] = 100
+        rsi[np.isnan(rsi)] = 50
+        return {f"RSI_{self.params['window']}": rsi}
+
+
+class AtrIndicator(IncrementalIndicator):
+    """その他指標のATR (厳密なTRを com=window-1 で平滑化)。"""
+    columns_func = staticmethod(other_indicators.atr_columns)
+
+    def __init__(self, window=14):
+        super().__init__(window=window)
+        self.atr = _EwmState(com=window - 1)
+        self.prev_close = math.nan
+
+    def column_names(self):
+        return [f"atr_{self.params['window']}"]
+
+    def _seed(self, ctx, columns):
+        self.atr.seed(ctx.true_range(strict=True), columns[f"atr_{self.params['window']}"])
+        self.prev_close = float(ctx.column('Close').iloc[-1])
+
+    def _step(self, bar):
+        _, high, low, close, _ = bar
+        tr = _true_range(high, low, self.prev_close, strict=True)
+        self.prev_close = close
+        return (self.atr.step(tr),)
+
+
+class KeltnerIndicator(IncrementalIndicator):
+    """ケルトナーチャネル (NaN無視のTRを alpha=1/window で平滑化したATRを使用)。"""
+    columns_func = staticmethod(trend_indicators.keltner_channels_columns)
+
+    def __init__(self, ema_window=20, atr_window=10, atr_multiplier=2.0):
+        super().__init__(ema_window=ema_window, atr_window=atr_window, atr_multiplier=atr_multiplier)
+        self.mid = _EwmState(span=ema_window)
+        self.atr = _EwmState(alpha=1 / atr_window)
+        self.prev_close = math.nan
+
+    def column_names(self):
+        ema_window = self.params['ema_window']
+        return [f"atr_{self.params['atr_window']}", f'kc_mid_{ema_window}', f'kc_upper_{ema_window}', f'kc_lower_{ema_window}']
+
+    def _seed(self, ctx, columns):
+        self.atr.seed(ctx.true_range(), columns[f"atr_{self.params['atr_window']}"])
+        self.mid.seed(ctx.column('Close'), columns[f"kc_mid_{self.params['ema_window']}"])
+        self.prev_close = float(ctx.column('Close').iloc[-1])
+
+    def _step(self, bar):
+        _, high, low, close, _ = bar
+        atr = self.atr.step(_true_range(high, low, self.prev_close, strict=False))
+        self.prev_close = close
+        mid = self.mid.step(close)
+        multiplier = self.params['atr_multiplier']
+        return atr, mid, mid + (atr * multiplier), mid - (atr * multiplier)
+
+
+class ForceIndexIndicator(IncrementalIndicator):
+    columns_func = staticmethod(oscillator_indicators.force_index_columns)
+
+    def __init__(self, window=13):
+        super().__init__(window=window)
+        self.ema = _EwmState(span=window)
+        self.prev_close = math.nan
+
+    def column_names(self):
+        return [f"force_index_{self.params['window']}"]
+
+    def _seed(self, ctx, columns):
+        one_period_fi = ctx.diff('Close', 1) * ctx.column('Volume')
+        self.ema.seed(one_period_fi, one_period_fi.ewm(span=self.params['window'], adjust=False).mean())
+        self.prev_close = float(ctx.column('Close').iloc[-1])
+
+    def _step(self, bar):
+        _, _, _, close, volume = bar
+        force = self.ema.step((close - self.prev_close) * volume)
+        self.prev_close = close
+        return (force,)
+
+    def _finalize(self, values):
+        force = values[:, 0]
+        force[np.isnan(force)] = 0
+        return {f"force_index_{self.params['window']}": force}
+
+
+# --- 移動窓系 ---
+class SmaIndicator(IncrementalIndicator):
+    """単純移動平均 (min_periods=1)。"""
+    columns_func = staticmethod(trend_indicators.sma_columns)
+    source_index = 3  # bar タプル内の位置 (Close)
+    prefix = 'SMA'
+
+    def __init__(self, window=20):
+        super().__init__(window=window)
+        self.values = deque(maxlen=window)
+
+    def column_names(self):
+        return [f"{self.prefix}_{self.params['window']}"]
+
+    def _seed(self, ctx, columns):
+        source = ('High', 'Low', 'Close', 'Volume')[self.source_index - 1]
+        self.values.extend(ctx.column(source).to_numpy(dtype=float)[-self.params['window']:])
+
+    def _step(self, bar):
+        self.values.append(bar[self.source_index])
+        valid = [v for v in self.values if v == v]
+        return (math.fsum(valid) / len(valid) if valid else math.nan,)
+
+
+class VolumeSmaIndicator(SmaIndicator):
+    """出来高移動平均 (min_periods=1)。"""
+    columns_func = staticmethod(volume_indicators.volume_sma_columns)
+    source_index = 4  # Volume
+    prefix = 'Volume_SMA'
+
+
+class BollingerIndicator(IncrementalIndicator):
+    columns_func = staticmethod(trend_indicators.bollinger_bands_columns)
+
+    def __init__(self, window=20, nbdev=2):
+        super().__init__(window=window, nbdev=nbdev)
+        self.values = deque(maxlen=window)
+
+    def column_names(self):
+        window = self.params['window']
+        return [f'BB_Mid_{window}', f'BB_Upper_2std_{window}', f'BB_Lower_2std_{window}', f'BB_Upper_3std_{window}', f'BB_Lower_3std_{window}']
+
+    def _seed(self, ctx, columns):
+        self.values.extend(ctx.column('Close').to_numpy(dtype=float)[-self.params['window']:])
+
+    def _step(self, bar):
+        self.values.append(bar[3])
+        window = self.params['window']
+        if len(self.values) < window or any(v != v for v in self.values):
+            return (math.nan,) * 5
+        mid = math.fsum(self.values) / window
+        std = math.sqrt(math.fsum((v - mid) ** 2 for v in self.values) / window)
+        return mid, mid + (std * 2), mid - (std * 2), mid + (std * 3), mid - (std * 3)
+
+
+class DonchianIndicator(IncrementalIndicator):
+    columns_func = staticmethod(trend_indicators.donchian_channel_columns)
+
+    def __init__(self, window=20):
+        super().__init__(window=window)
+        self.highs = deque(maxlen=window)
+        self.lows = deque(maxlen=window)
+
+    def column_names(self):
+        window = self.params['window']
+        return [f'donchian_upper_{window}', f'donchian_lower_{window}', f'donchian_mid_{window}']
+
+    def _seed(self, ctx, columns):
+        window = self.params['window']
+        self.highs.extend(ctx.column('High').to_numpy(dtype=float)[-window:])
+        self.lows.extend(ctx.column('Low').to_numpy(dtype=float)[-window:])
+
+    def _step(self, bar):
+        self.highs.append(bar[1])
+        self.lows.append(bar[2])
+        window = self.params['window']
+        if len(self.highs) < window or any(v != v for v in self.highs) or any(v != v for v in self.lows):
+            return (math.nan,) * 3
+        upper, lower = max(self.highs), min(self.lows)
+        return upper, lower, (upper + lower) / 2
+
+
+class ObvIndicator(IncrementalIndicator):
+    columns_func = staticmethod(volume_indicators.obv_columns)
+
+    def __init__(self):
+        super().__init__()
+        self.total = 0.
+        self.prev_close = math.nan
+
+    def column_names(self):
+        return ['obv']
+
+    def _seed(self, ctx, columns):
+        obv = columns['obv']
+        valid = np.flatnonzero(~np.isnan(obv))
+        self.total = float(obv[valid[-1]]) if len(valid) else 0.
+        self.prev_close = float(ctx.column('Close').iloc[-1])
+
+    def _step(self, bar):
+        _, _, _, close, volume = bar
+        delta = close - self.prev_close
+        self.prev_close = close
+        sign = 0. if delta != delta else float(np.sign(delta))
+        flow = sign * volume
+        if flow != flow:  # cumsum と同様にNaNの行は合計に含めない
+            return (math.nan,)
+        self.total += flow
+        return (self.total,)
+
+
+class VwapIndicator(IncrementalIndicator):
+    columns_func = staticmethod(volume_indicators.vwap_columns)
+
+    def __init__(self, reset_daily=True):
+        super().__init__(reset_daily=reset_daily)
+        self.session = None
+        self.cum_tp_vol = 0.
+        self.cum_vol = 0.
+        self.last_vwap = math.nan
+
+    def column_names(self):
+        return ['vwap']
+
+    def _session_key(self, timestamp):
+        if self.params['reset_daily'] and isinstance(timestamp, pd.Timestamp):
+            return timestamp.date()
+        return None
+
+    def _seed(self, ctx, columns):
+        tp_vol = (ctx.typical_price() * ctx.column('Volume')).to_numpy(dtype=float)
+        vol = ctx.column('Volume').to_numpy(dtype=float)
+        self.session = self._session_key(ctx.index[-1])
+        if self.session is not None:
+            in_session = np.asarray(ctx.index.date == self.session)
+            tp_vol, vol = tp_vol[in_session], vol[in_session]
+        # groupby().cumsum() と同じくNaNを飛ばして先頭から順に加算した値
+        self.cum_tp_vol = float(np.nancumsum(tp_vol)[-1])
+        self.cum_vol = float(np.nancumsum(vol)[-1])
+        vwap = columns['vwap']
+        valid = np.flatnonzero(~np.isnan(vwap))
+        self.last_vwap = float(vwap[valid[-1]]) if len(valid) else math.nan
+
+    def _step(self, bar):
+        timestamp, high, low, close, volume = bar
+        session = self._session_key(timestamp)
+        if session != self.session:
+            self.session = session
+            self.cum_tp_vol = 0.
+            self.cum_vol = 0.
+        tp_vol = ((high + low + close) / 3) * volume
+        if tp_vol == tp_vol:
+            self.cum_tp_vol += tp_vol
+        if volume == volume:
+            self.cum_vol += volume
+        # 出来高0などで値が出ない行は直前のVWAPを引き継ぐ (ffill)
+        if tp_vol == tp_vol and volume == volume and self.cum_vol != 0:
+            self.last_vwap = self.cum_tp_vol / self.cum_vol
+        return (self.last_vwap,)
+
+
+# INDICATORS_CONFIG のキー -> 状態付き指標クラス
+INCREMENTAL_INDICATORS = {
+    'sma': SmaIndicator,
+    'ema': EmaIndicator,
+    'macd': MacdIndicator,
+    'rsi': RsiIndicator,
+    'atr': AtrIndicator,
+    'keltner': KeltnerIndicator,
+    'force_index': ForceIndexIndicator,
+    'bollinger': BollingerIndicator,
+    'donchian': DonchianIndicator,
+    'obv': ObvIndicator,
+    'vwap': VwapIndicator,
+    'volume_sma': VolumeSmaIndicator,
+}
+
+
+def _indicator_params(cfg, params):
+    """状態付き指標クラスのコンストラクタに渡すパラメータ (設定に定義されたものだけ)。"""
+    return {name: value for name, value in params.items() if name in cfg.get('params', {})}
+
+
+class IncrementalIndicatorSet:
+    """選択された複数の状態付き指標をまとめて扱う。列の順序はエンジンの出力と同じ。"""
+
+    def __init__(self, indicators):
+        self.indicators = indicators  # [(キー, IncrementalIndicator), ...]
+
+    @staticmethod
+    def supports(resolved_indicators):
+        """
+        選択された指標がすべて状態付きで計算でき、かつ出力列名が重複しないかを返す。
+        (例: ケルトナーとATRが同じ期間の atr_N 列を出力する場合は、逐次計算での上書き順を再現できないため対象外)
+        """
+        names = []
+        for key, cfg, params in resolved_indicators:
+            if not cfg.get('columns_func'): continue
+            if key not in INCREMENTAL_INDICATORS:
+                return False
+            names.extend(INCREMENTAL_INDICATORS[key](**_indicator_params(cfg, params)).column_names())
+        return len(names) == len(set(names))
+
+    @classmethod
+    def from_frame(cls, df, resolved_indicators):
+        indicators, columns = [], {}
+        for key, cfg, params in resolved_indicators:
+            if not cfg.get('columns_func'): continue
+            indicator, indicator_columns = INCREMENTAL_INDICATORS[key].from_frame(df, **_indicator_params(cfg, params))
+            indicators.append((key, indicator))
+            columns.update(indicator_columns)
+        return cls(indicators), columns
+
+    def update(self, bars):
+        columns = {}
+        for _, indicator in self.indicators:
+            columns.update(indicator.update(bars))
+        return columns
+
+
+_OHLCV_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def _same_history(cache, df, n_confirmed):
+    """キャッシュ済みの確定バーが、新しいデータの先頭部分と一致しているか。"""
+    if cache['n_confirmed'] > n_confirmed:
+        return False
+    n = cache['n_confirmed']
+    if not df.index[:n].equals(cache['index']):
+        return False
+    return all(np.array_equal(df[name].to_numpy(dtype=float)[:n], cache['ohlcv'][name], equal_nan=True) for name in cache['ohlcv'])
+
+
+def compute_columns_with_cache(df, resolved_indicators, signature, cache=None):
+    """
+    状態付き指標で列を計算し、(列名 -> ndarray, 新しいキャッシュ) を返します。
+    最終バーは未確定 (形成中の足) として扱い、状態は確定済みのバーまでで保存します。
+    cache が同じ signature で、確定済みのバーが df の先頭と一致していれば、追加分のバーだけを更新します。
+    対応していない指標が含まれる場合は (None, None) を返します。
+    """
+    if len(df) < 2 or not all(name in df.columns for name in _OHLCV_COLUMNS):
+        return None, None
+    if not IncrementalIndicatorSet.supports(resolved_indicators):
+        return None, None
+
+    n_confirmed = len(df) - 1
+    if cache is not None and cache.get('signature') == signature and _same_history(cache, df, n_confirmed):
+        indicator_set = cache['indicator_set']
+        confirmed_columns = cache['columns']
+        new_bars = df.iloc[cache['n_confirmed']:n_confirmed]
+        if len(new_bars):
+            new_columns = indicator_set.update(new_bars)
+            confirmed_columns = {name: np.concatenate([values, new_columns[name]]) for name, values in confirmed_columns.items()}
+        logger.info(f"Incremental indicators: reused {cache['n_confirmed']} cached bars, updated {len(new_bars)} new bars.")
+    else:
+        indicator_set, confirmed_columns = IncrementalIndicatorSet.from_frame(df.iloc[:n_confirmed], resolved_indicators)
+        logger.info(f"Incremental indicators: initialized state from {n_confirmed} bars.")
+
+    # 形成中の最終バーは状態のコピーで計算し、確定済みの状態は汚さない
+    last_columns = copy.deepcopy(indicator_set).update(df.iloc[n_confirmed:])
+    columns = {name: np.concatenate([values, last_columns[name]]) for name, values in confirmed_columns.items()}
+
+    new_cache = {
+        'signature': signature,
+        'n_confirmed': n_confirmed,
+        'index': df.index[:n_confirmed],
+        'ohlcv': {name: df[name].to_numpy(dtype=float)[:n_confirmed].copy() for name in _OHLCV_COLUMNS},
+        'indicator_set': indicator_set,
+        'columns': confirmed_columns,
+    }
+    return columns, new_cache
+
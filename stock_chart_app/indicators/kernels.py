@@ -0,0 +1,244 @@
+# stock_chart_app/indicators/kernels.py
+# 各指標モジュールから共通で使うNumPyベースの計算カーネル。
+# pandasのSeries/DataFrameではなく生のndarrayを受け取り、ndarrayを返します。
+# 先頭軸(axis=0)を時系列方向として扱います。
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 一時配列の要素数の目安 (これを超えないように行方向をチャンク分割する)
+_MAX_BLOCK_ELEMENTS = 1 << 21
+
+
+def _chunk_rows(window: int, n_rows: int) -> int:
+    """1チャンクで処理するウィンドウ数を返す。"""
+    return max(1, min(n_rows, _MAX_BLOCK_ELEMENTS // max(window, 1)))
+
+
+# --- RCI (順位相関指数) ---
+def rolling_rci(values, window: int) -> np.ndarray:
+    """
+    スライディングウィンドウ上でRCIを計算します。
+    各ウィンドウ内の価格順位は Series.rank(method='average') と同じく同値を平均順位で扱います。
+    ウィンドウが揃わない先頭部分と、NaNを含むウィンドウの値はNaNになります。
+    """
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    out = np.full(values.shape, np.nan)
+    if window < 2 or n < window:
+        return out
+
+    windows = sliding_window_view(values, window, axis=0)  # (n - window + 1, ..., window)
+    positions = np.arange(window)
+    denominator = window * (window**2 - 1)
+    chunk = _chunk_rows(window, windows.shape[0])
+
+    for start in range(0, windows.shape[0], chunk):
+        block = windows[start:start + chunk]
+        order = np.argsort(block, axis=-1, kind='stable')
+        sorted_block = np.take_along_axis(block, order, axis=-1)
+
+        # 同値グループの先頭・末尾位置から平均順位を求める
+        is_first = np.ones(sorted_block.shape, dtype=bool)
+        is_first[..., 1:] = sorted_block[..., 1:] != sorted_block[..., :-1]
+        is_last = np.ones(sorted_block.shape, dtype=bool)
+        is_last[..., :-1] = is_first[..., 1:]
+        group_start = np.maximum.accumulate(np.where(is_first, positions, 0), axis=-1)
+        group_end = np.minimum.accumulate(np.where(is_last, positions, window - 1)[..., ::-1], axis=-1)[..., ::-1]
+        price_ranks = (group_start + group_end) / 2 + 1
+
+        # ソート後の位置pの要素は元の日付順位 order[p] + 1 を持つ
+        d_sq_sum = ((order + 1 - price_ranks) ** 2).sum(axis=-1)
+        rho = 1 - (6 * d_sq_sum) / denominator
+        rci = rho * 100
+        rci[np.isnan(block).any(axis=-1)] = np.nan
+        out[start + window - 1:start + window - 1 + len(block)] = rci
+    return out
+
+
+# --- Parabolic SAR ---
+# numbaがあればJITコンパイルし、なければ同じループをPythonのリスト上で回す。
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+
+def _psar_loop(high, low, initial_af, af_increment, max_af, sar, trend_out, af_out):
+    # max()/min() は NaN の扱いが組み込み関数と揃うよう比較式で書いている
+    trend = 1  # 1: 上昇トレンド, -1: 下降トレンド
+    ep = high[0]
+    af = initial_af
+    sar[0] = low[0]
+    trend_out[0] = trend
+    af_out[0] = af
+    for i in range(1, len(high)):
+        prev_sar = sar[i - 1]
+        prev_ep = ep
+        prev_af = af
+        current_sar = prev_sar + prev_af * (prev_ep - prev_sar)
+        next_af = prev_af + af_increment
+        if next_af > max_af:
+            next_af = max_af
+        if trend == 1:
+            if high[i] > prev_ep:
+                ep = high[i]
+                af = next_af
+            if current_sar > low[i]:  # トレンド転換
+                trend = -1
+                ep = low[i]
+                af = initial_af
+                sar[i] = high[i] if high[i] > prev_ep else prev_ep
+            else:
+                sar[i] = current_sar
+        else:
+            if low[i] < prev_ep:
+                ep = low[i]
+                af = next_af
+            if current_sar < high[i]:  # トレンド転換
+                trend = 1
+                ep = high[i]
+                af = initial_af
+                sar[i] = low[i] if low[i] < prev_ep else prev_ep
+            else:
+                sar[i] = current_sar
+        trend_out[i] = trend
+        af_out[i] = af
+
+
+_psar_loop_jit = njit(cache=True)(_psar_loop) if NUMBA_AVAILABLE else None
+
+
+def parabolic_sar(high, low, initial_af=0.02, af_increment=0.02, max_af=0.2):
+    """
+    パラボリックSARを計算し、(sar, trend, af) の3つの配列を返します。
+    trend は各バー確定後のトレンド方向 (1 / -1)、af はその時点の加速因子です。
+    バーが2本未満の場合はすべてNaNを返します。
+    2次元配列 (時系列 x 銘柄) を渡した場合は、銘柄ごとに計算して同じ形で返します。
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    if high.ndim > 1:
+        # SARは前のバーの状態に依存する逐次計算のため、銘柄の列ごとにループを回す
+        flat_high, flat_low = high.reshape(len(high), -1), low.reshape(len(low), -1)
+        outputs = [np.empty(flat_high.shape) for _ in range(3)]
+        for j in range(flat_high.shape[1]):
+            for out, values in zip(outputs, parabolic_sar(flat_high[:, j], flat_low[:, j], initial_af, af_increment, max_af)):
+                out[:, j] = values
+        return tuple(out.reshape(high.shape) for out in outputs)
+    length = len(high)
+    if length < 2:
+        empty = np.full(length, np.nan)
+        return empty, empty.copy(), empty.copy()
+
+    if _psar_loop_jit is not None:
+        sar, trend, af = np.empty(length), np.empty(length), np.empty(length)
+        _psar_loop_jit(high, low, float(initial_af), float(af_increment), float(max_af), sar, trend, af)
+        return sar, trend, af
+
+    sar, trend, af = [0.0] * length, [0] * length, [0.0] * length
+    _psar_loop(high.tolist(), low.tolist(), initial_af, af_increment, max_af, sar, trend, af)
+    return np.array(sar, dtype=float), np.array(trend, dtype=float), np.array(af, dtype=float)
+
+
+# --- ウィンドウ内の最大・最小位置 (Aroon用) ---
+def _rolling_arg_extreme(values, window: int, reducer) -> np.ndarray:
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    n = values.shape[0]
+    if window < 1 or n < window:
+        return out
+    windows = sliding_window_view(values, window, axis=0)
+    chunk = _chunk_rows(window, windows.shape[0])
+    for start in range(0, windows.shape[0], chunk):
+        block = windows[start:start + chunk]
+        bars_since = (window - 1 - reducer(block, axis=-1)).astype(float)
+        bars_since[np.isnan(block).any(axis=-1)] = np.nan
+        out[start + window - 1:start + window - 1 + len(block)] = bars_since
+    return out
+
+
+def bars_since_rolling_max(values, window: int) -> np.ndarray:
+    """ウィンドウ内の最大値(同値なら最初の位置)から現在までのバー数。NaNを含むウィンドウはNaN。"""
+    return _rolling_arg_extreme(values, window, np.argmax)
+
+
+def bars_since_rolling_min(values, window: int) -> np.ndarray:
+    """ウィンドウ内の最小値(同値なら最初の位置)から現在までのバー数。NaNを含むウィンドウはNaN。"""
+    return _rolling_arg_extreme(values, window, np.argmin)
+
+
+# --- 加重移動平均 (WMA) ---
+def rolling_wma(values, window: int) -> np.ndarray:
+    """
+    重み 1..window の線形加重移動平均を畳み込みで計算します。
+    先頭の window-1 本と、NaNを含むウィンドウの値はNaNになります。
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    n = values.shape[0]
+    if window < 1 or n < window:
+        return out
+    weights = np.arange(1, window + 1, dtype=float)
+    # np.convolve はカーネルを反転させるため、新しいバーほど重くなるよう逆順で渡す
+    kernel = weights[::-1]
+    if values.ndim == 1:
+        out[window - 1:] = np.convolve(values, kernel, mode='valid')
+    else:
+        flat = values.reshape(n, -1)
+        out_flat = out.reshape(n, -1)
+        for j in range(flat.shape[1]):
+            out_flat[window - 1:, j] = np.convolve(flat[:, j], kernel, mode='valid')
+    return out / weights.sum()
+
+
+def hull_moving_average(values, window: int) -> np.ndarray:
+    """ハル移動平均 (HMA) = WMA(2 * WMA(n/2) - WMA(n), sqrt(n))。"""
+    half = max(int(window / 2), 1)
+    sqrt_window = max(int(np.sqrt(window)), 1)
+    raw = 2 * rolling_wma(values, half) - rolling_wma(values, window)
+    return rolling_wma(raw, sqrt_window)
+
+
+# --- 複数の平滑化係数の指数移動平均 (EMAスイープ用) ---
+def _ewm_multi_loop(values, alphas, out):
+    # pandas の ewm(adjust=False, ignore_na=False).mean() と同じ漸化式を、全係数・全列について1回のループで更新する
+    n, n_cols = values.shape
+    n_alphas = alphas.shape[0]
+    weighted = np.full((n_alphas, n_cols), np.nan)
+    old_wt = np.ones((n_alphas, n_cols))
+    for i in range(n):
+        for j in range(n_cols):
+            cur = values[i, j]
+            is_observation = cur == cur
+            for k in range(n_alphas):
+                w = weighted[k, j]
+                if w == w:
+                    old_wt[k, j] *= 1. - alphas[k]
+                    if is_observation:
+                        if w != cur:
+                            weighted[k, j] = (old_wt[k, j] * w + alphas[k] * cur) / (old_wt[k, j] + alphas[k])
+                        old_wt[k, j] = 1.
+                elif is_observation:
+                    weighted[k, j] = cur
+                out[k, i, j] = weighted[k, j]
+
+
+_ewm_multi_loop_jit = njit(cache=True)(_ewm_multi_loop) if NUMBA_AVAILABLE else None
+
+
+def ewm_mean_multi(values, coms):
+    """
+    adjust=False の指数移動平均を、複数の center of mass についてまとめて計算します。
+    戻り値の形は (len(coms),) + values.shape です。numbaがない場合は None を返します
+    (呼び出し側で pandas の ewm にフォールバックする)。
+    """
+    if _ewm_multi_loop_jit is None:
+        return None
+    values = np.asarray(values, dtype=float)
+    flat = np.ascontiguousarray(values.reshape(len(values), -1))
+    alphas = 1. / (1. + np.asarray(coms, dtype=float))
+    out = np.empty((len(alphas),) + flat.shape)
+    _ewm_multi_loop_jit(flat, alphas, out)
+    return out.reshape((len(alphas),) + values.shape)
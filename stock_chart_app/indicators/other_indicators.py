@@ -3,44 +3,44 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from stock_chart_app.plot_utils import add_line_trace # 修正: stock_chart_app からインポート
+from stock_chart_app.indicators.context import assign_columns
 
 # --- Average True Range (ATR) ---
+def atr_columns(ctx, window=14):
+    """ATRを計算します。いずれかの値がNaNのバー (先頭バーなど) のTRはNaNとして扱います。"""
+    # Wilder's smoothing
+    return {f'atr_{window}': ctx.atr(window, strict=True)}
+
 def calculate_atr(df_orig, window=14):
     """ATRを計算し、DataFrameに'atr_WINDOW'列として追加します。"""
-    df = df_orig.copy()
-    high_low = df['High'] - df['Low']
-    high_close = np.abs(df['High'] - df['Close'].shift())
-    low_close = np.abs(df['Low'] - df['Close'].shift())
-    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1, skipna=False)
-    # Wilder's smoothing
-    df[f'atr_{window}'] = tr.ewm(com=window - 1, adjust=False).mean()
-    return df
+    return assign_columns(df_orig, atr_columns, window=window)
 
 def add_atr_trace(fig, df, window=14, row=2, col=1, **params):
     """ATRをサブプロットに描画します。"""
     add_line_trace(fig, df, f'atr_{window}', f'ATR({window})', color='chocolate', row=row, col=col)
 
 # --- Standard Deviation (Volatility) ---
+def std_dev_columns(ctx, window=20):
+    """終値の標準偏差 (母標準偏差) を計算します。"""
+    return {f'std_dev_{window}': ctx.rolling_std('Close', window, ddof=0)}
+
 def calculate_std_dev(df_orig, window=20):
     """終値の標準偏差を計算します。"""
-    df = df_orig.copy()
-    df[f'std_dev_{window}'] = df['Close'].rolling(window=window).std(ddof=0)
-    return df
+    return assign_columns(df_orig, std_dev_columns, window=window)
 
 def add_std_dev_trace(fig, df, window=20, row=2, col=1, **params):
     """標準偏差をサブプロットに描画します。"""
     add_line_trace(fig, df, f'std_dev_{window}', f'Std Dev({window})', color='olivedrab', row=row, col=col)
 
 # --- Pivot Points ---
-def calculate_pivot_points(df_orig):
+def pivot_points_columns(ctx):
     """
     前日のデータを使用して、各日のピボットポイントを計算します。
     日足データでの使用を想定しています。
     """
-    df = df_orig.copy()
-    prev_high = df['High'].shift(1)
-    prev_low = df['Low'].shift(1)
-    prev_close = df['Close'].shift(1)
+    prev_high = ctx.shift('High', 1)
+    prev_low = ctx.shift('Low', 1)
+    prev_close = ctx.shift('Close', 1)
 
     p = (prev_high + prev_low + prev_close) / 3
     r1 = (2 * p) - prev_low
@@ -50,11 +50,11 @@ def calculate_pivot_points(df_orig):
     r3 = prev_high + 2 * (p - prev_low)
     s3 = prev_low - 2 * (prev_high - p)
 
-    df['pivot'] = p
-    df['r1'], df['s1'] = r1, s1
-    df['r2'], df['s2'] = r2, s2
-    df['r3'], df['s3'] = r3, s3
-    return df
+    return {'pivot': p, 'r1': r1, 's1': s1, 'r2': r2, 's2': s2, 'r3': r3, 's3': s3}
+
+def calculate_pivot_points(df_orig):
+    """ピボットポイントを計算し、pivot, r1〜r3, s1〜s3 列として追加します。"""
+    return assign_columns(df_orig, pivot_points_columns)
 
 def add_pivot_points_traces(fig, df, row=1, col=1, **params):
     """ピボットポイントをメインチャートに描画します。"""
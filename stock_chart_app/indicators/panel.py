@@ -0,0 +1,157 @@
+# stock_chart_app/indicators/panel.py
+# 複数銘柄のOHLCVデータ (パネル) に対して、INDICATORS_CONFIG の指標をまとめて計算するモジュール。
+# パネルは {'Open': DataFrame, 'High': DataFrame, ...} の形で、各DataFrameは行=日時、列=銘柄です。
+# 各指標の *_columns(ctx, **params) を PanelContext 上で実行すると、rolling/ewm/diff などの
+# pandas演算とNumPyカーネルが先頭軸 (時系列方向) に沿って全銘柄分を一度に計算します。
+# スクリーニング (例: RSI(14) < 30 かつ 終値 > SMA(200)) では latest_snapshot() で各銘柄の最新値を取り出します。
+import logging
+
+import numpy as np
+import pandas as pd
+
+from stock_chart_app.indicators.context import IndicatorContext
+from stock_chart_app.indicators.engine import resolve_indicators
+
+logger = logging.getLogger(__name__)
+
+OHLCV_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+class PanelContext(IndicatorContext):
+    """
+    複数銘柄用の計算コンテキスト。column() は行=日時、列=銘柄のDataFrameを返し、
+    中間系列のメモ化や指標の出力列もすべてDataFrame単位で扱います。
+    """
+
+    def __init__(self, panel):
+        super().__init__(panel['Close'])
+        self.panel = panel
+        self.tickers = panel['Close'].columns
+
+    def has_column(self, name):
+        return name in self.outputs or name in self.panel
+
+    def column(self, name):
+        if name in self.outputs:
+            return self.outputs[name]
+        return self.panel[name]
+
+    def register_outputs(self, columns):
+        for name, values in columns.items():
+            if not isinstance(values, pd.DataFrame):
+                values = pd.DataFrame(np.asarray(values), index=self.index, columns=self.tickers, copy=False)
+            self.outputs[name] = values
+
+
+def to_panel(data, fields=OHLCV_FIELDS):
+    """
+    複数銘柄のOHLCVデータをパネル (項目名 -> 行=日時、列=銘柄のDataFrame) に変換します。
+    以下の形式に対応します:
+      - {銘柄: OHLCVのDataFrame} の辞書
+      - {項目名: 行=日時、列=銘柄のDataFrame} の辞書 (既にパネル形式)
+      - 列がMultiIndexのDataFrame ((項目名, 銘柄) または (銘柄, 項目名)。yfinanceの複数銘柄ダウンロード結果など)
+      - 行がMultiIndex (日時, 銘柄) の縦持ちDataFrame (銘柄は最後のレベル)
+    存在しない項目はパネルに含めません。全項目の行・列は終値に揃えます。
+    """
+    if isinstance(data, dict):
+        if 'Close' in data and all(isinstance(frame, pd.DataFrame) for frame in data.values()):
+            panel = {field: data[field] for field in fields if field in data}
+        else:
+            panel = {}
+            for field in fields:
+                series = {ticker: frame[field] for ticker, frame in data.items() if frame is not None and field in frame.columns}
+                if series:
+                    panel[field] = pd.concat(series, axis=1)
+    elif isinstance(data, pd.DataFrame) and isinstance(data.index, pd.MultiIndex):
+        wide = data[[field for field in fields if field in data.columns]].unstack(level=-1)
+        panel = {field: wide[field] for field in wide.columns.get_level_values(0).unique()}
+    elif isinstance(data, pd.DataFrame) and isinstance(data.columns, pd.MultiIndex):
+        field_level = next((level for level in range(data.columns.nlevels) if 'Close' in data.columns.get_level_values(level)), None)
+        if field_level is None:
+            raise ValueError("列のMultiIndexに 'Close' を含むレベルがありません。")
+        available = data.columns.get_level_values(field_level)
+        panel = {field: data.xs(field, axis=1, level=field_level) for field in fields if field in available}
+    else:
+        raise ValueError(f"パネルに変換できないデータ形式です: {type(data).__name__}")
+
+    if 'Close' not in panel:
+        raise ValueError("パネルには 'Close' が必要です。")
+    close = panel['Close'].sort_index()
+    index, tickers = close.index, close.columns
+    return {field: frame.reindex(index=index, columns=tickers).astype(float) for field, frame in panel.items()}
+
+
+def _compute_panel_outputs(panel, resolved_indicators):
+    ctx = PanelContext(panel)
+    for key, cfg, params in resolved_indicators:
+        if not cfg.get('columns_func'): continue
+        columns_func = getattr(cfg['module'], cfg['columns_func'])
+        try:
+            ctx.register_outputs(columns_func(ctx, **params))
+        except KeyError as e:
+            logger.warning(f"Panel indicator '{key}' skipped: missing column {e}.")
+    return ctx
+
+
+def compute_panel_columns(panel, resolved_indicators):
+    """
+    解決済みの指標を全銘柄分まとめて計算し、列名 -> DataFrame (行=日時、列=銘柄) の辞書を返します。
+    上場日の違いなどでデータの開始位置が異なる銘柄は、開始位置ごとのグループに分けて先頭のNaNを除いて計算するため、
+    各銘柄の結果は単一銘柄で計算した場合と一致します。
+    必要な項目 (例: Volume) がパネルにない指標はスキップします。
+    """
+    close = panel['Close']
+    valid = close.notna().to_numpy()
+    first_pos = np.where(valid.any(axis=0), np.argmax(valid, axis=0), len(close))
+    starts = np.unique(first_pos[first_pos < len(close)])
+
+    if len(starts) == 1 and starts[0] == 0 and valid.any(axis=0).all():
+        ctx = _compute_panel_outputs(panel, resolved_indicators)
+        logger.info(f"Panel engine: {len(ctx.tickers)} tickers x {len(ctx.index)} bars, {len(ctx.outputs)} columns, "
+                    f"{len(ctx.computed_keys)} shared intermediates computed, {ctx.cache_hits} reused.")
+        return ctx.outputs
+
+    group_outputs = []
+    for start in starts:
+        tickers = close.columns[first_pos == start]
+        group_panel = {field: frame.iloc[start:][tickers] for field, frame in panel.items()}
+        group_outputs.append(_compute_panel_outputs(group_panel, resolved_indicators).outputs)
+    logger.info(f"Panel engine: {close.shape[1]} tickers x {len(close)} bars in {len(starts)} start-date groups.")
+
+    outputs = {}
+    for name in dict.fromkeys(name for group in group_outputs for name in group):
+        frames = [group[name] for group in group_outputs if name in group]
+        outputs[name] = pd.concat(frames, axis=1).reindex(index=close.index, columns=close.columns)
+    return outputs
+
+
+def compute_panel_indicators(data, selected_keys, indicator_params_values, indicators_config):
+    """複数銘柄のデータをパネルに変換し、選択された指標を計算して (パネル, 指標列) を返します。"""
+    panel = to_panel(data)
+    resolved = resolve_indicators(selected_keys, indicator_params_values, indicators_config)
+    return panel, compute_panel_columns(panel, resolved)
+
+
+def latest_snapshot(panel, columns, fields=('Close',)):
+    """
+    各銘柄の最新バー (終値が存在する最後の行) の値を、行=銘柄、列=項目/指標のDataFrameにまとめます。
+    銘柄ごとに最終取引日が異なっても、それぞれの最新の値を使います。'Date' 列にその日時を入れます。
+    """
+    close = panel['Close']
+    if close.empty:
+        return pd.DataFrame(index=close.columns)
+    valid = close.notna().to_numpy()
+    has_data = valid.any(axis=0)
+    last_pos = len(close) - 1 - np.argmax(valid[::-1], axis=0)
+    ticker_pos = np.arange(close.shape[1])
+
+    sources = {field: panel[field] for field in fields if field in panel}
+    sources.update(columns)
+    snapshot = {}
+    for name, frame in sources.items():
+        values = frame.to_numpy(dtype=float)[last_pos, ticker_pos]
+        values[~has_data] = np.nan
+        snapshot[name] = values
+    result = pd.DataFrame(snapshot, index=close.columns)
+    result.insert(0, 'Date', close.index[last_pos].where(has_data))
+    return result
@@ -0,0 +1,103 @@
+# stock_chart_app/indicators/sweep.py
+# 1つの指標を複数のパラメータでまとめて計算するスイープAPI。
+# 例: SMA 5/25/75/200 を1回の累積和から、EMA の複数スパンを1回のループから、
+# ボリンジャーバンドの複数の幅を1回の平均・標準偏差から計算します。
+# 結果はパラメータを先頭軸に積んだブロック (len(params),) + values.shape で返します。
+# 入力は1次元 (単一銘柄) でも2次元 (時系列 x 銘柄) でも構いません。
+import numpy as np
+import pandas as pd
+
+from stock_chart_app.indicators import kernels
+
+
+def parse_parameter_list(values):
+    """
+    '5,25,75,200' のようなカンマ区切り文字列、'5-30:5' のような範囲指定 (開始-終了:刻み、終了を含む)、
+    または数値のリストを、重複を除いた整数のタプルにします。
+    """
+    if isinstance(values, str):
+        parsed = []
+        for part in values.replace('、', ',').split(','):
+            part = part.strip()
+            if not part: continue
+            if '-' in part:
+                bounds, _, step = part.partition(':')
+                start, end = (int(v) for v in bounds.split('-', 1))
+                parsed.extend(range(start, end + 1, int(step) if step else 1))
+            else:
+                parsed.append(int(float(part)))
+        values = parsed
+    elif np.isscalar(values):
+        values = [values]
+    return tuple(dict.fromkeys(int(v) for v in values))
+
+
+def _shape_block(values, n_params):
+    values = np.asarray(values, dtype=float)
+    return values, np.full((n_params,) + values.shape, np.nan)
+
+
+def sma_sweep(values, windows, min_periods=None):
+    """
+    複数期間の単純移動平均を、1回の累積和からまとめて計算します。
+    NaNは除外して平均し (rolling().mean() と同じ)、窓内の有効な値が min_periods (省略時は期間) 未満ならNaNにします。
+    累積和の桁落ちを抑えるため、各列の最初の有効値を基準にした差分で累積します。
+    """
+    windows = parse_parameter_list(windows)
+    values, out = _shape_block(values, len(windows))
+    n = len(values)
+    if n == 0 or not windows:
+        return out
+
+    valid = ~np.isnan(values)
+    first_valid = np.argmax(valid, axis=0)
+    base = np.take_along_axis(values, first_valid[np.newaxis], axis=0)[0] if values.ndim > 1 else values[first_valid]
+    base = np.where(np.isnan(base), 0., base)
+
+    zeros = np.zeros((1,) + values.shape[1:])
+    csum = np.concatenate([zeros, np.cumsum(np.where(valid, values - base, 0.), axis=0)])
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    for k, window in enumerate(windows):
+        required = window if min_periods is None else min_periods
+        lower = np.maximum(np.arange(1, n + 1) - window, 0)
+        window_sum = csum[1:] - csum[lower]
+        count = ccount[1:] - ccount[lower]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = window_sum / count + base
+        out[k] = np.where(count >= max(required, 1), mean, np.nan)
+    return out
+
+
+def ema_sweep(values, spans):
+    """
+    複数スパンの指数移動平均 (adjust=False) をまとめて計算します。
+    numbaがあれば全スパンを1回のループで更新し、なければスパンごとに pandas の ewm を使います。
+    どちらも ewm(span=s, adjust=False).mean() と同じ値になります。
+    """
+    spans = parse_parameter_list(spans)
+    values, out = _shape_block(values, len(spans))
+    if len(values) == 0 or not spans:
+        return out
+    # pandas と同じく span から center of mass を求めてから係数にする (丸め誤差まで揃えるため)
+    coms = [(span - 1) / 2 for span in spans]
+    result = kernels.ewm_mean_multi(values, coms)
+    if result is not None:
+        return result
+    frame = pd.DataFrame(values.reshape(len(values), -1))
+    for k, com in enumerate(coms):
+        out[k] = frame.ewm(com=com, adjust=False).mean().to_numpy().reshape(values.shape)
+    return out
+
+
+def bollinger_sweep(values, window, nbdevs, ddof=0):
+    """
+    1つの期間について、複数の幅 (標準偏差の倍率) のボリンジャーバンドをまとめて計算します。
+    移動平均と標準偏差は1回だけ計算し、(mid, upper, lower) を返します。upper/lower は (len(nbdevs),) + values.shape のブロックです。
+    """
+    nbdevs = tuple(float(v) for v in (nbdevs.split(',') if isinstance(nbdevs, str) else np.atleast_1d(nbdevs)))
+    values = np.asarray(values, dtype=float)
+    rolling = pd.DataFrame(values.reshape(len(values), -1)).rolling(window=window)
+    mid = rolling.mean().to_numpy().reshape(values.shape)
+    std = rolling.std(ddof=ddof).to_numpy().reshape(values.shape)
+    multipliers = np.asarray(nbdevs).reshape((-1,) + (1,) * values.ndim)
+    return mid, mid + std * multipliers, mid - std * multipliers
@@ -4,36 +4,95 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from stock_chart_app.plot_utils import add_line_trace # 修正: stock_chart_app からインポート
+from stock_chart_app.indicators import kernels, sweep
+from stock_chart_app.indicators.context import assign_columns, wrap_like
 
 # --- SMA / EMA (既存 + 統合) ---
+def sma_columns(ctx, window=20):
+    return {f'SMA_{window}': ctx.rolling_mean('Close', window, min_periods=1)}
+
 def calculate_sma(df_orig, window=20):
-    df = df_orig.copy()
-    df[f'SMA_{window}'] = df['Close'].rolling(window=window, min_periods=1).mean()
-    return df
+    return assign_columns(df_orig, sma_columns, window=window)
 
 def add_sma_trace(fig, df, window=20, color='orange', row=1, col=1):
     add_line_trace(fig, df, f'SMA_{window}', f'SMA({window})', color=color, row=row, col=col)
 
+def ema_columns(ctx, window=20):
+    return {f'EMA_{window}': ctx.ewm_mean('Close', span=window, min_periods=1)}
+
 def calculate_ema(df_orig, window=20):
-    df = df_orig.copy()
-    df[f'EMA_{window}'] = df['Close'].ewm(span=window, adjust=False, min_periods=1).mean()
-    return df
+    return assign_columns(df_orig, ema_columns, window=window)
 
 def add_ema_trace(fig, df, window=20, color='purple', row=1, col=1):
     add_line_trace(fig, df, f'EMA_{window}', f'EMA({window})', color=color, row=row, col=col)
 
+# --- WMA / HMA ---
+def wma_columns(ctx, window=20):
+    close = ctx.column('Close')
+    return {f'WMA_{window}': wrap_like(close, kernels.rolling_wma(close.to_numpy(dtype=float), window))}
+
+def calculate_wma(df_orig, window=20):
+    return assign_columns(df_orig, wma_columns, window=window)
+
+def add_wma_trace(fig, df, window=20, color='teal', row=1, col=1, **params):
+    add_line_trace(fig, df, f'WMA_{window}', f'WMA({window})', color=color, row=row, col=col)
+
+def hma_columns(ctx, window=20):
+    close = ctx.column('Close')
+    return {f'HMA_{window}': wrap_like(close, kernels.hull_moving_average(close.to_numpy(dtype=float), window))}
+
+def calculate_hma(df_orig, window=20):
+    return assign_columns(df_orig, hma_columns, window=window)
+
+def add_hma_trace(fig, df, window=20, color='crimson', row=1, col=1, **params):
+    add_line_trace(fig, df, f'HMA_{window}', f'HMA({window})', color=color, row=row, col=col)
+
+# --- 複数期間の SMA / EMA (パラメータスイープ) ---
+_MULTI_MA_COLORS = ['orange', 'deepskyblue', 'mediumseagreen', 'crimson', 'slateblue', 'goldenrod', 'hotpink', 'gray']
+
+def sma_multi_columns(ctx, windows='5,25,75,200'):
+    """複数期間のSMAを1回の累積和からまとめて計算し、それぞれ SMA_{window} 列として返します (min_periods=1)。"""
+    windows = sweep.parse_parameter_list(windows)
+    close = ctx.column('Close')
+    block = ctx.memo(('sma_sweep', 'Close', windows), lambda: sweep.sma_sweep(close.to_numpy(dtype=float), windows, min_periods=1))
+    return {f'SMA_{window}': wrap_like(close, block[k]) for k, window in enumerate(windows)}
+
+def calculate_sma_multi(df_orig, windows='5,25,75,200'):
+    return assign_columns(df_orig, sma_multi_columns, windows=windows)
+
+def add_sma_multi_traces(fig, df, windows='5,25,75,200', row=1, col=1, **params):
+    for k, window in enumerate(sweep.parse_parameter_list(windows)):
+        add_line_trace(fig, df, f'SMA_{window}', f'SMA({window})', color=_MULTI_MA_COLORS[k % len(_MULTI_MA_COLORS)], row=row, col=col)
+
+def ema_multi_columns(ctx, windows='5,25,75,200'):
+    """複数スパンのEMAをまとめて計算し、それぞれ EMA_{window} 列として返します。"""
+    windows = sweep.parse_parameter_list(windows)
+    close = ctx.column('Close')
+    block = ctx.memo(('ema_sweep', 'Close', windows), lambda: sweep.ema_sweep(close.to_numpy(dtype=float), windows))
+    return {f'EMA_{window}': wrap_like(close, block[k]) for k, window in enumerate(windows)}
+
+def calculate_ema_multi(df_orig, windows='5,25,75,200'):
+    return assign_columns(df_orig, ema_multi_columns, windows=windows)
+
+def add_ema_multi_traces(fig, df, windows='5,25,75,200', row=1, col=1, **params):
+    for k, window in enumerate(sweep.parse_parameter_list(windows)):
+        add_line_trace(fig, df, f'EMA_{window}', f'EMA({window})', color=_MULTI_MA_COLORS[k % len(_MULTI_MA_COLORS)], dash='dot', row=row, col=col)
+
 # --- Bollinger Bands (既存 + 統合) ---
-def calculate_bollinger_bands(df_orig, window=20, nbdev=2):
-    df = df_orig.copy()
+def bollinger_bands_columns(ctx, window=20, nbdev=2):
     # ユーザー提供コードのnbdevは一旦無視し、2σと3σを両方計算する仕様に統一
-    mid_band_col = f'BB_Mid_{window}'
-    df[mid_band_col] = df['Close'].rolling(window=window).mean()
-    std_dev = df['Close'].rolling(window=window).std(ddof=0)
-    df[f'BB_Upper_2std_{window}'] = df[mid_band_col] + (std_dev * 2)
-    df[f'BB_Lower_2std_{window}'] = df[mid_band_col] - (std_dev * 2)
-    df[f'BB_Upper_3std_{window}'] = df[mid_band_col] + (std_dev * 3) # 3σも追加
-    df[f'BB_Lower_3std_{window}'] = df[mid_band_col] - (std_dev * 3) # 3σも追加
-    return df
+    mid_band = ctx.rolling_mean('Close', window)
+    std_dev = ctx.rolling_std('Close', window, ddof=0)
+    return {
+        f'BB_Mid_{window}': mid_band,
+        f'BB_Upper_2std_{window}': mid_band + (std_dev * 2),
+        f'BB_Lower_2std_{window}': mid_band - (std_dev * 2),
+        f'BB_Upper_3std_{window}': mid_band + (std_dev * 3), # 3σも追加
+        f'BB_Lower_3std_{window}': mid_band - (std_dev * 3), # 3σも追加
+    }
+
+def calculate_bollinger_bands(df_orig, window=20, nbdev=2):
+    return assign_columns(df_orig, bollinger_bands_columns, window=window, nbdev=nbdev)
 
 def add_bollinger_bands_traces(fig, df, window=20, row=1, col=1):
     add_line_trace(fig, df, f'BB_Mid_{window}', f'BB Mid({window})', color='cyan', width=1, row=row, col=col)
@@ -54,22 +113,22 @@ def add_bollinger_bands_traces(fig, df, window=20, row=1, col=1):
 #     df['tenkan_sen'], df['kijun_sen'], df['senkou_span_a'], df['senkou_span_b'], df['chikou_span'] = tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b, chikou_span
 #     return df
 
-def calculate_ichimoku(df_orig, tenkan_period=9, kijun_period=26, senkou_b_period=52, chikou_period=26, senkou_shift=26):
-    df = df_orig.copy()
-    high, low, close = df['High'], df['Low'], df['Close']
-
-    tenkan_sen = (high.rolling(window=tenkan_period).max() + low.rolling(window=tenkan_period).min()) / 2
-    kijun_sen = (high.rolling(window=kijun_period).max() + low.rolling(window=kijun_period).min()) / 2
+def ichimoku_columns(ctx, tenkan_period=9, kijun_period=26, senkou_b_period=52, chikou_period=26, senkou_shift=26):
+    tenkan_sen = (ctx.rolling_max('High', tenkan_period) + ctx.rolling_min('Low', tenkan_period)) / 2
+    kijun_sen = (ctx.rolling_max('High', kijun_period) + ctx.rolling_min('Low', kijun_period)) / 2
 
     # 先行スパンA: 26期間未来へシフト
     senkou_span_a = ((tenkan_sen + kijun_sen) / 2).shift(senkou_shift)
     # 先行スパンB: 26期間未来へシフト
-    senkou_span_b = ((high.rolling(window=senkou_b_period).max() + low.rolling(window=senkou_b_period).min()) / 2).shift(senkou_shift)
+    senkou_span_b = ((ctx.rolling_max('High', senkou_b_period) + ctx.rolling_min('Low', senkou_b_period)) / 2).shift(senkou_shift)
     # 遅行スパン: 26期間過去へシフト
-    chikou_span = close.shift(-chikou_period)
+    chikou_span = ctx.shift('Close', -chikou_period)
 
-    df['tenkan_sen'], df['kijun_sen'], df['senkou_span_a'], df['senkou_span_b'], df['chikou_span'] = tenkan_sen, kijun_sen, senkou_span_a, senkou_span_b, chikou_span
-    return df
+    return {'tenkan_sen': tenkan_sen, 'kijun_sen': kijun_sen, 'senkou_span_a': senkou_span_a, 'senkou_span_b': senkou_span_b, 'chikou_span': chikou_span}
+
+def calculate_ichimoku(df_orig, tenkan_period=9, kijun_period=26, senkou_b_period=52, chikou_period=26, senkou_shift=26):
+    return assign_columns(df_orig, ichimoku_columns, tenkan_period=tenkan_period, kijun_period=kijun_period,
+                          senkou_b_period=senkou_b_period, chikou_period=chikou_period, senkou_shift=senkou_shift)
 
 def add_ichimoku_traces(fig, df, row=1, col=1):
     add_line_trace(fig, df, 'tenkan_sen', '転換線', color='blue', width=1, row=row, col=col)
@@ -79,14 +138,13 @@ def add_ichimoku_traces(fig, df, row=1, col=1):
     fig.add_trace(go.Scatter(x=df.index, y=df['senkou_span_b'], line_color='rgba(0,0,0,0)', name='雲 (Kumo)', fill='tonexty', fillcolor='rgba(230, 230, 250, 0.4)', showlegend=True, hoverinfo='skip'), row=row, col=col)
 
 # --- MACD (既存 + 統合) ---
+def macd_columns(ctx, fast_period=12, slow_period=26, signal_period=9):
+    macd_line = ctx.ewm_mean('Close', span=fast_period) - ctx.ewm_mean('Close', span=slow_period)
+    macd_signal = macd_line.ewm(span=signal_period, adjust=False).mean()
+    return {'MACD_Line': macd_line, 'MACD_Signal': macd_signal, 'MACD_Hist': macd_line - macd_signal}
+
 def calculate_macd(df_orig, fast_period=12, slow_period=26, signal_period=9):
-    df = df_orig.copy()
-    ema_fast = df['Close'].ewm(span=fast_period, adjust=False).mean()
-    ema_slow = df['Close'].ewm(span=slow_period, adjust=False).mean()
-    df['MACD_Line'] = ema_fast - ema_slow
-    df['MACD_Signal'] = df['MACD_Line'].ewm(span=signal_period, adjust=False).mean()
-    df['MACD_Hist'] = df['MACD_Line'] - df['MACD_Signal']
-    return df
+    return assign_columns(df_orig, macd_columns, fast_period=fast_period, slow_period=slow_period, signal_period=signal_period)
 
 def add_macd_traces(fig, df, row=2, col=1, **params):
     add_line_trace(fig, df, 'MACD_Line', 'MACD', color='blue', row=row, col=col)
@@ -95,64 +153,42 @@ def add_macd_traces(fig, df, row=2, col=1, **params):
     fig.add_trace(go.Bar(x=df.index, y=df['MACD_Hist'], name='Histogram', marker_color=colors, opacity=0.6), row=row, col=col)
 
 # --- Parabolic SAR ---
+def parabolic_sar_columns(ctx, initial_af=0.02, af_increment=0.02, max_af=0.2):
+    high = ctx.column('High')
+    sar, trend, af = kernels.parabolic_sar(high.to_numpy(dtype=float), ctx.column('Low').to_numpy(dtype=float), initial_af, af_increment, max_af)
+    return {'psar': wrap_like(high, sar), 'psar_trend': wrap_like(high, trend), 'psar_af': wrap_like(high, af)} # psar_trend: 1=上昇トレンド, -1=下降トレンド
+
 def calculate_parabolic_sar(df_orig, initial_af=0.02, af_increment=0.02, max_af=0.2):
-    df = df_orig.copy()
-    high, low = df['High'], df['Low']
-    length = len(df)
-    sar = pd.Series([np.nan] * length, index=df.index)
-    if length < 2: return df.assign(psar=sar)
-    trend = 1 # 1 for uptrend, -1 for downtrend
-    ep = high.iloc[0]
-    af = initial_af
-    sar.iloc[0] = low.iloc[0]
-
-    for i in range(1, length):
-        prev_sar, prev_ep, prev_af, prev_trend = sar.iloc[i-1], ep, af, trend
-        if prev_trend == 1:
-            current_sar = prev_sar + prev_af * (prev_ep - prev_sar)
-            if high.iloc[i] > prev_ep:
-                ep = high.iloc[i]
-                af = min(prev_af + af_increment, max_af)
-            if current_sar > low.iloc[i]: # Trend reversal
-                trend = -1; ep = low.iloc[i]; af = initial_af
-                sar.iloc[i] = max(prev_ep, high.iloc[i])
-            else: sar.iloc[i] = current_sar
-        else: # Downtrend
-            current_sar = prev_sar + prev_af * (prev_ep - prev_sar)
-            if low.iloc[i] < prev_ep:
-                ep = low.iloc[i]
-                af = min(prev_af + af_increment, max_af)
-            if current_sar < high.iloc[i]: # Trend reversal
-                trend = 1; ep = high.iloc[i]; af = initial_af
-                sar.iloc[i] = min(prev_ep, low.iloc[i])
-            else: sar.iloc[i] = current_sar
-    df['psar'] = sar
-    return df
+    return assign_columns(df_orig, parabolic_sar_columns, initial_af=initial_af, af_increment=af_increment, max_af=max_af)
 
 def add_parabolic_sar_trace(fig, df, row=1, col=1, **params):
     fig.add_trace(go.Scatter(x=df.index, y=df['psar'], name='Parabolic SAR', mode='markers', marker=dict(color='black', size=3)), row=row, col=col)
 
 # --- Moving Average Envelope ---
+def ma_envelope_columns(ctx, window=20, percentage=0.025, ma_type='sma'):
+    if ma_type.lower() == 'sma': middle_band = ctx.rolling_mean('Close', window)
+    else: middle_band = ctx.ewm_mean('Close', span=window)
+    return {
+        f'envelope_upper_{window}': middle_band * (1 + percentage),
+        f'envelope_lower_{window}': middle_band * (1 - percentage),
+        f'envelope_mid_{window}': middle_band,
+    }
+
 def calculate_ma_envelope(df_orig, window=20, percentage=0.025, ma_type='sma'):
-    df = df_orig.copy()
-    if ma_type.lower() == 'sma': middle_band = df['Close'].rolling(window=window).mean()
-    else: middle_band = df['Close'].ewm(span=window, adjust=False).mean()
-    df[f'envelope_upper_{window}'] = middle_band * (1 + percentage)
-    df[f'envelope_lower_{window}'] = middle_band * (1 - percentage)
-    df[f'envelope_mid_{window}'] = middle_band
-    return df
+    return assign_columns(df_orig, ma_envelope_columns, window=window, percentage=percentage, ma_type=ma_type)
 
 def add_ma_envelope_traces(fig, df, window=20, row=1, col=1, **params):
     add_line_trace(fig, df, f'envelope_upper_{window}', f'Env Up({window}d, {params.get("percentage", 0.025):.1%})', color='fuchsia', width=1, dash='dot', row=row, col=col)
     add_line_trace(fig, df, f'envelope_lower_{window}', f'Env Low({window}d, {params.get("percentage", 0.025):.1%})', color='fuchsia', width=1, dash='dot', row=row, col=col)
 
 # --- Donchian Channel ---
+def donchian_channel_columns(ctx, window=20):
+    upper = ctx.rolling_max('High', window)
+    lower = ctx.rolling_min('Low', window)
+    return {f'donchian_upper_{window}': upper, f'donchian_lower_{window}': lower, f'donchian_mid_{window}': (upper + lower) / 2}
+
 def calculate_donchian_channel(df_orig, window=20):
-    df = df_orig.copy()
-    df[f'donchian_upper_{window}'] = df['High'].rolling(window=window).max()
-    df[f'donchian_lower_{window}'] = df['Low'].rolling(window=window).min()
-    df[f'donchian_mid_{window}'] = (df[f'donchian_upper_{window}'] + df[f'donchian_lower_{window}']) / 2
-    return df
+    return assign_columns(df_orig, donchian_channel_columns, window=window)
 
 def add_donchian_channel_traces(fig, df, window=20, row=1, col=1, **params):
     add_line_trace(fig, df, f'donchian_upper_{window}', f'Donchian Up({window})', color='darkturquoise', width=1, row=row, col=col)
@@ -160,22 +196,29 @@ def add_donchian_channel_traces(fig, df, window=20, row=1, col=1, **params):
     add_line_trace(fig, df, f'donchian_mid_{window}', f'Donchian Mid({window})', color='powderblue', width=1, dash='dash', row=row, col=col)
 
 # --- Keltner Channel ---
+def atr_columns(ctx, window=14):
+    return {f'atr_{window}': ctx.atr(window)}
+
 def calculate_atr(df_orig, window=14):
-    df = df_orig.copy()
-    high_low = df['High'] - df['Low']
-    high_close = np.abs(df['High'] - df['Close'].shift())
-    low_close = np.abs(df['Low'] - df['Close'].shift())
-    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-    df[f'atr_{window}'] = tr.ewm(alpha=1/window, adjust=False).mean()
-    return df
+    return assign_columns(df_orig, atr_columns, window=window)
+
+def keltner_channels_columns(ctx, ema_window=20, atr_window=10, atr_multiplier=2.0):
+    columns = {}
+    atr_col = f'atr_{atr_window}'
+    # 既に同じ期間のATR列があればそれを使い、なければATRも出力列に加える
+    if ctx.has_column(atr_col):
+        atr = ctx.column(atr_col)
+    else:
+        atr = ctx.atr(atr_window)
+        columns[atr_col] = atr
+    kc_mid = ctx.ewm_mean('Close', span=ema_window)
+    columns[f'kc_mid_{ema_window}'] = kc_mid
+    columns[f'kc_upper_{ema_window}'] = kc_mid + (atr * atr_multiplier)
+    columns[f'kc_lower_{ema_window}'] = kc_mid - (atr * atr_multiplier)
+    return columns
 
 def calculate_keltner_channels(df_orig, ema_window=20, atr_window=10, atr_multiplier=2.0):
-    df = df_orig.copy()
-    if f'atr_{atr_window}' not in df.columns: df = calculate_atr(df, window=atr_window)
-    df[f'kc_mid_{ema_window}'] = df['Close'].ewm(span=ema_window, adjust=False).mean()
-    df[f'kc_upper_{ema_window}'] = df[f'kc_mid_{ema_window}'] + (df[f'atr_{atr_window}'] * atr_multiplier)
-    df[f'kc_lower_{ema_window}'] = df[f'kc_mid_{ema_window}'] - (df[f'atr_{atr_window}'] * atr_multiplier)
-    return df
+    return assign_columns(df_orig, keltner_channels_columns, ema_window=ema_window, atr_window=atr_window, atr_multiplier=atr_multiplier)
 
 def add_keltner_channels_traces(fig, df, ema_window=20, row=1, col=1, **params):
     add_line_trace(fig, df, f'kc_upper_{ema_window}', f'KC Up({ema_window})', color='goldenrod', width=1, row=row, col=col)
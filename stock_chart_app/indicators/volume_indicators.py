@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from stock_chart_app.plot_utils import add_line_trace # 修正: stock_chart_app からインポート
+from stock_chart_app.indicators.context import assign_columns
 
 # --- Volume (既存) ---
 def add_volume_trace(fig, df, row=2, col=1, **params):
@@ -11,38 +12,42 @@ def add_volume_trace(fig, df, row=2, col=1, **params):
         fig.add_trace(go.Bar(x=df.index, y=df['Volume'], name='出来高', marker_color=colors, opacity=0.5), row=row, col=col)
 
 # --- Volume SMA (既存) ---
+def volume_sma_columns(ctx, window=20):
+    if not ctx.has_column('Volume'):
+        return {}
+    return {f'Volume_SMA_{window}': ctx.rolling_mean('Volume', window, min_periods=1)}
+
 def calculate_volume_sma(df_orig, window=20):
-    df = df_orig.copy()
-    if 'Volume' in df.columns:
-        df[f'Volume_SMA_{window}'] = df['Volume'].rolling(window=window, min_periods=1).mean()
-    return df
+    return assign_columns(df_orig, volume_sma_columns, window=window)
 
 def add_volume_sma_trace(fig, df, window=20, color='blue', row=2, col=1, **params):
     if f'Volume_SMA_{window}' in df.columns:
         add_line_trace(fig, df, f'Volume_SMA_{window}', f'出来高SMA({window})', color=color, width=1.5, row=row, col=col, opacity=0.8)
 
 # --- On-Balance Volume (OBV) ---
+def obv_columns(ctx):
+    price_change_sign = np.sign(ctx.diff('Close')).fillna(0)
+    return {'obv': (price_change_sign * ctx.column('Volume')).cumsum()}
+
 def calculate_obv(df_orig):
-    df = df_orig.copy()
-    price_change_sign = np.sign(df['Close'].diff()).fillna(0)
-    df['obv'] = (price_change_sign * df['Volume']).cumsum()
-    return df
+    return assign_columns(df_orig, obv_columns)
 
 def add_obv_trace(fig, df, row=2, col=1, **params):
     add_line_trace(fig, df, 'obv', 'OBV', color='blue', row=row, col=col)
 
 # --- Money Flow Index (MFI) ---
-def calculate_mfi(df_orig, window=14):
-    df = df_orig.copy()
-    typical_price = (df['High'] + df['Low'] + df['Close']) / 3
-    raw_money_flow = typical_price * df['Volume']
+def mfi_columns(ctx, window=14):
+    typical_price = ctx.typical_price()
+    raw_money_flow = typical_price * ctx.column('Volume')
     money_flow_direction = typical_price.diff()
     positive_money_flow = raw_money_flow.where(money_flow_direction > 0, 0).rolling(window=window).sum()
     negative_money_flow = raw_money_flow.where(money_flow_direction < 0, 0).rolling(window=window).sum()
     money_flow_ratio = positive_money_flow / negative_money_flow.replace(0, np.nan)
     mfi = 100 - (100 / (1 + money_flow_ratio))
-    df[f'mfi_{window}'] = mfi.replace([np.inf, -np.inf], 100).fillna(50)
-    return df
+    return {f'mfi_{window}': mfi.replace([np.inf, -np.inf], 100).fillna(50)}
+
+def calculate_mfi(df_orig, window=14):
+    return assign_columns(df_orig, mfi_columns, window=window)
 
 def add_mfi_trace(fig, df, window=14, row=2, col=1, **params):
     add_line_trace(fig, df, f'mfi_{window}', f'MFI({window})', color='green', row=row, col=col)
@@ -51,30 +56,33 @@ def add_mfi_trace(fig, df, window=14, row=2, col=1, **params):
     fig.update_yaxes(range=[0, 100], row=row, col=col)
 
 # --- Volume Weighted Average Price (VWAP) ---
-def calculate_vwap(df_orig, reset_daily=True):
-    df = df_orig.copy()
-    tp_vol = ((df['High'] + df['Low'] + df['Close']) / 3) * df['Volume']
-    vol = df['Volume']
-    if reset_daily and isinstance(df.index, pd.DatetimeIndex):
-        cum_tp_vol = tp_vol.groupby(df.index.date).cumsum()
-        cum_vol = vol.groupby(df.index.date).cumsum()
+def vwap_columns(ctx, reset_daily=True):
+    vol = ctx.column('Volume')
+    tp_vol = ctx.typical_price() * vol
+    if reset_daily and isinstance(ctx.index, pd.DatetimeIndex):
+        cum_tp_vol = tp_vol.groupby(ctx.index.date).cumsum()
+        cum_vol = vol.groupby(ctx.index.date).cumsum()
     else:
         cum_tp_vol = tp_vol.cumsum()
         cum_vol = vol.cumsum()
-    df['vwap'] = (cum_tp_vol / cum_vol.replace(0, np.nan)).fillna(method='ffill')
-    return df
+    return {'vwap': (cum_tp_vol / cum_vol.replace(0, np.nan)).ffill()}
+
+def calculate_vwap(df_orig, reset_daily=True):
+    return assign_columns(df_orig, vwap_columns, reset_daily=reset_daily)
 
 def add_vwap_trace(fig, df, row=1, col=1, **params):
     add_line_trace(fig, df, 'vwap', 'VWAP', color='magenta', width=1.5, dash='longdash', row=row, col=col)
 
 # --- Chaikin Money Flow (CMF) ---
+def cmf_columns(ctx, window=20):
+    high, low, close, volume = ctx.column('High'), ctx.column('Low'), ctx.column('Close'), ctx.column('Volume')
+    mf_multiplier = ((close - low) - (high - close)) / ctx.price_range().replace(0, np.nan)
+    mf_volume = mf_multiplier.fillna(0) * volume
+    cmf = mf_volume.rolling(window=window).sum() / volume.rolling(window=window).sum().replace(0, np.nan)
+    return {f'cmf_{window}': cmf.fillna(0)}
+
 def calculate_cmf(df_orig, window=20):
-    df = df_orig.copy()
-    mf_multiplier = ((df['Close'] - df['Low']) - (df['High'] - df['Close'])) / (df['High'] - df['Low']).replace(0, np.nan)
-    mf_volume = mf_multiplier.fillna(0) * df['Volume']
-    cmf = mf_volume.rolling(window=window).sum() / df['Volume'].rolling(window=window).sum().replace(0, np.nan)
-    df[f'cmf_{window}'] = cmf.fillna(0)
-    return df
+    return assign_columns(df_orig, cmf_columns, window=window)
 
 def add_cmf_trace(fig, df, window=20, row=2, col=1, **params):
     add_line_trace(fig, df, f'cmf_{window}', f'CMF({window})', color='blueviolet', row=row, col=col)
@@ -82,13 +90,14 @@ def add_cmf_trace(fig, df, window=20, row=2, col=1, **params):
     fig.update_yaxes(range=[-1, 1], row=row, col=col)
 
 # --- Ease of Movement (EOM) ---
-def calculate_eom(df_orig, window=14, divisor=100000000.0):
-    df = df_orig.copy()
-    mid_point_move = ((df['High'] + df['Low']) / 2).diff(1)
-    box_ratio = (df['Volume'] / divisor) / (df['High'] - df['Low']).replace(0, np.nan)
+def eom_columns(ctx, window=14, divisor=100000000.0):
+    mid_point_move = ((ctx.column('High') + ctx.column('Low')) / 2).diff(1)
+    box_ratio = (ctx.column('Volume') / divisor) / ctx.price_range().replace(0, np.nan)
     one_period_eom = mid_point_move / box_ratio.replace(0, np.nan)
-    df[f'eom_{window}'] = one_period_eom.rolling(window=window).mean().fillna(0)
-    return df
+    return {f'eom_{window}': one_period_eom.rolling(window=window).mean().fillna(0)}
+
+def calculate_eom(df_orig, window=14, divisor=100000000.0):
+    return assign_columns(df_orig, eom_columns, window=window, divisor=divisor)
 
 def add_eom_trace(fig, df, window=14, row=2, col=1, **params):
     add_line_trace(fig, df, f'eom_{window}', f'EOM({window})', color='brown', row=row, col=col)
@@ -0,0 +1,382 @@
+# stock_chart_app/screener.py
+# 銘柄ユニバース全体のテクニカルスクリーニング用バックエンド。
+#
+# 1. 価格データ: 全銘柄の日足を yfinance の一括ダウンロード (複数銘柄を1リクエスト) で取得し、
+#    パネル (項目名 -> 行=日付、列=銘柄コードのDataFrame) としてディスクに保存します。
+#    2回目以降は直近の数日分だけを再取得して差分を反映します (分割・配当で過去の価格が調整された銘柄は全期間を取り直します)。
+# 2. 指標スナップショット: 既存の指標関数 (*_columns) をパネル全体に適用し、各銘柄の最新値を
+#    1行にまとめた表 (行=銘柄コード) を作って保存します。価格が変わった銘柄だけを再計算します。
+# 3. 検索: 条件による絞り込み・並べ替え・ページ分割はスナップショット表に対するメモリ上の操作だけで行います。
+import datetime
+import logging
+import os
+import pickle
+import re
+
+import numpy as np
+import pandas as pd
+
+import data_sources
+from stock_chart_app.indicators import trend_indicators, oscillator_indicators, volume_indicators, panel
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+    logging.getLogger(__name__).warning("yfinance がインストールされていないため、スクリーナーの価格データ更新は利用できません。")
+
+logger = logging.getLogger(__name__)
+
+PRICE_CACHE_FILENAME = "price_panel.pkl"
+SNAPSHOT_CACHE_FILENAME = "snapshots.pkl"
+
+# スナップショットに含める指標: (キー, モジュール, *_columns 関数名, パラメータ)
+SNAPSHOT_INDICATORS = [
+    ('sma_multi', trend_indicators, 'sma_multi_columns', {'windows': '5,25,75,200'}),
+    ('bollinger', trend_indicators, 'bollinger_bands_columns', {'window': 20}),
+    ('macd', trend_indicators, 'macd_columns', {}),
+    ('rsi', oscillator_indicators, 'rsi_columns', {'window': 14}),
+    ('stochastics', oscillator_indicators, 'stochastics_columns', {}),
+    ('rci', oscillator_indicators, 'rci_columns', {'window': 9}),
+    ('dmi_adx', oscillator_indicators, 'dmi_adx_columns', {'window': 14}),
+    ('ma_dev_rate', oscillator_indicators, 'ma_deviation_rate_columns', {'window': 25}),
+    ('volume_sma', volume_indicators, 'volume_sma_columns', {'window': 20}),
+]
+
+# 画面に表示する列名 (スナップショットの列名 -> 表示名)。ここにない列は列名のまま表示する
+SNAPSHOT_COLUMN_LABELS = {
+    'Close': '終値', 'Change_Pct': '前日比(%)', 'Volume': '出来高', 'Volume_Ratio': '出来高倍率(20日)',
+    'SMA_5': 'SMA(5)', 'SMA_25': 'SMA(25)', 'SMA_75': 'SMA(75)', 'SMA_200': 'SMA(200)',
+    'RSI_14': 'RSI(14)', 'RCI_9': 'RCI(9)', 'MACD_Line': 'MACD', 'MACD_Signal': 'MACDシグナル', 'MACD_Hist': 'MACDヒストグラム',
+    'BB_PctB_20': 'ボリンジャー%B(20)', 'adx_14': 'ADX(14)', 'plus_di_14': '+DI(14)', 'minus_di_14': '-DI(14)',
+    'ma_dev_rate_25': '25日乖離率(%)', 'High_52w_Ratio': '52週高値比(%)',
+}
+
+# よく使う条件のプリセット (表示名 -> 条件のリスト)。条件は (左辺の列, 演算子, 右辺の数値または列名)
+PRESET_CONDITIONS = {
+    "RSI(14) < 30 (売られすぎ)": [('RSI_14', '<', 30)],
+    "RSI(14) > 70 (買われすぎ)": [('RSI_14', '>', 70)],
+    "終値 > SMA(200) (長期上昇トレンド)": [('Close', '>', 'SMA_200')],
+    "SMA(25) > SMA(75) (中期上昇トレンド)": [('SMA_25', '>', 'SMA_75')],
+    "MACD > シグナル": [('MACD_Line', '>', 'MACD_Signal')],
+    "ボリンジャー%B < 0 (-2σ割れ)": [('BB_PctB_20', '<', 0)],
+    "出来高倍率 >= 2 (出来高急増)": [('Volume_Ratio', '>=', 2)],
+    "ADX(14) >= 25 (トレンド発生)": [('adx_14', '>=', 25)],
+    "RCI(9) <= -80 (底値圏)": [('RCI_9', '<=', -80)],
+}
+
+_OPERATORS = {
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal, '==': np.equal, '!=': np.not_equal,
+}
+
+
+def to_yfinance_symbol(stock_code: str) -> str:
+    """東証の銘柄コード (例: 7203, 130A) を yfinance のティッカー (例: 7203.T) に変換します。"""
+    code = str(stock_code).strip().upper()
+    if re.fullmatch(r"[0-9]{4}|[1-9][0-9]{2}[A-Z]|[1-9][A-Z][0-9]{2}|[1-9][A-Z][0-9][A-Z]", code):
+        return f"{code}.T"
+    return code
+
+
+def get_cache_dir(base_dir: str) -> str | None:
+    """キャッシュディレクトリを用意してパスを返します。作成できない場合は None を返します。"""
+    if not os.path.exists(base_dir):
+        try:
+            os.makedirs(base_dir)
+        except OSError as e:
+            logger.error(f"スクリーナーのキャッシュディレクトリの作成に失敗: {base_dir}, エラー: {e}")
+            return None
+    return base_dir
+
+
+def _load_pickle(path: str):
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+        logger.error(f"スクリーナーのキャッシュ読み込みに失敗: {path}, エラー: {e}")
+        return None
+
+
+def _save_pickle(path: str, obj):
+    # 書き込み途中のファイルを読まないよう、一時ファイルに書いてから置き換える
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"スクリーナーのキャッシュ保存に失敗: {path}, エラー: {e}")
+
+
+def load_price_cache(cache_dir: str) -> dict | None:
+    """保存済みの価格パネル ({'panel': ..., 'updated_at': ...}) を読み込みます。"""
+    return _load_pickle(os.path.join(cache_dir, PRICE_CACHE_FILENAME)) if cache_dir else None
+
+
+def load_snapshot_cache(cache_dir: str) -> dict | None:
+    """保存済みのスナップショット ({'snapshot': DataFrame, 'updated_at': ...}) を読み込みます。"""
+    return _load_pickle(os.path.join(cache_dir, SNAPSHOT_CACHE_FILENAME)) if cache_dir else None
+
+
+# --- 価格データの取得 ---
+def download_price_chunk(codes: list, start: datetime.date, end: datetime.date) -> dict:
+    """
+    複数銘柄の日足を yfinance で1回のリクエストにまとめて取得し、列=銘柄コードのパネルで返します。
+    データが取れなかった銘柄は列ごと含まれません。
+    """
+    symbols = {to_yfinance_symbol(code): code for code in codes}
+
+    def _live():
+        if yf is None:
+            raise RuntimeError("yfinance がインストールされていません。")
+        return yf.download(list(symbols), start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"),
+                           auto_adjust=True, group_by='column', threads=True, progress=False)
+
+    request = {"symbols": list(symbols), "start": start.isoformat(), "end": end.isoformat()}
+    data = data_sources.call("yfinance", "download", request, _live)
+    if data is None or data.empty:
+        return {}
+    if not isinstance(data.columns, pd.MultiIndex):
+        # 1銘柄だけの場合は列が単一階層になるため (項目名, 銘柄) の形にそろえる
+        data.columns = pd.MultiIndex.from_product([data.columns, list(symbols)[:1]])
+    chunk_panel = panel.to_panel(data)
+    chunk_panel = {field: frame.rename(columns=symbols).dropna(axis=1, how='all') for field, frame in chunk_panel.items()}
+    if getattr(chunk_panel['Close'].index, 'tz', None) is not None:
+        chunk_panel = {field: frame.tz_localize(None) for field, frame in chunk_panel.items()}
+    return chunk_panel
+
+
+def _download_in_chunks(codes, start, end, chunk_size, downloader, progress_callback=None, progress_offset=0, progress_total=None):
+    """銘柄をチャンクに分けてダウンロードし、1つのパネルにまとめる。失敗したチャンクはログに残して続行する。"""
+    frames = {}
+    progress_total = progress_total or len(codes)
+    for start_idx in range(0, len(codes), chunk_size):
+        chunk = codes[start_idx:start_idx + chunk_size]
+        try:
+            chunk_panel = downloader(chunk, start, end)
+        except Exception as e:
+            logger.error(f"スクリーナー: {len(chunk)}銘柄の一括ダウンロードに失敗 ({chunk[0]}...): {e}", exc_info=True)
+            chunk_panel = {}
+        for field, frame in chunk_panel.items():
+            frames.setdefault(field, []).append(frame)
+        if progress_callback:
+            progress_callback(progress_offset + start_idx + len(chunk), progress_total)
+    return {field: pd.concat(parts, axis=1) for field, parts in frames.items()}
+
+
+def _concat_panels(a: dict, b: dict) -> dict:
+    """2つのパネル (銘柄が重ならないもの) を列方向につなげる。"""
+    return {field: pd.concat([a[field], b[field]], axis=1) if field in a and field in b else a.get(field, b.get(field))
+            for field in set(a) | set(b)}
+
+
+def _merge_panels(old_panel: dict | None, new_panel: dict, keep_since: pd.Timestamp) -> dict:
+    """新しく取得したデータで既存パネルを上書き・追加し、keep_since より古い行を落とす。"""
+    if not old_panel:
+        merged = new_panel
+    else:
+        fields = [field for field in panel.OHLCV_FIELDS if field in old_panel or field in new_panel]
+        merged = {}
+        for field in fields:
+            old, new = old_panel.get(field), new_panel.get(field)
+            if old is None or new is None:
+                merged[field] = old if new is None else new
+                continue
+            # 再取得した期間・銘柄は新しい値を正とする (combine_first と同じ結果を配列演算で求める)
+            index, columns = old.index.union(new.index), old.columns.union(new.columns, sort=False)
+            old_values = old.reindex(index=index, columns=columns).to_numpy(dtype=float)
+            new_values = new.reindex(index=index, columns=columns).to_numpy(dtype=float)
+            merged[field] = pd.DataFrame(np.where(np.isnan(new_values), old_values, new_values), index=index, columns=columns)
+    return {field: frame.loc[frame.index >= keep_since].sort_index() for field, frame in merged.items()}
+
+
+def _changed_codes(old_panel: dict | None, new_panel: dict) -> list:
+    """既存パネルと比べて、価格 (OHLCV) が追加・変更された銘柄コードを返す。"""
+    codes = new_panel['Close'].columns if new_panel else pd.Index([])
+    if not old_panel:
+        return list(codes)
+    changed = ~codes.isin(old_panel['Close'].columns)
+    for field, new in new_panel.items():
+        if field not in old_panel:
+            continue
+        new_values = new.reindex(columns=codes).to_numpy(dtype=float)
+        old_values = old_panel[field].reindex(index=new.index, columns=codes).to_numpy(dtype=float)
+        # 再取得した値があり、かつ保存済みの値と異なる (保存済みが欠損の場合も含む) セルを持つ銘柄
+        differs = ~np.isnan(new_values) & ~(new_values == old_values)
+        changed |= differs.any(axis=0)
+    return list(codes[changed])
+
+
+def _adjusted_codes(old_panel: dict | None, new_panel: dict, settled_before: datetime.date, tolerance: float) -> list:
+    """
+    再取得した確定済みの足の終値が、保存済みの値から tolerance を超える比率で変わった銘柄コードを返します。
+    auto_adjust=True の価格は分割や配当のたびに過去分も遡って調整されるため、これらの銘柄は履歴全体を取り直す必要があります
+    (ohlcv_store._adjustment_detected と同じ判定)。
+    """
+    if not old_panel or 'Close' not in new_panel:
+        return []
+    new_close = new_panel['Close']
+    new_close = new_close.loc[new_close.index < pd.Timestamp(settled_before)]
+    codes = new_close.columns.intersection(old_panel['Close'].columns)
+    new_values = new_close.reindex(columns=codes).to_numpy(dtype=float)
+    old_values = old_panel['Close'].reindex(index=new_close.index, columns=codes).to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rel_diff = np.abs(new_values - old_values) / np.abs(old_values)
+    return list(codes[(rel_diff > tolerance).any(axis=0)])  # どちらかが欠損のセルは比較しない (NaN > tolerance は False)
+
+
+def refresh_price_cache(codes: list, cache_dir: str, history_days: int = 400, chunk_size: int = 100,
+                        overlap_days: int = 7, refresh_interval_hours: float = 6, force: bool = False,
+                        downloader=None, progress_callback=None, adjustment_tolerance: float = 1e-4) -> tuple[dict, list]:
+    """
+    価格パネルを差分更新し、(価格キャッシュ, 価格が変わった銘柄コードのリスト) を返します。
+    - キャッシュにない銘柄: history_days 日分を取得
+    - キャッシュにある銘柄: 銘柄ごとの最終日 (値がある最後の日) の overlap_days 日前から取得して上書き。
+      再取得した確定済みの終値が adjustment_tolerance を超えて変わっていた銘柄 (分割・配当の調整) は history_days 日分を取り直す
+    refresh_interval_hours 以内に更新済みで、新しい銘柄もなければ再取得しません (force=True で強制)。
+    """
+    downloader = downloader or download_price_chunk
+    today = datetime.date.today()
+    keep_since = pd.Timestamp(today - datetime.timedelta(days=history_days))
+    cache = load_price_cache(cache_dir) or {}
+    old_panel = cache.get('panel')
+
+    cached_codes = set(old_panel['Close'].columns) if old_panel else set()
+    requested_codes = cache.get('requested_codes', set())
+    updated_at = cache.get('updated_at')
+    is_fresh = updated_at is not None and datetime.datetime.now() - updated_at < datetime.timedelta(hours=refresh_interval_hours)
+    # 前回取得を試みてデータがなかった銘柄 (上場廃止など) は、鮮度切れか強制更新のときだけ再試行する
+    new_codes = [code for code in codes if code not in cached_codes and (code not in requested_codes or not is_fresh or force)]
+    existing_codes = [code for code in codes if code in cached_codes]
+
+    if is_fresh and not new_codes and not force:
+        logger.info(f"スクリーナー: 価格キャッシュは {updated_at:%Y-%m-%d %H:%M} に更新済みのため再取得しません。")
+        return cache, []
+
+    end = today + datetime.timedelta(days=1)  # yfinance の end は指定日を含まない
+    total = len(new_codes) + (len(existing_codes) if not is_fresh or force else 0)
+    fetched = _download_in_chunks(new_codes, keep_since.date(), end, chunk_size, downloader, progress_callback, 0, total) if new_codes else {}
+    if existing_codes and (not is_fresh or force):
+        # 取得に失敗し続けた銘柄の欠けた期間も取り直せるよう、パネル全体ではなく銘柄ごとの最終日から取得する
+        # (同じ日から取得する銘柄をまとめて一括ダウンロードする)
+        last_valid = old_panel['Close'].reindex(columns=existing_codes).apply(pd.Series.last_valid_index)
+        codes_by_since = {}
+        for code, last_date in last_valid.items():
+            since = keep_since.date() if pd.isna(last_date) else (last_date - pd.Timedelta(days=overlap_days)).date()
+            codes_by_since.setdefault(max(since, keep_since.date()), []).append(code)
+        progress_offset = len(new_codes)
+        for since, since_codes in sorted(codes_by_since.items()):
+            recent = _download_in_chunks(since_codes, since, end, chunk_size, downloader, progress_callback, progress_offset, total)
+            fetched = _concat_panels(fetched, recent)
+            progress_offset += len(since_codes)
+
+        # 分割・配当で過去の価格が調整し直された銘柄は、重なった期間だけを上書きすると調整前と調整後の価格が混ざるため、
+        # 保存済みの履歴を捨てて全期間を取り直す (取り直せなかった銘柄は、今回の差分を使わず保存済みの履歴のままにする)
+        adjusted = _adjusted_codes(old_panel, fetched, today, adjustment_tolerance)
+        if adjusted:
+            logger.info(f"スクリーナー: 過去の価格が調整された {len(adjusted)} 銘柄の履歴を取り直します ({adjusted[:5]}...)。")
+            full = _download_in_chunks(adjusted, keep_since.date(), end, chunk_size, downloader)
+            refetched = list(full['Close'].columns) if 'Close' in full else []
+            fetched = _concat_panels({field: frame.drop(columns=adjusted, errors='ignore') for field, frame in fetched.items()}, full)
+            old_panel = {field: frame.drop(columns=refetched, errors='ignore') for field, frame in old_panel.items()}
+    logger.info(f"スクリーナー: 新規 {len(new_codes)} 銘柄、差分 {len(existing_codes)} 銘柄を取得しました。")
+
+    requested_codes = requested_codes | set(new_codes) | set(existing_codes)
+    if not fetched or 'Close' not in fetched:
+        cache = {**cache, 'requested_codes': requested_codes}
+        _save_pickle(os.path.join(cache_dir, PRICE_CACHE_FILENAME), cache)
+        return cache, []
+    changed = _changed_codes(old_panel, fetched)
+    cache = {'panel': _merge_panels(old_panel, fetched, keep_since), 'updated_at': datetime.datetime.now(), 'requested_codes': requested_codes}
+    _save_pickle(os.path.join(cache_dir, PRICE_CACHE_FILENAME), cache)
+    return cache, changed
+
+
+# --- 指標スナップショット ---
+def compute_snapshots(price_panel: dict, codes: list | None = None) -> pd.DataFrame:
+    """
+    パネル (の codes の銘柄) にスナップショット用の指標を適用し、各銘柄の最新値を行=銘柄コードの表で返します。
+    """
+    price_panel = panel.to_panel(price_panel)  # 項目ごとの行・列を終値にそろえる
+    if codes is not None:
+        price_panel = {field: frame.reindex(columns=codes) for field, frame in price_panel.items()}
+    resolved = [(key, {'module': module, 'columns_func': columns_func}, params) for key, module, columns_func, params in SNAPSHOT_INDICATORS]
+    columns = panel.compute_panel_columns(price_panel, resolved)
+
+    close = price_panel['Close']
+    # 派生指標: 前日比、出来高倍率、ボリンジャー%B、52週高値比
+    columns['Change_Pct'] = close.pct_change(fill_method=None) * 100
+    if 'Volume_SMA_20' in columns:
+        columns['Volume_Ratio'] = price_panel['Volume'] / columns['Volume_SMA_20'].replace(0, np.nan)
+    band_width = columns['BB_Upper_2std_20'] - columns['BB_Lower_2std_20']
+    columns['BB_PctB_20'] = (close - columns['BB_Lower_2std_20']) / band_width.replace(0, np.nan)
+    columns['High_52w_Ratio'] = close / price_panel['High'].rolling(window=250, min_periods=1).max() * 100
+
+    return panel.latest_snapshot(price_panel, columns, fields=('Close', 'Volume'))
+
+
+def refresh_snapshots(price_cache: dict, changed_codes: list, cache_dir: str, codes: list | None = None) -> dict:
+    """
+    価格が変わった銘柄 (と、まだスナップショットがない銘柄) だけ指標を再計算し、保存済みの表を更新します。
+    返り値は {'snapshot': DataFrame, 'updated_at': datetime}。
+    """
+    cache = load_snapshot_cache(cache_dir) or {}
+    snapshot = cache.get('snapshot')
+    price_panel = price_cache.get('panel') if price_cache else None
+    if not price_panel:
+        return cache
+
+    available = list(price_panel['Close'].columns)
+    target_codes = available if codes is None else [code for code in codes if code in set(available)]
+    missing = [code for code in target_codes if snapshot is None or code not in snapshot.index]
+    to_compute = list(dict.fromkeys([code for code in changed_codes if code in set(target_codes)] + missing))
+    if to_compute:
+        updated_rows = compute_snapshots(price_panel, to_compute)
+        snapshot = updated_rows if snapshot is None else pd.concat([snapshot.drop(index=to_compute, errors='ignore'), updated_rows])
+        cache = {'snapshot': snapshot, 'updated_at': datetime.datetime.now()}
+        _save_pickle(os.path.join(cache_dir, SNAPSHOT_CACHE_FILENAME), cache)
+    logger.info(f"スクリーナー: {len(to_compute)} 銘柄のスナップショットを再計算しました (対象 {len(target_codes)} 銘柄)。")
+    return cache
+
+
+def refresh_universe(codes: list, cache_dir: str, force: bool = False, downloader=None, progress_callback=None, **price_options) -> dict:
+    """価格キャッシュの差分更新と、変更された銘柄のスナップショット再計算をまとめて行います。"""
+    price_cache, changed = refresh_price_cache(codes, cache_dir, force=force, downloader=downloader,
+                                               progress_callback=progress_callback, **price_options)
+    return refresh_snapshots(price_cache, changed, cache_dir, codes)
+
+
+# --- 検索 (メモリ上の絞り込み・並べ替え・ページ分割) ---
+def apply_conditions(snapshot: pd.DataFrame, conditions: list) -> pd.DataFrame:
+    """
+    条件 (左辺の列, 演算子, 右辺の数値または列名) をすべて満たす行を返します。
+    値が欠損している銘柄は条件を満たさないものとして扱います。
+    """
+    mask = np.ones(len(snapshot), dtype=bool)
+    for left, operator, right in conditions:
+        if left not in snapshot.columns or operator not in _OPERATORS:
+            logger.warning(f"スクリーナー: 無効な条件をスキップしました: {left} {operator} {right}")
+            continue
+        left_values = snapshot[left].to_numpy(dtype=float)
+        if isinstance(right, str):
+            if right not in snapshot.columns:
+                logger.warning(f"スクリーナー: 比較対象の列がありません: {right}")
+                continue
+            right_values = snapshot[right].to_numpy(dtype=float)
+        else:
+            right_values = float(right)
+        with np.errstate(invalid='ignore'):
+            mask &= _OPERATORS[operator](left_values, right_values)
+    return snapshot[mask]
+
+
+def sort_and_paginate(df: pd.DataFrame, sort_by: str | None, ascending: bool, page: int, page_size: int) -> tuple[pd.DataFrame, int]:
+    """並べ替えてから指定ページ (1始まり) の行を返します。返り値は (ページの表, 総ページ数)。"""
+    if sort_by and sort_by in df.columns:
+        df = df.sort_values(sort_by, ascending=ascending, na_position='last', kind='stable')
+    total_pages = max(1, -(-len(df) // page_size))
+    page = min(max(page, 1), total_pages)
+    return df.iloc[(page - 1) * page_size:page * page_size], total_pages
@@ -101,7 +101,7 @@ def render_page(sm, fm, akm, active_model_global):
 
         with cols_date_interval_display[1]:
             # カスタムの足種選択UI
-            interval_options_custom = {"1d": "日足", "1wk": "週足", "1mo": "月足"}
+            interval_options_custom = {"1d": "日足", "1wk": "週足", "1mo": "月足", "3mo": "四半期足"}
             current_interval_val_custom = sm.get_value("tech_analysis.interval_custom", "1d")
             interval_selected_key_custom = st.selectbox(
                 "足種", options=list(interval_options_custom.keys()),
@@ -162,8 +162,8 @@ def render_page(sm, fm, akm, active_model_global):
 
     # カテゴリと順番の定義
     indicator_order = {
-        "トレンド系指標": ['sma', 'ema', 'bollinger', 'ichimoku', 'psar', 'ma_envelope', 'donchian', 'keltner', 'vwap', 'pivot'],
-        "オシレーター系指標": ['macd', 'rsi', 'stochastics', 'rci', 'dmi_adx', 'williams_r', 'aroon', 'ma_dev_rate', 'psy_line', 'coppock', 'force_index', 'mass_index'],
+        "トレンド系指標": ['sma', 'ema', 'sma_multi', 'ema_multi', 'wma', 'hma', 'bollinger', 'ichimoku', 'psar', 'ma_envelope', 'donchian', 'keltner', 'vwap', 'pivot'],
+        "オシレーター系指標": ['macd', 'rsi', 'stochastics', 'rci', 'rci_multi', 'dmi_adx', 'williams_r', 'aroon', 'ma_dev_rate', 'psy_line', 'coppock', 'force_index', 'mass_index'],
         "出来高系指標": ['volume', 'volume_sma', 'obv', 'mfi', 'cmf', 'eom'],
         "その他（ボラティリティ等）": ['std_dev', 'atr']
     }
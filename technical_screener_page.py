@@ -0,0 +1,207 @@
+# technical_screener_page.py
+import streamlit as st
+import pandas as pd
+import datetime
+import logging
+
+import config as app_config
+
+try:
+    from stock_chart_app import screener
+except ImportError as e:
+    screener = None
+    logging.getLogger(__name__).error(f"technical_screener_page.py: Failed to import stock_chart_app.screener: {e}", exc_info=True)
+
+logger = logging.getLogger(__name__)
+
+# --- StateManagerで使用するキー ---
+KEY_SNAPSHOT_CACHE = "screener.snapshot_cache"
+KEY_PRESET_CONDITIONS = "screener.preset_conditions"
+KEY_CUSTOM_CONDITION_COUNT = "screener.custom_condition_count"
+KEY_SORT_BY = "screener.sort_by"
+KEY_SORT_ASCENDING = "screener.sort_ascending"
+KEY_PAGE_SIZE = "screener.page_size"
+KEY_PAGE = "screener.page"
+KEY_QUERY_SIGNATURE = "screener.query_signature"
+
+_OPERATOR_OPTIONS = ['<', '<=', '>', '>=']
+_VALUE_OPTION = "(数値)"
+
+
+def _get_cache_dir():
+    cfg = app_config.SCREENER_CONFIG
+    base_dir = cfg["cache_dir_cloud_run"] if app_config.IS_CLOUD_RUN else cfg["cache_dir_colab"]
+    return screener.get_cache_dir(base_dir)
+
+
+def _column_label(column: str) -> str:
+    return screener.SNAPSHOT_COLUMN_LABELS.get(column, column)
+
+
+def _render_refresh_section(sm, codes: list, cache_dir: str, snapshot_cache: dict):
+    """価格データとスナップショットの更新ボタンと、現在のキャッシュ状況を表示する。"""
+    cfg = app_config.SCREENER_CONFIG
+    snapshot = snapshot_cache.get('snapshot')
+    updated_at = snapshot_cache.get('updated_at')
+    status_cols = st.columns(3)
+    status_cols[0].metric("対象銘柄数", f"{len(codes):,}")
+    status_cols[1].metric("スナップショット済み", f"{0 if snapshot is None else len(snapshot):,}")
+    status_cols[2].metric("最終更新", updated_at.strftime("%m/%d %H:%M") if isinstance(updated_at, datetime.datetime) else "未取得")
+
+    force_refresh = st.checkbox(
+        f"直近 {cfg['refresh_interval_hours']} 時間以内に更新済みでも再取得する", value=False, key="screener_force_refresh_cb",
+        help="通常は前回の更新から一定時間が経過している場合だけ、直近の数日分を再取得します。"
+    )
+    if st.button("価格データと指標スナップショットを更新", type="primary", key="screener_refresh_button", use_container_width=True):
+        progress_bar = st.progress(0.0, text="価格データを取得しています...")
+
+        def on_progress(done, total):
+            progress_bar.progress(min(done / max(total, 1), 1.0), text=f"価格データを取得しています... ({done:,} / {total:,} 銘柄)")
+
+        try:
+            with st.spinner("スナップショットを更新しています..."):
+                new_cache = screener.refresh_universe(
+                    codes, cache_dir, force=force_refresh, progress_callback=on_progress,
+                    history_days=cfg["history_days"], chunk_size=cfg["download_chunk_size"],
+                    overlap_days=cfg["overlap_days"], refresh_interval_hours=cfg["refresh_interval_hours"],
+                    adjustment_tolerance=cfg["adjustment_tolerance"],
+                )
+            sm.set_value(KEY_SNAPSHOT_CACHE, new_cache)
+            logger.info(f"Screener snapshots refreshed: {0 if new_cache.get('snapshot') is None else len(new_cache['snapshot'])} rows.")
+            st.rerun()
+        except Exception as e:
+            logger.error(f"Screener refresh failed: {e}", exc_info=True)
+            st.error(f"スナップショットの更新中にエラーが発生しました: {e}")
+
+
+def _render_conditions(sm, snapshot: pd.DataFrame) -> list:
+    """プリセット条件と追加条件の入力欄を表示し、条件のリストを返す。"""
+    preset_labels = list(screener.PRESET_CONDITIONS.keys())
+    selected_presets = st.multiselect(
+        "プリセット条件 (すべてを満たす銘柄を表示)", options=preset_labels,
+        default=[label for label in sm.get_value(KEY_PRESET_CONDITIONS, []) if label in preset_labels],
+        key="screener_preset_multiselect"
+    )
+    sm.set_value(KEY_PRESET_CONDITIONS, selected_presets)
+    conditions = [condition for label in selected_presets for condition in screener.PRESET_CONDITIONS[label]]
+
+    numeric_columns = [col for col in snapshot.columns if pd.api.types.is_numeric_dtype(snapshot[col])]
+    custom_count = st.number_input("追加条件の数", min_value=0, max_value=5, value=sm.get_value(KEY_CUSTOM_CONDITION_COUNT, 0), step=1, key="screener_custom_count_input")
+    sm.set_value(KEY_CUSTOM_CONDITION_COUNT, custom_count)
+    for i in range(int(custom_count)):
+        cols = st.columns([3, 1, 3, 2])
+        left = cols[0].selectbox(f"指標 {i + 1}", numeric_columns, format_func=_column_label, key=f"screener_custom_left_{i}")
+        operator = cols[1].selectbox("条件", _OPERATOR_OPTIONS, key=f"screener_custom_op_{i}")
+        right_column = cols[2].selectbox("比較対象", [_VALUE_OPTION] + numeric_columns, format_func=lambda c: c if c == _VALUE_OPTION else _column_label(c), key=f"screener_custom_right_{i}")
+        if right_column == _VALUE_OPTION:
+            right = cols[3].number_input("値", value=0.0, key=f"screener_custom_value_{i}")
+        else:
+            right = right_column
+        conditions.append((left, operator, right))
+    return conditions
+
+
+def render_page(sm, fm, akm, active_model_global):
+    st.title("テクニカルスクリーナー")
+    logger.info("technical_screener_page.py: render_page called.")
+    st.markdown("上場銘柄全体から、テクニカル指標の条件に合う銘柄を検索します。"
+                "指標は保存済みの価格データから事前に計算してあるため、条件の変更はすぐに反映されます。")
+
+    if screener is None:
+        st.error("スクリーナーモジュールの読み込みに失敗しました。アプリケーション設定を確認してください。")
+        return
+
+    all_stocks_data = sm.get_value("data_display.all_stocks_data_loaded", {})
+    if not all_stocks_data:
+        st.warning("銘柄一覧 (stock_data_searcher_light.json) が読み込まれていないため、スクリーニングできません。")
+        return
+    codes = list(all_stocks_data.keys())
+
+    cache_dir = _get_cache_dir()
+    if cache_dir is None:
+        st.error("スクリーナーのキャッシュディレクトリを作成できませんでした。")
+        return
+
+    snapshot_cache = sm.get_value(KEY_SNAPSHOT_CACHE)
+    if snapshot_cache is None:
+        snapshot_cache = screener.load_snapshot_cache(cache_dir) or {}
+        sm.set_value(KEY_SNAPSHOT_CACHE, snapshot_cache)
+
+    st.subheader("1. 価格データと指標スナップショット")
+    _render_refresh_section(sm, codes, cache_dir, snapshot_cache)
+
+    snapshot = snapshot_cache.get('snapshot')
+    if snapshot is None or snapshot.empty:
+        st.info("まだスナップショットがありません。「価格データと指標スナップショットを更新」を押してください (初回は全銘柄の取得に数分かかります)。")
+        return
+    snapshot = snapshot.reindex([code for code in codes if code in snapshot.index])
+
+    st.markdown("---")
+    st.subheader("2. 条件")
+    conditions = _render_conditions(sm, snapshot)
+
+    st.markdown("---")
+    st.subheader("3. 結果")
+    filtered = screener.apply_conditions(snapshot, conditions)
+    st.write(f"**{len(filtered):,}** / {len(snapshot):,} 銘柄が条件に一致しました。")
+
+    sortable_columns = [col for col in snapshot.columns if col != 'Date']
+    sort_cols = st.columns([3, 2, 2])
+    default_sort = sm.get_value(KEY_SORT_BY, 'Change_Pct')
+    sort_by = sort_cols[0].selectbox("並べ替え", sortable_columns, index=sortable_columns.index(default_sort) if default_sort in sortable_columns else 0,
+                                     format_func=_column_label, key="screener_sort_select")
+    sort_ascending = sort_cols[1].radio("順序", ["降順", "昇順"], index=1 if sm.get_value(KEY_SORT_ASCENDING, False) else 0, horizontal=True, key="screener_sort_order_radio") == "昇順"
+    page_size_options = app_config.SCREENER_CONFIG["page_size_options"]
+    page_size = sort_cols[2].selectbox("1ページの件数", page_size_options,
+                                       index=page_size_options.index(sm.get_value(KEY_PAGE_SIZE, page_size_options[1])) if sm.get_value(KEY_PAGE_SIZE, page_size_options[1]) in page_size_options else 0,
+                                       key="screener_page_size_select")
+    sm.set_value(KEY_SORT_BY, sort_by)
+    sm.set_value(KEY_SORT_ASCENDING, sort_ascending)
+    sm.set_value(KEY_PAGE_SIZE, page_size)
+
+    # 条件や並べ替えが変わったら1ページ目に戻す
+    query_signature = (tuple(conditions), sort_by, sort_ascending, page_size)
+    if sm.get_value(KEY_QUERY_SIGNATURE) != query_signature:
+        sm.set_value(KEY_QUERY_SIGNATURE, query_signature)
+        sm.set_value(KEY_PAGE, 1)
+
+    total_pages = max(1, -(-len(filtered) // page_size))
+    page = st.number_input(f"ページ (全 {total_pages} ページ)", min_value=1, max_value=total_pages,
+                           value=min(sm.get_value(KEY_PAGE, 1), total_pages), step=1, key="screener_page_input")
+    sm.set_value(KEY_PAGE, page)
+    page_df, _ = screener.sort_and_paginate(filtered, sort_by, sort_ascending, page, page_size)
+
+    display_df = page_df.copy()
+    display_df.insert(0, '銘柄名', [all_stocks_data.get(code, {}).get('Company Name ja', '') for code in display_df.index])
+    display_df.index.name = 'コード'
+    display_df = display_df.rename(columns={col: _column_label(col) for col in display_df.columns})
+    st.dataframe(display_df, use_container_width=True)
+
+    csv_df = filtered.copy()
+    csv_df.insert(0, '銘柄名', [all_stocks_data.get(code, {}).get('Company Name ja', '') for code in csv_df.index])
+    st.download_button("条件に一致した全銘柄をCSVでダウンロード", csv_df.to_csv().encode('utf-8-sig'),
+                       file_name=f"screener_{datetime.date.today():%Y%m%d}.csv", mime="text/csv", key="screener_csv_download")
+
+    # --- 選択した銘柄をテクニカル分析で開く ---
+    if not page_df.empty:
+        open_cols = st.columns([3, 2])
+        selected_code = open_cols[0].selectbox(
+            "テクニカル分析で開く銘柄", list(page_df.index),
+            format_func=lambda code: f"{code} {all_stocks_data.get(code, {}).get('Company Name ja', '')}", key="screener_open_select"
+        )
+        with open_cols[1]:
+            st.write("")
+            if st.button("テクニカル分析で表示", key="screener_open_tech_button", use_container_width=True):
+                sm.set_value("app.selected_stock_code", selected_code)
+                sm.set_value("app.selected_stock_name", all_stocks_data.get(selected_code, {}).get('Company Name ja', selected_code))
+                sm.set_value("tech_analysis.show_chart_button_clicked", False)
+                sm.set_value("app.current_step", 8)
+                st.rerun()
+
+    # --- ナビゲーション ---
+    st.markdown("---")
+    col_back, _ = st.columns(2)
+    with col_back:
+        if st.button("戻る (ステップ10: EDINET高度分析へ)", key="screener_back_to_s10", use_container_width=True):
+            sm.set_value("app.current_step", 10)
+            st.rerun()
@@ -0,0 +1,146 @@
+# tests/test_cache_backend.py
+# 共有キャッシュ (cache_backend.py) の各保存先に同じ操作を行い、TTL・LRU 追い出し・統計と cached デコレータの動作を確かめる。
+# Redis は InMemoryRedis (プロセス内のスタンドイン) を使う。
+import time
+
+import pytest
+
+import cache_backend
+
+MAX_ENTRIES = 3
+
+
+@pytest.fixture(params=["disk", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "disk":
+        backend = cache_backend.DiskBackend(str(tmp_path / "disk"), MAX_ENTRIES)
+        backend._EVICT_CHECK_INTERVAL = 1  # 書き込みのたびに件数上限を確認させる (既定はまとめて確認する)
+    elif request.param == "sqlite":
+        backend = cache_backend.SQLiteBackend(str(tmp_path / "cache.sqlite3"), MAX_ENTRIES)
+    else:
+        backend = cache_backend.RedisBackend(cache_backend.InMemoryRedis(), MAX_ENTRIES, prefix="test:")
+    return backend
+
+
+@pytest.fixture
+def shared_backend(backend):
+    cache_backend.set_backend(backend)
+    yield backend
+    cache_backend.set_backend(None)
+
+
+def _tick():
+    # LRU の順序はアクセス時刻 (ファイルの更新時刻・スコア) で決まるため、操作の間で時刻を進める
+    time.sleep(0.01)
+
+
+def test_set_and_get_round_trip(backend):
+    value = {"prices": [1.5, 2.5], "name": "トヨタ"}
+    backend.set("key", value, ttl=60)
+    assert backend.get("key") == (True, value)
+    assert backend.get("missing") == (False, None)
+
+
+def test_expired_entry_is_a_miss(backend):
+    backend.set("short", 1, ttl=0.05)
+    backend.set("long", 2, ttl=60)
+    time.sleep(0.1)
+    assert backend.get("short") == (False, None)
+    assert backend.get("long") == (True, 2)
+
+
+def test_least_recently_used_entry_is_evicted(backend):
+    for key in ("a", "b", "c"):
+        backend.set(key, key, ttl=60)
+        _tick()
+    assert backend.get("a") == (True, "a")  # a を使ったので、最も長く使われていないのは b
+    _tick()
+    backend.set("d", "d", ttl=60)
+    assert backend.get("b") == (False, None)
+    assert [backend.get(key)[0] for key in ("a", "c", "d")] == [True, True, True]
+    assert backend.stats()["evictions"] == 1
+
+
+def test_stats_count_hits_misses_and_sets(backend):
+    backend.set("key", 1, ttl=60)
+    backend.get("key")
+    backend.get("key")
+    backend.get("missing")
+    assert backend.stats() == {"hits": 2, "misses": 1, "sets": 1, "evictions": 0}
+
+
+def test_delete_and_clear(backend):
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    backend.delete("a")
+    assert backend.get("a") == (False, None)
+    backend.clear()
+    assert backend.get("b") == (False, None)
+
+
+def test_cached_returns_stored_result(shared_backend, request):
+    namespace = f"test.cached.{request.node.callspec.id}"
+    calls = []
+
+    @cache_backend.cached(namespace, ttl=60)
+    def fetch(ticker, period="1y"):
+        calls.append((ticker, period))
+        return f"{ticker}:{period}"
+
+    assert fetch("7203.T") == fetch("7203.T", period="1y") == "7203.T:1y"  # 既定値を省略しても同じキー
+    assert fetch("7203.T", "5y") == "7203.T:5y"
+    assert calls == [("7203.T", "1y"), ("7203.T", "5y")]
+    assert cache_backend.get_stats()["namespaces"][namespace] == {"hits": 1, "misses": 2, "errors": 0}
+
+    fetch.invalidate("7203.T")
+    fetch("7203.T")
+    assert len(calls) == 3
+
+
+def test_cached_skips_results_rejected_by_should_cache(shared_backend, request):
+    calls = []
+
+    @cache_backend.cached(f"test.should_cache.{request.node.callspec.id}", ttl=60, should_cache=lambda result: result[1] is None)
+    def fetch(ticker):
+        calls.append(ticker)
+        return (None, "error") if ticker == "bad" else (ticker, None)
+
+    fetch("bad")
+    fetch("bad")
+    fetch("good")
+    fetch("good")
+    assert calls == ["bad", "bad", "good"]
+
+
+def test_cached_excludes_underscore_arguments_from_key(shared_backend, request):
+    calls = []
+
+    @cache_backend.cached(f"test.underscore.{request.node.callspec.id}", ttl=60)
+    def fetch(ticker, _client):
+        calls.append((ticker, _client))
+        return ticker
+
+    fetch("7203.T", _client=object())
+    fetch("7203.T", _client=object())
+    fetch("6758.T", _client=object())
+    assert [ticker for ticker, _ in calls] == ["7203.T", "6758.T"]
+
+
+def test_cached_runs_function_when_backend_fails():
+    class BrokenBackend(cache_backend.CacheBackend):
+        name = "broken"
+
+        def get(self, key):
+            raise OSError("unavailable")
+
+        def set(self, key, value, ttl):
+            raise OSError("unavailable")
+
+    namespace = "test.broken"
+    cache_backend.set_backend(BrokenBackend(MAX_ENTRIES))
+    try:
+        fetch = cache_backend.cached(namespace, ttl=60)(lambda ticker: ticker.upper())
+        assert fetch("abc") == "ABC"
+        assert cache_backend.get_stats()["namespaces"][namespace]["errors"] == 2
+    finally:
+        cache_backend.set_backend(None)
@@ -0,0 +1,123 @@
+# tests/test_incremental.py
+# 状態付き指標 (stock_chart_app/indicators/incremental.py) の逐次更新の結果が、従来の calculate_* のバッチ計算と一致するかを確かめる。
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_chart_app.indicators import engine, trend_indicators, oscillator_indicators, volume_indicators, other_indicators
+from stock_chart_app.indicators.incremental import (
+    INCREMENTAL_INDICATORS, AtrIndicator, DonchianIndicator, EmaIndicator, ForceIndexIndicator, KeltnerIndicator,
+    MacdIndicator, ObvIndicator, RsiIndicator, compute_columns_with_cache,
+)
+
+# INCREMENTAL_INDICATORS のキー -> 同じ列を返す calculate_* 関数
+CALCULATE_FUNCS = {
+    'sma': trend_indicators.calculate_sma,
+    'ema': trend_indicators.calculate_ema,
+    'macd': trend_indicators.calculate_macd,
+    'rsi': oscillator_indicators.calculate_rsi,
+    'atr': other_indicators.calculate_atr,
+    'keltner': trend_indicators.calculate_keltner_channels,
+    'force_index': oscillator_indicators.calculate_force_index,
+    'bollinger': trend_indicators.calculate_bollinger_bands,
+    'donchian': trend_indicators.calculate_donchian_channel,
+    'obv': volume_indicators.calculate_obv,
+    'vwap': volume_indicators.calculate_vwap,
+    'volume_sma': volume_indicators.calculate_volume_sma,
+}
+
+# EMA系などはバッチ計算と同じ漸化式なので完全一致、移動窓系と VWAP は加算順序の違いによる誤差の範囲で一致する
+EXACT_INDICATORS = {EmaIndicator, MacdIndicator, RsiIndicator, AtrIndicator, KeltnerIndicator, ForceIndexIndicator,
+                    ObvIndicator, DonchianIndicator}
+
+# 履歴を分割する位置 (先頭1本だけ、窓の途中、NaNの行の直後、十分な履歴のあと)
+SPLITS = (1, 40, 51, 300)
+N_SINGLE_BARS = 20
+
+
+def _make_ohlcv(freq: str, n: int = 600) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2024-01-01 09:00', periods=n, freq=freq)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    df = pd.DataFrame({
+        'Open': close + rng.normal(0, 0.5, n),
+        'High': close + np.abs(rng.normal(0, 1, n)),
+        'Low': close - np.abs(rng.normal(0, 1, n)),
+        'Close': close,
+        'Volume': rng.integers(0, 5000, n).astype(float),
+    }, index=index)
+    df.iloc[50, :] = np.nan  # 欠損した足
+    df.iloc[51:53, df.columns.get_loc('Volume')] = 0  # 出来高0の足 (VWAP が直前の値を引き継ぐ)
+    return df
+
+
+@pytest.fixture(params=['15min', '1D'], ids=['intraday', 'daily'])
+def ohlcv(request):
+    # 15分足は複数の日をまたぐため、VWAP の日ごとのリセットも確かめられる
+    return _make_ohlcv(request.param)
+
+
+def _assert_matches(indicator_cls, actual, expected, label):
+    if indicator_cls in EXACT_INDICATORS:
+        assert np.array_equal(actual, expected, equal_nan=True), label
+    else:
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=label)
+
+
+@pytest.mark.parametrize('key', list(INCREMENTAL_INDICATORS))
+def test_single_bar_updates_match_calculate(ohlcv, key):
+    indicator_cls = INCREMENTAL_INDICATORS[key]
+    expected = CALCULATE_FUNCS[key](ohlcv)
+    for split in SPLITS:
+        indicator, columns = indicator_cls.from_frame(ohlcv.iloc[:split])
+        appended = [indicator.update(ohlcv.iloc[i:i + 1]) for i in range(split, split + N_SINGLE_BARS)]
+        end = split + N_SINGLE_BARS
+        for name in indicator.column_names():
+            actual = np.concatenate([columns[name]] + [cols[name] for cols in appended])
+            _assert_matches(indicator_cls, actual, expected[name].to_numpy()[:end], f"{key}/{name} split={split}")
+
+
+@pytest.mark.parametrize('key', list(INCREMENTAL_INDICATORS))
+def test_multi_bar_update_matches_calculate(ohlcv, key):
+    indicator_cls = INCREMENTAL_INDICATORS[key]
+    expected = CALCULATE_FUNCS[key](ohlcv)
+    for split in SPLITS:
+        indicator, columns = indicator_cls.from_frame(ohlcv.iloc[:split])
+        # 数本ずつ追加したあと、残りをまとめて追加する
+        first = indicator.update(ohlcv.iloc[split:split + 7])
+        rest = indicator.update(ohlcv.iloc[split + 7:])
+        for name in indicator.column_names():
+            actual = np.concatenate([columns[name], first[name], rest[name]])
+            _assert_matches(indicator_cls, actual, expected[name].to_numpy(), f"{key}/{name} split={split}")
+
+
+def test_empty_update_returns_empty_columns(ohlcv):
+    indicator, _ = EmaIndicator.from_frame(ohlcv.iloc[:100])
+    assert {name: len(values) for name, values in indicator.update(ohlcv.iloc[0:0]).items()} == {'EMA_20': 0}
+
+
+def test_compute_columns_with_cache_matches_engine(ohlcv):
+    modules = {module.__name__: module for module in (trend_indicators, oscillator_indicators, volume_indicators, other_indicators)}
+    # ケルトナーと ATR は同じ atr_N 列を出力するため、キャッシュ付きの計算の対象外 (ここでは除く)
+    config = {key: {'module': modules[cls.columns_func.__module__], 'columns_func': cls.columns_func.__name__, 'params': {}}
+              for key, cls in INCREMENTAL_INDICATORS.items() if key not in ('atr', 'keltner')}
+    resolved = engine.resolve_indicators(list(config), {}, config)
+    expected = engine.compute_indicator_columns(ohlcv, resolved)
+    cache = None
+    # 初回、1本追加、変化なし、複数本追加、最後まで
+    for end in (200, 201, 201, 260, len(ohlcv)):
+        columns, cache = compute_columns_with_cache(ohlcv.iloc[:end], resolved, 'test', cache)
+        assert cache['n_confirmed'] == end - 1
+        for name, values in columns.items():
+            np.testing.assert_allclose(values, expected[name][:end], rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=f"{name} end={end}")
+
+
+def test_compute_columns_with_cache_rebuilds_when_history_changes(ohlcv):
+    config = {'ema': {'module': trend_indicators, 'columns_func': 'ema_columns', 'params': {}}}
+    resolved = engine.resolve_indicators(['ema'], {}, config)
+    _, cache = compute_columns_with_cache(ohlcv.iloc[:200], resolved, 'test')
+    revised = ohlcv.copy()
+    revised.iloc[10, revised.columns.get_loc('Close')] += 5  # 確定済みの足が修正された
+    columns, _ = compute_columns_with_cache(revised.iloc[:220], resolved, 'test', cache)
+    expected = trend_indicators.calculate_ema(revised.iloc[:220])
+    assert np.array_equal(columns['EMA_20'], expected['EMA_20'].to_numpy(), equal_nan=True)
@@ -0,0 +1,86 @@
+# tests/test_news_dedup.py
+# news_dedup.cluster_articles の判定を、実際の配信記事に近い日英の見出しの組で確かめる。
+# 閾値 (config.NEWS_SERVICE_CONFIG["near_duplicate_min_jaccard"]) を変えるときは、ここの組が全て通ることを確認すること。
+import pytest
+
+import news_dedup
+
+# 同じ記事とみなすべき組 (提供元による表記ゆれ)
+SAME_ARTICLE_PAIRS = [
+    ("トヨタ、4～6月期の純利益が過去最高 北米販売好調", "トヨタ、4～6月期の純利益が過去最高 北米の販売好調"),
+    ("トヨタ、4～6月期の純利益が過去最高 北米販売好調", "トヨタ自動車、4～6月期の純利益が過去最高 北米販売好調"),
+    ("トヨタ、4～6月期の純利益が過去最高 北米販売好調 - 日本経済新聞", "トヨタの4─6月期、純利益は過去最高 北米で販売好調 | ロイター"),
+    ("トヨタ、4～6月期の純利益が過去最高", "トヨタ、4～6月期の営業利益が過去最高"),
+    ("日銀、政策金利を0.5%に引き上げ 17年ぶり水準", "日銀が政策金利を0.5%に引き上げ、17年ぶりの水準"),
+    ("ソニーG、7～9月期は増益 ゲーム好調", "ソニーグループ、7-9月期は増益 ゲームが好調"),
+    ("【速報】トヨタ、4～6月期の純利益が過去最高", "トヨタ、4～6月期の純利益が過去最高"),
+    ("Toyota posts record quarterly profit as North American sales jump",
+     "Toyota posts record quarterly profit on strong North American sales - Reuters"),
+    ("Sony raises annual profit forecast on strong game sales", "Sony Group raises full-year profit forecast on strong gaming sales"),
+    ("Bank of Japan raises rates to 0.5%, highest in 17 years", "BOJ raises interest rates to 0.5%, the highest in 17 years | Nikkei Asia"),
+]
+
+# 別の記事として残すべき組 (文字は似ているが、値動きの向きや主語が異なる)
+DIFFERENT_ARTICLE_PAIRS = [
+    ("日経平均、反発", "日経平均、反落"),
+    ("日経平均、反発 300円高", "日経平均、反落 300円安"),
+    ("日経平均、続伸 半導体株に買い", "日経平均、続落 半導体株に売り"),
+    ("トヨタ、4～6月期の純利益が過去最高", "トヨタ、4～6月期の純利益が減少"),
+    ("トヨタ、今期純利益予想を上方修正", "ホンダ、今期純利益予想を下方修正"),
+    ("トヨタ、今期純利益予想を上方修正", "ホンダ、今期純利益予想を上方修正"),
+    ("Nikkei rises as chip stocks rally", "Nikkei falls as chip stocks slump"),
+    ("Toyota raises full-year profit forecast", "Honda raises full-year profit forecast"),
+    ("Toyota raises full-year profit forecast on weak yen", "Sony shares fall after earnings miss"),
+]
+
+
+def _cluster_titles(title_a: str, title_b: str) -> list[list[int]]:
+    articles = [
+        {'タイトル': title_a, 'URL': 'https://example.com/a', 'ソース': 'A'},
+        {'タイトル': title_b, 'URL': 'https://example.org/b', 'ソース': 'B'},
+    ]
+    return news_dedup.cluster_articles(articles)
+
+
+@pytest.mark.parametrize("title_a, title_b", SAME_ARTICLE_PAIRS)
+def test_same_article_pairs_are_merged(title_a, title_b):
+    assert _cluster_titles(title_a, title_b) == [[0, 1]]
+
+
+@pytest.mark.parametrize("title_a, title_b", DIFFERENT_ARTICLE_PAIRS)
+def test_different_article_pairs_are_kept(title_a, title_b):
+    assert _cluster_titles(title_a, title_b) == [[0], [1]]
+
+
+@pytest.mark.xfail(strict=True, reason="地名だけが異なる見出しは n-gram の重なりでは区別できない (既知の制限)")
+def test_headlines_differing_only_in_region_are_kept():
+    assert _cluster_titles("トヨタ、北米で新型EVを発売", "トヨタ、欧州で新型EVを発売へ") == [[0], [1]]
+
+
+def test_same_url_is_merged_regardless_of_title():
+    articles = [
+        {'タイトル': "日経平均、反発", 'URL': 'https://www.example.com/news/1/'},
+        {'タイトル': "Nikkei rebounds", 'URL': 'https://example.com/news/1'},
+    ]
+    assert news_dedup.cluster_articles(articles) == [[0, 1]]
+
+
+def test_different_article_pairs_are_kept_in_a_larger_list():
+    # 候補探しのバケットに多くの記事が入っていても、別の記事の組が同じまとまりにならないこと
+    titles = [title for pair in DIFFERENT_ARTICLE_PAIRS for title in pair]
+    articles = [{'タイトル': title, 'URL': f'https://example.com/{i}'} for i, title in enumerate(titles)]
+    cluster_of = {idx: cluster_no for cluster_no, cluster in enumerate(news_dedup.cluster_articles(articles)) for idx in cluster}
+    for pair_no in range(len(DIFFERENT_ARTICLE_PAIRS)):
+        assert cluster_of[2 * pair_no] != cluster_of[2 * pair_no + 1], DIFFERENT_ARTICLE_PAIRS[pair_no]
+
+
+def test_merge_cluster_joins_sources_and_related_urls():
+    articles = [
+        {'タイトル': "トヨタ、純利益が過去最高", 'URL': 'https://a.example/1', 'ソース': '日本経済新聞'},
+        {'タイトル': "トヨタ自動車、純利益が過去最高", 'URL': 'https://b.example/2', 'ソース': 'ロイター'},
+        {'タイトル': "トヨタ、純利益が過去最高", 'URL': 'https://a.example/1', 'ソース': '日本経済新聞'},
+    ]
+    merged = news_dedup.merge_cluster(articles)
+    assert merged['タイトル'] == "トヨタ、純利益が過去最高"
+    assert merged['ソース'] == "日本経済新聞 / ロイター"
+    assert merged['関連URL'] == ['https://b.example/2']
@@ -0,0 +1,118 @@
+# tests/test_screener.py
+# スクリーナーの価格パネルの差分更新 (stock_chart_app/screener.py の refresh_price_cache) を、
+# yfinance の代わりのダウンローダーで確かめる。
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from stock_chart_app import screener
+
+
+class StubDownloader:
+    """download_price_chunk の代わり。営業日ごとに決まった価格を返し、呼び出しを記録する。"""
+
+    def __init__(self):
+        self.calls = []
+        self.split_ratio = {}   # 銘柄コード -> 分割比率 (auto_adjust=True と同じく、全期間の価格をこの値で割る)
+        self.failing = set()    # 取得に失敗させる銘柄コード
+
+    def __call__(self, codes, start, end):
+        self.calls.append((tuple(codes), start, end))
+        if self.failing & set(codes):
+            raise RuntimeError("download failed")
+        index = pd.bdate_range(start, end - datetime.timedelta(days=1))
+        close = pd.DataFrame({code: self.base_close(code, index) / self.split_ratio.get(code, 1) for code in codes}, index=index)
+        return {'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                'Volume': pd.DataFrame(1000.0, index=index, columns=list(codes))}
+
+    @staticmethod
+    def base_close(code, index):
+        return 1000.0 + int(code) % 100 + np.array([d.toordinal() % 50 for d in index], dtype=float)
+
+    def calls_for(self, code):
+        return [(start, end) for codes, start, end in self.calls if code in codes]
+
+
+def _refresh(tmp_path, downloader, codes=('1001', '1002'), **options):
+    return screener.refresh_price_cache(list(codes), str(tmp_path), force=True, downloader=downloader, **options)
+
+
+def test_initial_refresh_downloads_history(tmp_path):
+    downloader = StubDownloader()
+    cache, changed = _refresh(tmp_path, downloader, history_days=100)
+    assert sorted(changed) == ['1001', '1002']
+    assert list(cache['panel']['Close'].columns) == ['1001', '1002']
+    assert downloader.calls_for('1001')[0][0] == datetime.date.today() - datetime.timedelta(days=100)
+
+
+def test_unchanged_refresh_fetches_only_overlap(tmp_path):
+    downloader = StubDownloader()
+    _refresh(tmp_path, downloader, history_days=100)
+    downloader.calls.clear()
+    cache, changed = _refresh(tmp_path, downloader, history_days=100, overlap_days=7)
+    assert changed == []
+    last_date = cache['panel']['Close'].index.max()
+    assert downloader.calls_for('1001') == [((last_date - pd.Timedelta(days=7)).date(), datetime.date.today() + datetime.timedelta(days=1))]
+
+
+def test_ticker_with_failed_downloads_is_fetched_from_its_own_last_bar(tmp_path):
+    downloader = StubDownloader()
+    _refresh(tmp_path, downloader, history_days=100)
+    # 1002 の直近30日分が欠けた (その間の取得が失敗し続けた) キャッシュにする
+    cache = screener.load_price_cache(str(tmp_path))
+    gap_start = pd.Timestamp(datetime.date.today() - datetime.timedelta(days=30))
+    for frame in cache['panel'].values():
+        frame.loc[frame.index >= gap_start, '1002'] = np.nan
+    screener._save_pickle(str(tmp_path / screener.PRICE_CACHE_FILENAME), cache)
+    own_last_bar = cache['panel']['Close']['1002'].last_valid_index()
+
+    downloader.calls.clear()
+    cache, changed = _refresh(tmp_path, downloader, history_days=100, overlap_days=7)
+    assert downloader.calls_for('1002')[0][0] == (own_last_bar - pd.Timedelta(days=7)).date()
+    assert changed == ['1002']
+    close = cache['panel']['Close']['1002']
+    assert not close.loc[close.index >= gap_start].isna().any()
+
+
+def test_split_triggers_full_history_refetch(tmp_path):
+    downloader = StubDownloader()
+    _refresh(tmp_path, downloader, history_days=100)
+    downloader.split_ratio['1001'] = 5  # 1:5 の分割で、過去の価格も全て 1/5 に調整し直された
+    downloader.calls.clear()
+    cache, changed = _refresh(tmp_path, downloader, history_days=100, overlap_days=7)
+
+    assert changed == ['1001']
+    assert downloader.calls_for('1001')[-1][0] == datetime.date.today() - datetime.timedelta(days=100)
+    assert len(downloader.calls_for('1002')) == 1  # 調整されていない銘柄は差分だけ
+    close = cache['panel']['Close']
+    # 重なった期間の境目で価格が 80% 下がったように見える (調整前後が混ざる) ことがない
+    np.testing.assert_allclose(close['1001'].to_numpy(), StubDownloader.base_close('1001', close.index) / 5)
+    np.testing.assert_allclose(close['1002'].to_numpy(), StubDownloader.base_close('1002', close.index))
+
+
+def test_failed_refetch_keeps_stored_history_unspliced(tmp_path):
+    downloader = StubDownloader()
+    _refresh(tmp_path, downloader, history_days=100)
+    downloader.split_ratio['1001'] = 5
+    real_call = downloader.__call__
+
+    def fail_full_refetch(codes, start, end):
+        if start == datetime.date.today() - datetime.timedelta(days=100):
+            raise RuntimeError("download failed")
+        return real_call(codes, start, end)
+
+    cache, changed = _refresh(tmp_path, fail_full_refetch, history_days=100, overlap_days=7)
+    assert changed == []
+    close = cache['panel']['Close']
+    np.testing.assert_allclose(close['1001'].to_numpy(), StubDownloader.base_close('1001', close.index))
+
+
+def test_small_price_revision_is_spliced_without_refetch(tmp_path):
+    downloader = StubDownloader()
+    _refresh(tmp_path, downloader, history_days=100)
+    downloader.split_ratio['1001'] = 1 + 1e-6  # 許容範囲内の修正
+    downloader.calls.clear()
+    _, changed = _refresh(tmp_path, downloader, history_days=100, overlap_days=7, adjustment_tolerance=1e-4)
+    assert changed == ['1001']
+    assert len(downloader.calls_for('1001')) == 1
@@ -0,0 +1,141 @@
+# ticker_metadata.py
+# yfinance の銘柄メタデータ (info・財務諸表・配当・決算日・アナリスト推奨) のプロセス共通キャッシュ。
+# 項目ごとに有効期限 (config.TICKER_METADATA_CONFIG["ttl_seconds"]) を持ち、どのページ・セッションからの
+# 呼び出しでも同じキャッシュを使います。同じ銘柄・項目への同時リクエストは、1回の取得にまとめます。
+# プロセス内のキャッシュにない項目は、yfinance に問い合わせる前に共有キャッシュ (cache_backend) を確認するため、
+# 新しく起動したインスタンスでも、他のインスタンスが取得済みの値を使えます。
+import collections
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+
+import cache_backend
+import config as app_config
+import data_sources
+import rate_limiter
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+    logging.getLogger(__name__).warning("yfinance がインストールされていないため、銘柄メタデータを取得できません。")
+
+logger = logging.getLogger(__name__)
+
+# 項目名と、yf.Ticker から値を取り出す関数
+FIELD_GETTERS = {
+    "info": lambda t: t.info,
+    "financials": lambda t: t.financials,
+    "quarterly_financials": lambda t: t.quarterly_financials,
+    "dividends": lambda t: t.dividends,
+    "earnings_dates": lambda t: t.earnings_dates,
+    "recommendations": lambda t: t.recommendations,
+    "recommendations_summary": lambda t: t.recommendations_summary,
+}
+
+_cache = collections.OrderedDict()  # (シンボル, 項目) -> (値, 取得時刻)。古く使われていないものから追い出す
+_in_flight = {}                     # (シンボル, 項目) -> 取得中の Future
+_lock = threading.Lock()
+
+
+def _is_cacheable(field: str, value) -> bool:
+    # info が空なのはティッカーの誤りか一時的な失敗なので、キャッシュせずに次回も取得し直す
+    if field == "info":
+        return isinstance(value, dict) and bool(value.get('symbol'))
+    return True
+
+
+def _copy_value(value):
+    # キャッシュした値を呼び出し側が書き換えても、他の呼び出しに影響しないようにコピーを返す
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return copy.deepcopy(value)
+    return value
+
+
+def _fetch(symbol: str, field: str):
+    def _live():
+        if yf is None:
+            raise RuntimeError("yfinance がインストールされていません。")
+        rate_limiter.get_limiter("yfinance").acquire()
+        return FIELD_GETTERS[field](yf.Ticker(symbol))
+
+    started = time.time()
+    value = data_sources.call("yfinance", field, {"symbol": symbol}, _live)
+    logger.debug(f"銘柄メタデータ取得: {symbol} {field} ({time.time() - started:.2f}秒)")
+    return value
+
+
+def _load_shared(shared_key: str):
+    """共有キャッシュから (値, 取得時刻) を返します。ない場合や読み込めない場合は (None, None)。"""
+    try:
+        hit, entry = cache_backend.get_backend().get(shared_key)
+    except Exception as e:
+        logger.warning(f"共有キャッシュの読み込みに失敗しました ({shared_key}): {e}")
+        return None, None
+    return entry if hit else (None, None)
+
+
+def _store_shared(shared_key: str, value, fetched_at: float, ttl: float):
+    try:
+        cache_backend.get_backend().set(shared_key, (value, fetched_at), ttl)
+    except Exception as e:
+        logger.warning(f"共有キャッシュへの保存に失敗しました ({shared_key}): {e}")
+
+
+def get_field(symbol: str, field: str):
+    """
+    symbol の field (FIELD_GETTERS のキー) を返します。有効期限内のキャッシュがあればそれを返し、
+    別のスレッドが同じ項目を取得中であれば、その結果を待って共有します。取得時の例外はそのまま送出します。
+    """
+    if field not in FIELD_GETTERS:
+        raise ValueError(f"未知の項目です: {field}")
+    key = (str(symbol).strip().upper(), field)
+    ttl = app_config.TICKER_METADATA_CONFIG["ttl_seconds"][field]
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and time.time() - entry[1] < ttl:
+            _cache.move_to_end(key)
+            return _copy_value(entry[0])
+        future = _in_flight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _in_flight[key] = future
+
+    if is_leader:
+        shared_key = f"ticker_metadata:{key[0]}:{field}"
+        try:
+            value, fetched_at = _load_shared(shared_key)
+            if fetched_at is None:
+                value = _fetch(key[0], field)
+                fetched_at = time.time()
+                if _is_cacheable(field, value):
+                    _store_shared(shared_key, value, fetched_at, ttl)
+        except Exception as e:
+            with _lock:
+                _in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with _lock:
+            _in_flight.pop(key, None)
+            if _is_cacheable(field, value):
+                _cache[key] = (value, fetched_at)
+                _cache.move_to_end(key)
+                while len(_cache) > app_config.TICKER_METADATA_CONFIG["max_entries"]:
+                    _cache.popitem(last=False)
+        future.set_result(value)
+    return _copy_value(future.result())
+
+
+def invalidate(symbol: str, field: str | None = None):
+    """symbol のキャッシュ (field を省略した場合は全項目) を破棄します。"""
+    symbol = str(symbol).strip().upper()
+    with _lock:
+        for key in [k for k in _cache if k[0] == symbol and (field is None or k[1] == field)]:
+            del _cache[key]
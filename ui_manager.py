@@ -5,6 +5,7 @@ from typing import Dict, Any, List
 
 import config as app_config
 from stock_searcher import search_stocks_by_query
+import news_services
 
 logger = logging.getLogger(__name__)
 
@@ -140,7 +141,8 @@ def render_sidebar(sm, akm, app_config_module):
         "ステップ3: 銘柄分析": 3, "ステップ4: LLMチャット": 4, "ステップ5: LLMショートノベル": 5,
         "ステップ6: AIテキスト読み上げ": 6, "ステップ7: 抽出データ表示": 7,
         "ステップ8: テクニカル分析": 8, "ステップ9: EDINET報告書ビューア": 9,
-        "ステップ10: EDINET高度分析": 10  # --- ここを追加 ---
+        "ステップ10: EDINET高度分析": 10,  # --- ここを追加 ---
+        "ステップ11: テクニカルスクリーナー": 11
     }
     nav_radio_key = "app_mode_radio_ui_manager_v4"
     def navigation_changed_callback_sidebar():
@@ -251,6 +253,18 @@ def render_sidebar(sm, akm, app_config_module):
     st.sidebar.markdown("---")
     st.sidebar.subheader("APIキー取得状況")
     st.sidebar.json(akm.get_all_loaded_keys_summary())
+    provider_health_rows = news_services.get_news_provider_health()
+    with st.sidebar.expander("📡 ニュースAPIの状態", expanded=any(h["state"] != "closed" for h in provider_health_rows)):
+        if provider_health_rows:
+            state_labels = {"closed": "正常", "open": "遮断中", "half_open": "試行中"}
+            st.dataframe([{
+                "API": h["name"].removeprefix("news_"), "状態": state_labels.get(h["state"], h["state"]),
+                "エラー率": f"{h['error_rate']:.0%}" if h["error_rate"] is not None else "-",
+                "p50 (秒)": h["p50_sec"], "p95 (秒)": h["p95_sec"], "タイムアウト (秒)": h["timeout_sec"],
+                "遮断残り (秒)": h["cooldown_remaining_sec"], "直近の呼び出し": h["recent_calls"], "停止した呼び出し": h["rejected"],
+            } for h in provider_health_rows], hide_index=True)
+        else:
+            st.caption("まだニュースAPIを呼び出していません。")
     st.sidebar.markdown("---")
     st.sidebar.caption(f"統合金融ダッシュボード v3.0.1\nLLM: {sm.get_value('app.active_gemini_model', 'N/A')}")
     logger.debug("render_sidebar finished.")